@@ -1,11 +1,21 @@
 #!/usr/bin/python3
-import anndata
 from argparse import ArgumentParser, BooleanOptionalAction
-from jinja2 import Environment, PackageLoader, select_autoescape
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import glob
+import hashlib
+import json
+import os
+import h5py
 import numpy
-import pandas
+from jinja2 import Environment, PackageLoader, select_autoescape
 from pathlib import Path
 
+TABLE_NAMES = ["obs", "var", "uns", "obsm", "layers", "obsp"]
+PROFILE_CHUNK_SIZE = 1_000_000
+# how many categories to list in a column profile
+MAX_CATEGORIES = 10
+
 
 DEFINITIONS = {
     "obs": {
@@ -178,7 +188,22 @@ def main(cmdline=None):
     parser = make_parser()
     args = parser.parse_args(cmdline)
 
-    filename = Path(args.filename)
+    if args.output_dir is not None:
+        filenames = find_h5ad_files(args.filename)
+        generate_reports(
+            filenames,
+            Path(args.output_dir),
+            add_filename=args.add_filename,
+            harmony=args.harmony,
+            jobs=args.jobs,
+            use_cache=args.cache,
+        )
+        return
+
+    if len(args.filename) != 1:
+        parser.error("Use --output-dir to generate reports for more than one file")
+
+    filename = Path(args.filename[0])
     report = generate_report(filename, args.add_filename, args.harmony)
 
     if args.output:
@@ -202,58 +227,439 @@ def make_parser():
         required=True,
         action=BooleanOptionalAction
     )
-    parser.add_argument("filename", help="h5ad file to read")
+    parser.add_argument(
+        "--output-dir",
+        help="batch mode, write one report per file and an index.html to this directory",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None,
+        help="number of processes to scan files with in batch mode",
+    )
+    parser.add_argument(
+        "--cache",
+        default=True,
+        action=BooleanOptionalAction,
+        help="skip files that haven't changed since the last batch run. "
+        "--no-cache scans every file and leaves the cache alone",
+    )
+    parser.add_argument(
+        "filename", nargs="+",
+        help="h5ad files to read. In batch mode directories and glob patterns "
+        "like 'data/**/*.h5ad' are expanded",
+    )
     return parser
 
 
+@functools.cache
+def get_template(name="uci_lab_run_h5ad_file_specification.html"):
+    """Compile the report templates once per process"""
+    env = Environment(loader=PackageLoader("igvf_mice"), autoescape=select_autoescape())
+    return env.get_template(name)
+
+
 def generate_report(filename, add_filename=False, harmony=False):
     filename = Path(filename)
-    used_terms = get_h5ad_attributes(filename)
+    used_terms, needs_definition = get_h5ad_attributes(filename)
+    print_undefined_terms(needs_definition)
+    return render_report(filename, used_terms, add_filename, harmony)
+
+
+def render_report(filename, used_terms, add_filename=False, harmony=False):
+    used_terms = dict(used_terms)
     used_terms["harmony"] = harmony
 
     if add_filename:
-        used_terms["filename"] = filename.name
+        used_terms["filename"] = Path(filename).name
+
+    return get_template().render(**used_terms)
+
+
+def find_h5ad_files(patterns):
+    """Expand directories and glob patterns into a sorted list of h5ad files"""
+    filenames = set()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            filenames.update(path.rglob("*.h5ad"))
+        elif glob.has_magic(pattern):
+            filenames.update(Path(x) for x in glob.glob(pattern, recursive=True))
+        else:
+            filenames.add(path)
+    return sorted(filenames)
 
-    env = Environment(loader=PackageLoader("igvf_mice"), autoescape=select_autoescape())
-    template = env.get_template("uci_lab_run_h5ad_file_specification.html")
-    return template.render(**used_terms)
+
+def get_report_name(filename, common_root):
+    """Turn the path below common_root into a flat report filename
+
+    The parts of the path are joined with "_" to stay readable, and a
+    hash of the whole path keeps a/b_c.h5ad and a_b/c.h5ad apart.
+    """
+    relative = Path(filename).resolve().relative_to(common_root)
+    digest = hashlib.sha256(relative.as_posix().encode("utf-8")).hexdigest()[:8]
+    return "{}-{}.html".format("_".join(relative.with_suffix("").parts), digest)
+
+
+def get_file_fingerprint(filename, block_size=1 << 20):
+    """Hash the size and the first and last block of a file
+
+    Reading the whole of a multi GB h5ad would cost more than scanning
+    it, so this only samples the HDF5 superblock and the end of the
+    file where h5py appends new metadata.
+    """
+    stat = os.stat(filename)
+    digest = hashlib.sha256(str(stat.st_size).encode("ascii"))
+    with open(filename, "rb") as instream:
+        digest.update(instream.read(block_size))
+        if stat.st_size > block_size:
+            instream.seek(max(block_size, stat.st_size - block_size))
+            digest.update(instream.read(block_size))
+    return digest.hexdigest()
+
+
+def load_report_cache(cache_filename):
+    try:
+        with open(cache_filename, "rt") as instream:
+            return json.load(instream)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def is_cached(cache, key, filename, options, report_filename):
+    """Check if a file still matches its cache entry
+
+    A matching mtime skips hashing. If only the mtime changed the
+    fingerprint decides, and the stored mtime is refreshed.
+    """
+    entry = cache.get(key)
+    if entry is None or entry.get("options") != options or not report_filename.exists():
+        return False
+
+    mtime_ns = os.stat(filename).st_mtime_ns
+    if entry["mtime_ns"] == mtime_ns:
+        return True
+
+    if entry["fingerprint"] == get_file_fingerprint(filename):
+        entry["mtime_ns"] = mtime_ns
+        return True
+
+    return False
+
+
+def scan_h5ad(filename):
+    """Worker for generate_reports"""
+    used_terms, needs_definition = get_h5ad_attributes(filename)
+    return used_terms, needs_definition, os.stat(filename).st_mtime_ns, get_file_fingerprint(filename)
+
+
+def generate_reports(filenames, output_dir, add_filename=False, harmony=False, jobs=None, use_cache=True):
+    """Write a report for each h5ad file and an index.html linking them
+
+    Files are scanned in a process pool, and the reports are rendered
+    with one compiled template. Unchanged files listed in the
+    .report-cache.json of output_dir are skipped. With use_cache off
+    every file is scanned and the cache is neither read nor written.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cache_filename = output_dir / ".report-cache.json"
+    cache = load_report_cache(cache_filename) if use_cache else {}
+    options = {"add_filename": add_filename, "harmony": harmony}
+
+    filenames = [Path(x).resolve() for x in filenames]
+    if len(filenames) == 0:
+        print("No h5ad files found")
+        return
+
+    common_root = Path(os.path.commonpath([x.parent for x in filenames]))
+    reports = {x: output_dir / get_report_name(x, common_root) for x in filenames}
+
+    to_scan = [
+        x for x in filenames
+        if not (use_cache and is_cached(cache, str(x), x, options, reports[x]))
+    ]
+
+    undefined = []
+    if len(to_scan) > 0:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for filename, (used_terms, needs_definition, mtime_ns, fingerprint) in zip(
+                    to_scan, executor.map(scan_h5ad, to_scan)):
+                undefined.append((filename, needs_definition))
+                with open(reports[filename], "wt") as outstream:
+                    outstream.write(render_report(filename, used_terms, add_filename, harmony))
+                cache[str(filename)] = {
+                    "mtime_ns": mtime_ns,
+                    "fingerprint": fingerprint,
+                    "options": options,
+                    "report": reports[filename].name,
+                }
+
+    index = get_template("uci_lab_run_h5ad_index.html").render(
+        reports=[(x.relative_to(common_root), reports[x].name) for x in filenames],
+    )
+    with open(output_dir / "index.html", "wt") as outstream:
+        outstream.write(index)
+
+    if use_cache:
+        with open(cache_filename, "wt") as outstream:
+            json.dump(cache, outstream, indent=1)
+
+    for filename, needs_definition in undefined:
+        print_undefined_terms(needs_definition, filename)
+
+    print("Scanned {} of {} files".format(len(to_scan), len(filenames)))
 
 
 def get_h5ad_attributes(filename):
-    used_terms = {}
-    adata = anndata.read_h5ad(filename)
-    table_names = ["obs", "var", "uns", "obsm", "layers", "obsp"]
+    """Look up the definitions of the terms used by an h5ad file
+
+    Returns the used terms for the report template and a list of
+    (table, term, coltype, values) for the terms without a definition.
+    """
+    metadata = read_h5ad_metadata(filename)
 
     needs_definition = []
     used_terms = {}
-    for table_name in table_names:
-        table = getattr(adata, table_name)
+    for table_name in TABLE_NAMES:
+        table = metadata[table_name]
         for key in sorted(table.keys()):
             if key not in DEFINITIONS[table_name]:
-                table_type = type(table[key])
-                if isinstance(table[key], pandas.core.series.Series):
-                    values = list(set(table[key]))[:5]
-                elif isinstance(table[key], numpy.ndarray):
-                    values = table[key].shape
-                elif isinstance(table[key], numpy.float64):
-                    values = table[key]
-                elif isinstance(table[key], dict):
-                    values = list(table.keys())[:5]
-                else:
-                    print(f"unrecognized table type {table_type}")
-                    values = "Error"
-                values = ""
+                table_type = table[key]["encoding"]
+                values = "{} {}".format(table[key]["dtype"], table[key]["shape"])
                 needs_definition.append((table_name, key, table_type, values))
-                DEFINITIONS[table_name][key] = "ERROR: Undefined"
 
-            used_terms.setdefault(table_name, {})[key] = DEFINITIONS[table_name][key]
+            used_terms.setdefault(table_name, {})[key] = DEFINITIONS[table_name].get(
+                key, "ERROR: Undefined")
+
+    profiles = read_h5ad_profiles(filename)
+    used_terms["obs_profile"] = profiles["obs"]
+    used_terms["var_profile"] = profiles["var"]
+
+    return used_terms, needs_definition
+
+
+def print_undefined_terms(needs_definition, filename=None):
+    if len(needs_definition) == 0:
+        return
 
-    if len(needs_definition) > 0:
-        print("table\tterm\tcoltype\tvalues")
-        for table_name, term_name, coltype, values in needs_definition:
-            print(f"{table_name}\t{term_name}\t{coltype}\t{values}")
+    if filename is not None:
+        print(f"Undefined terms in {filename}")
+    print("table\tterm\tcoltype\tvalues")
+    for table_name, term_name, coltype, values in needs_definition:
+        print(f"{table_name}\t{term_name}\t{coltype}\t{values}")
+
+
+def read_h5ad_metadata(filename):
+    """Describe the contents of an h5ad file without loading any matrix
+
+    Opens the HDF5 file directly and only reads attributes, so the
+    cost doesn't depend on the number of cells.
+
+    Returns {table_name: {key: {"encoding", "dtype", "shape"}}} for
+    each of the obs, var, uns, obsm, layers and obsp tables.
+    """
+    metadata = {}
+    with h5py.File(filename, "r") as h5:
+        for table_name in TABLE_NAMES:
+            if table_name not in h5:
+                metadata[table_name] = {}
+            elif table_name in ("obs", "var"):
+                metadata[table_name] = describe_dataframe(h5[table_name])
+            else:
+                metadata[table_name] = {
+                    key: describe_element(h5[table_name][key])
+                    for key in h5[table_name].keys()
+                }
+    return metadata
+
+
+def get_encoding_type(element):
+    encoding = element.attrs.get("encoding-type")
+    if isinstance(encoding, bytes):
+        encoding = encoding.decode("utf-8")
+    return encoding
+
+
+def describe_element(element):
+    """Return the encoding, dtype and shape of one h5ad element"""
+    encoding = get_encoding_type(element)
+
+    if isinstance(element, h5py.Dataset):
+        return {
+            "encoding": encoding or "array",
+            "dtype": str(element.dtype),
+            "shape": element.shape,
+        }
+
+    if encoding in ("csr_matrix", "csc_matrix"):
+        return {
+            "encoding": encoding,
+            "dtype": str(element["data"].dtype),
+            "shape": tuple(int(x) for x in element.attrs["shape"]),
+        }
+    elif encoding == "categorical":
+        return {
+            "encoding": encoding,
+            "dtype": "category[{}]".format(element["categories"].dtype),
+            "shape": element["codes"].shape,
+        }
+    elif encoding in ("nullable-integer", "nullable-boolean", "nullable-string-array"):
+        return {
+            "encoding": encoding,
+            "dtype": str(element["values"].dtype),
+            "shape": element["values"].shape,
+        }
+    elif encoding == "dataframe":
+        return {
+            "encoding": encoding,
+            "dtype": "dataframe",
+            "shape": (len(element[element.attrs["_index"]]),
+                      len(element.attrs.get("column-order", []))),
+        }
+    else:
+        # dict like uns entries
+        return {
+            "encoding": encoding or "dict",
+            "dtype": "dict",
+            "shape": (len(element.keys()),),
+        }
 
-    return used_terms
+
+def describe_dataframe(group):
+    """Describe the columns of an obs or var table"""
+    # anndata < 0.7 wrote dataframes as compound datasets
+    if isinstance(group, h5py.Dataset):
+        index_name = group.attrs.get("index", "index")
+        return {
+            name: {
+                "encoding": "array",
+                "dtype": str(group.dtype[name]),
+                "shape": group.shape,
+            }
+            for name in group.dtype.names if name != index_name
+        }
+
+    columns = {}
+    for name in group.attrs.get("column-order", []):
+        if isinstance(name, bytes):
+            name = name.decode("utf-8")
+        columns[name] = describe_element(group[name])
+    return columns
+
+
+def read_h5ad_profiles(filename, chunk_size=PROFILE_CHUNK_SIZE):
+    """Profile every column of the obs and var tables
+
+    Returns {"obs": {column: profile}, "var": {column: profile}}, see
+    profile_element for what a profile contains.
+    """
+    profiles = {}
+    with h5py.File(filename, "r") as h5:
+        for table_name in ("obs", "var"):
+            profiles[table_name] = {}
+            group = h5.get(table_name)
+            # the compound dataset format from anndata < 0.7 isn't profiled
+            if not isinstance(group, h5py.Group):
+                continue
+            for name in group.attrs.get("column-order", []):
+                if isinstance(name, bytes):
+                    name = name.decode("utf-8")
+                profile = profile_element(group[name], chunk_size)
+                if profile is not None:
+                    profiles[table_name][name] = profile
+    return profiles
+
+
+def iter_chunks(dataset, chunk_size=PROFILE_CHUNK_SIZE):
+    """Read a 1D dataset chunk_size rows at a time"""
+    for start in range(0, dataset.shape[0], chunk_size):
+        yield dataset[start:start + chunk_size]
+
+
+def profile_element(element, chunk_size=PROFILE_CHUNK_SIZE):
+    """Summarize one obs or var column without loading it all at once
+
+    Returns a dictionary with the number of rows and the fraction of
+    missing values, plus either "counts", a list of the most common
+    (category, count) pairs, or the "min", "max" and "mean" of a
+    numeric column. Returns None for column types that aren't profiled.
+    """
+    encoding = get_encoding_type(element)
+
+    if encoding == "categorical":
+        return profile_categorical(element, chunk_size)
+    elif encoding in ("nullable-integer", "nullable-boolean"):
+        return profile_numeric(element["values"], element["mask"], chunk_size)
+    elif isinstance(element, h5py.Dataset) and element.ndim == 1 \
+            and element.dtype.kind in "biuf":
+        return profile_numeric(element, None, chunk_size)
+    return None
+
+
+def profile_categorical(group, chunk_size=PROFILE_CHUNK_SIZE):
+    categories = group["categories"][:]
+    if categories.dtype.kind in "OS":
+        categories = numpy.array([
+            x.decode("utf-8") if isinstance(x, bytes) else str(x) for x in categories
+        ], dtype=object)
+
+    counts = numpy.zeros(len(categories), dtype=numpy.int64)
+    rows = 0
+    nulls = 0
+    for codes in iter_chunks(group["codes"], chunk_size):
+        # missing values have a code of -1
+        present = codes >= 0
+        rows += len(codes)
+        nulls += len(codes) - int(present.sum())
+        counts += numpy.bincount(codes[present], minlength=len(categories))
+
+    order = numpy.argsort(-counts, kind="stable")
+    return {
+        "kind": "categorical",
+        "rows": rows,
+        "null_fraction": nulls / rows if rows else 0.0,
+        "categories": len(categories),
+        "counts": [(str(categories[i]), int(counts[i])) for i in order[:MAX_CATEGORIES]],
+    }
+
+
+def profile_numeric(values, mask=None, chunk_size=PROFILE_CHUNK_SIZE):
+    """Accumulate min, max, mean and missing values of a numeric column
+
+    :param mask: optional dataset that is True for missing values, as
+        used by the anndata nullable encodings.
+    """
+    is_float = values.dtype.kind == "f"
+    rows = 0
+    nulls = 0
+    total = 0.0
+    minimum = None
+    maximum = None
+    for start in range(0, values.shape[0], chunk_size):
+        chunk = values[start:start + chunk_size]
+        rows += len(chunk)
+        present = numpy.ones(len(chunk), dtype=bool)
+        if mask is not None:
+            present &= ~mask[start:start + chunk_size]
+        if is_float:
+            present &= ~numpy.isnan(chunk)
+        chunk = chunk[present]
+        nulls += len(present) - len(chunk)
+        if len(chunk) == 0:
+            continue
+        total += float(chunk.sum(dtype=numpy.float64))
+        chunk_min = chunk.min().item()
+        chunk_max = chunk.max().item()
+        minimum = chunk_min if minimum is None else min(minimum, chunk_min)
+        maximum = chunk_max if maximum is None else max(maximum, chunk_max)
+
+    present_rows = rows - nulls
+    return {
+        "kind": "numeric",
+        "rows": rows,
+        "null_fraction": nulls / rows if rows else 0.0,
+        "min": minimum,
+        "max": maximum,
+        "mean": total / present_rows if present_rows else None,
+    }
 
 
 if __name__ == "__main__":
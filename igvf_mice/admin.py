@@ -1,5 +1,19 @@
-from django.contrib import admin
-
+from django.contrib import admin, messages
+from django.contrib.admin.utils import quote, unquote
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.paginator import Paginator
+from django.db import connection, DatabaseError
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.functional import cached_property
+
+from .io.plate_grid import (
+    get_plate_dimensions,
+    get_plate_reagent,
+    load_plate_grid,
+    save_plate_grid,
+)
 from .models import (
     Accession,
     Source,
@@ -13,6 +27,7 @@ from .models import (
     ParseFixedSample,
     SplitSeqPlate,
     SplitSeqWell,
+    SplitSeqWellReadCount,
     Subpool,
     Platform,
     SequencingRun,
@@ -21,6 +36,44 @@ from .models import (
     MeasurementSet,
 )
 
+# below this many rows the exact count is cheap enough
+ESTIMATED_COUNT_THRESHOLD = 10_000
+
+
+def estimate_row_count(model):
+    """Return the row count the database statistics have for a model table
+
+    Returns None if the database has no statistics for it, e.g. before
+    ANALYZE has been run.
+    """
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                # the first number of each stat is the rows in the table
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+                counts = [int(stat.split()[0]) for stat, in cursor.fetchall()]
+                return max(counts) if len(counts) > 0 else None
+            elif connection.vendor == "postgresql":
+                cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [table])
+                row = cursor.fetchone()
+                return int(row[0]) if row is not None and row[0] >= 0 else None
+    except DatabaseError:
+        return None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Use the table statistics instead of COUNT(*) for unfiltered large tables"""
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if query is not None and not query.where:
+            estimate = estimate_row_count(self.object_list.model)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
 
 class AccessionOptions(admin.ModelAdmin):
     model = Accession
@@ -49,7 +102,8 @@ class LibraryConstructionReagentOptions(admin.ModelAdmin):
 class LibraryBarcodeOptions(admin.ModelAdmin):
     model = LibraryBarcode
     list_display = ("reagent", "name", "code", "i7_sequence", "i5_sequence")
-    search_fields = ("code", "i7_sequence", "i5_sequence")
+    list_select_related = ("reagent",)
+    search_fields = ("code", "i7_sequence", "i5_sequence", "i7_rc", "i5_rc")
 
 
 class MouseStrainOptions(admin.ModelAdmin):
@@ -60,6 +114,7 @@ class MouseStrainOptions(admin.ModelAdmin):
 class MouseOptions(admin.ModelAdmin):
     model = Mouse
     list_display = ("name", "strain", "sex", "date_of_birth", "housing_number")
+    list_select_related = ("strain",)
     list_filter = ("strain", "sex")
     ordering = ("-name",)
     fields = (
@@ -87,9 +142,11 @@ class TissueOptions(admin.ModelAdmin):
     list_display = (
         "name",
         "mouse",
+        "weight_mg",
         #"timepoint",
         #"timepoint_units",
     )
+    list_select_related = ("mouse",)
     fields = (
         ("name", "mouse"),
         ("dissection_start_time", "dissection_end_time"),
@@ -103,6 +160,13 @@ class TissueOptions(admin.ModelAdmin):
     #filter_horizontal = ["ontology_term",]
     autocomplete_fields = ["ontology_term", "accession",]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_weights()
+
+    @admin.display(ordering="weight_mg")
+    def weight_mg(self, obj):
+        return obj.weight_mg
+
 
 class ParseFixedSampleOptions(admin.ModelAdmin):
     model = ParseFixedSample
@@ -125,22 +189,19 @@ class ParseFixedSampleOptions(admin.ModelAdmin):
         #"tissue",
     )
 
-    #filter_horizontal = ["tissue",]
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_counts()
 
+    @admin.display(ordering="nuclei_per_ul")
+    def nuclei_per_ul(self, obj):
+        return obj.nuclei_per_ul
 
-class SplitSeqWellInline(admin.StackedInline):
-    model = SplitSeqWell
+    #filter_horizontal = ["tissue",]
 
-    autocomplete_fields = ["biosample", "barcode"]
-    #filter_horizontal = [
-    #    "biosample",
-    #    "barcode"
-    #]
 
-    fields = (
-        ("row", "column"),
-        ("biosample", "barcode",),
-    )
+def split_names(value):
+    """Split a comma or whitespace separated list of names"""
+    return [x for x in value.replace(",", " ").split() if len(x) > 0]
 
 
 class SplitSeqPlateOptions(admin.ModelAdmin):
@@ -156,7 +217,88 @@ class SplitSeqPlateOptions(admin.ModelAdmin):
         ("date_performed", "barcoded_cell_counter", "volume_of_nuclei"),
     )
 
-    inlines = [SplitSeqWellInline,]
+    # the wells are edited as a grid, see plate_grid_view
+    change_form_template = "admin/igvf_mice/splitseqplate/change_form.html"
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_total_nuclei()
+
+    def get_urls(self):
+        urls = [
+            path(
+                "<path:object_id>/grid/",
+                self.admin_site.admin_view(self.plate_grid_view),
+                name="igvf_mice_splitseqplate_grid",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def plate_grid_view(self, request, object_id):
+        """Show and edit every well of a plate on one page"""
+        plate = get_object_or_404(SplitSeqPlate, pk=unquote(object_id))
+        if not self.has_view_permission(request, plate):
+            raise PermissionDenied
+        can_change = self.has_change_permission(request, plate)
+        try:
+            rows, columns = get_plate_dimensions(plate)
+        except ValueError as e:
+            self.message_user(request, str(e), messages.ERROR)
+            return redirect("admin:igvf_mice_splitseqplate_change", quote(plate.pk))
+        reagent = get_plate_reagent(plate)
+
+        if request.method == "POST":
+            if not can_change:
+                raise PermissionDenied
+            reagent = request.POST.get("reagent") or reagent
+            cells = {}
+            for row in rows:
+                for column in columns:
+                    position = "{}{}".format(row, column)
+                    cells[position] = (
+                        split_names(request.POST.get("biosample-{}".format(position), "")),
+                        split_names(request.POST.get("barcode-{}".format(position), "")),
+                    )
+            try:
+                changed = save_plate_grid(plate, cells, reagent)
+            except ValidationError as e:
+                for message in e.messages:
+                    self.message_user(request, message, messages.ERROR)
+            else:
+                self.message_user(request, "Updated {} wells".format(changed), messages.SUCCESS)
+                return redirect(request.path)
+
+        cells = load_plate_grid(plate)
+        grid = []
+        for row in rows:
+            wells = []
+            for column in columns:
+                position = "{}{}".format(row, column)
+                cell = cells.get(position, {"biosamples": [], "barcodes": []})
+                wells.append({
+                    "position": position,
+                    "biosamples": ", ".join(cell["biosamples"]),
+                    "barcodes": ", ".join(cell["barcodes"]),
+                })
+            grid.append((row, wells))
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "{} wells".format(plate.name),
+            "opts": self.model._meta,
+            "original": plate,
+            "columns": columns,
+            "grid": grid,
+            "reagent": reagent,
+            "reagents": LibraryConstructionReagent.objects.values_list("name", flat=True),
+            "can_change": can_change,
+            "change_url": reverse("admin:igvf_mice_splitseqplate_change", args=[plate.pk]),
+        }
+        return TemplateResponse(
+            request, "admin/igvf_mice/splitseqplate/plate_grid.html", context)
+
+    @admin.display(ordering="total_nuclei")
+    def total_nuclei(self, obj):
+        return obj.total_nuclei
 
 
 class SplitSeqWellOptions(admin.ModelAdmin):
@@ -169,14 +311,24 @@ class SplitSeqWellOptions(admin.ModelAdmin):
     )
 
     list_filter = ["plate__name"]
+    list_select_related = ("plate",)
     filter_horizontal = ["biosample", "barcode"]
 
 
+class SplitSeqWellReadCountOptions(admin.ModelAdmin):
+    model = SplitSeqWellReadCount
+
+    list_display = ("plate", "well", "sequencing_file", "reads")
+    list_filter = ("plate",)
+    list_select_related = ("plate", "well__plate", "sequencing_file")
+
+
 class SubpoolOptions(admin.ModelAdmin):
     model = Subpool
 
     list_display = ("name", "plate", "nuclei", "cdna_pcr_rounds", "cdna_ng_per_ul", "cdna_volume", "cdna_average_bp_length", "index", "library_ng_per_ul", "library_average_bp_length")
     list_filter = ("plate",)
+    list_select_related = ("plate",)
 
     fields = (
         ("name", "plate"),
@@ -210,6 +362,7 @@ class SequencingRunOptions(admin.ModelAdmin):
 
     list_display = ("name", "platform", "plate")
     list_filter = ("platform", "plate")
+    list_select_related = ("platform", "plate")
 
     fields = (
         ("name", "plate"),
@@ -223,13 +376,20 @@ class LibraryInRunOptions(admin.ModelAdmin):
 
     list_filter = ("subpool__plate",)
     list_display = ("subpool", "status", "measurement_set")
+    list_select_related = ("subpool", "sequencing_run", "measurement_set")
 
 
 class SequencingFileOptions(admin.ModelAdmin):
     model = SequencingFile
 
     list_display = ("filename", "host", "md5sum", "library_in_run")
-    list_filter = ("filename", "host", "library_in_run",)
+    # filtering on filename or library_in_run listed every distinct
+    # value, so those are searched for instead
+    list_filter = ("host", "sequencing_run__platform")
+    search_fields = ("^filename", "=md5sum")
+    list_select_related = ("library_in_run__subpool", "library_in_run__sequencing_run")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     autocomplete_fields = ["accession",]
 
@@ -251,6 +411,7 @@ admin.site.register(Tissue, TissueOptions)
 admin.site.register(ParseFixedSample, ParseFixedSampleOptions)
 admin.site.register(SplitSeqPlate, SplitSeqPlateOptions)
 admin.site.register(SplitSeqWell, SplitSeqWellOptions)
+admin.site.register(SplitSeqWellReadCount, SplitSeqWellReadCountOptions)
 admin.site.register(Subpool, SubpoolOptions)
 admin.site.register(Platform, PlatformOptions)
 admin.site.register(SequencingRun, SequencingRunOptions)
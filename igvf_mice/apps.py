@@ -3,3 +3,17 @@ from django.apps import AppConfig
 
 class IgvfMiceConfig(AppConfig):
     name = 'igvf_mice'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+
+        from .io.database import apply_sqlite_pragmas
+        from .search import create_search_index
+
+        # connect the reference cache invalidation signals
+        from . import reference
+
+        connection_created.connect(apply_sqlite_pragmas)
+        post_migrate.connect(create_search_index, sender=self)
+        post_migrate.connect(reference.clear_reference_cache, sender=self)
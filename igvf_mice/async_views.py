@@ -0,0 +1,209 @@
+"""Read only async versions of the heaviest API endpoints
+
+The pipeline sample metadata and sequencing file endpoints walk a lot
+of relations for every row. The rest framework viewsets hold a worker
+thread for the whole request, while these views fetch the rows with
+the async ORM, load the relations the serializer needs up front, and
+then run the serializer in a small thread pool. Since everything the
+serializer reads is already loaded, the pool threads don't touch the
+database and many slow clients can share one process.
+
+The responses match the rest framework list and detail responses,
+including the page number pagination and filterset fields.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.urls import path
+from django_filters.filterset import filterset_factory
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from . import models
+from . import reference
+from . import serializers
+
+DEFAULT_SERIALIZER_THREADS = 4
+
+_serializer_executor = None
+
+
+def get_serializer_executor():
+    global _serializer_executor
+    if _serializer_executor is None:
+        _serializer_executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "IGVF_MICE_SERIALIZER_THREADS", DEFAULT_SERIALIZER_THREADS),
+            thread_name_prefix="igvf_mice_serializer",
+        )
+    return _serializer_executor
+
+
+def _serialize(serializer_class, instance, many, context):
+    try:
+        return serializer_class(instance, many=many, context=context).data
+    finally:
+        close_old_connections()
+
+
+async def serialize(serializer_class, instance, many, context):
+    """Run a serializer in the serializer thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_serializer_executor(),
+        functools.partial(_serialize, serializer_class, instance, many, context),
+    )
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+
+
+class AsyncReadOnlyEndpoint:
+    """Async list and detail views for one model
+
+    :param queryset: rows to list, it should be ordered
+    :param serializer_class: rest framework serializer to render rows
+    :param prefetch: prefetch_related lookups the serializer needs
+    :param reference_tables: ReferenceTables the serializer reads
+    :param filterset_fields: fields to filter the list by, like the
+        DjangoFilterBackend filterset_fields
+    """
+    def __init__(self, queryset, serializer_class, prefetch=(), reference_tables=(),
+                 filterset_fields=()):
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+        self.prefetch = prefetch
+        self.reference_tables = reference_tables
+        self.filterset_class = None
+        if filterset_fields:
+            self.filterset_class = filterset_factory(
+                queryset.model, fields=list(filterset_fields))
+
+    def get_page_size(self):
+        return settings.REST_FRAMEWORK.get("PAGE_SIZE", 100)
+
+    def filter_queryset(self, request):
+        """Return the filtered queryset and the filter errors"""
+        if self.filterset_class is None:
+            return self.queryset.all(), None
+
+        filterset = self.filterset_class(request.GET, queryset=self.queryset.all())
+        if not filterset.is_valid():
+            return None, filterset.errors
+        return filterset.qs, None
+
+    def load_related(self, instances):
+        prefetch_related_objects(instances, *self.prefetch)
+        for table in self.reference_tables:
+            table.all()
+
+    async def list(self, request):
+        if request.method not in ("GET", "HEAD"):
+            return HttpResponseNotAllowed(["GET", "HEAD"])
+
+        queryset, errors = await sync_to_async(self.filter_queryset)(request)
+        if errors is not None:
+            return json_response(errors, status=400)
+
+        page_size = self.get_page_size()
+        count = await queryset.acount()
+        try:
+            page = int(request.GET.get("page", 1))
+        except ValueError:
+            page = 0
+        last_page = max(1, (count + page_size - 1) // page_size)
+        if page < 1 or page > last_page:
+            return json_response({"detail": "Invalid page."}, status=404)
+
+        start = (page - 1) * page_size
+        instances = [x async for x in queryset[start:start + page_size].aiterator()]
+        await sync_to_async(self.load_related)(instances)
+        results = await serialize(
+            self.serializer_class, instances, True, {"request": request})
+
+        url = request.build_absolute_uri()
+        next_url = None
+        if page < last_page:
+            next_url = replace_query_param(url, "page", page + 1)
+        previous_url = None
+        if page == 2:
+            previous_url = remove_query_param(url, "page")
+        elif page > 2:
+            previous_url = replace_query_param(url, "page", page - 1)
+
+        return json_response({
+            "count": count,
+            "next": next_url,
+            "previous": previous_url,
+            "results": results,
+        })
+
+    async def retrieve(self, request, pk):
+        if request.method not in ("GET", "HEAD"):
+            return HttpResponseNotAllowed(["GET", "HEAD"])
+
+        try:
+            instance = await self.queryset.aget(pk=pk)
+        except (self.queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            # like get_object_or_404 in the rest framework a malformed pk
+            # is just another row that isn't there
+            return json_response({"detail": "Not found."}, status=404)
+
+        await sync_to_async(self.load_related)([instance])
+        data = await serialize(self.serializer_class, instance, False, {"request": request})
+        return json_response(data)
+
+    def urls(self, prefix, basename):
+        return [
+            path("{}/".format(prefix), self.list, name="{}-list".format(basename)),
+            path("{}/<str:pk>/".format(prefix), self.retrieve, name="{}-detail".format(basename)),
+        ]
+
+
+TISSUE_PREFETCH = [
+    "biosample__extraction__tissue__mouse",
+    "biosample__extraction__tissue__ontology_term",
+    "biosample__extraction__tissue__accession",
+    "biosample__extraction__tissue__sampleextraction_set",
+]
+
+pipeline_sample_metadata = AsyncReadOnlyEndpoint(
+    models.SplitSeqWell.objects.select_related("plate").order_by("plate", "row", "column"),
+    serializers.PipelineSampleMetadataSerializer,
+    prefetch=["barcode"] + TISSUE_PREFETCH,
+    reference_tables=[reference.mouse_strains],
+    filterset_fields=["plate__name"],
+)
+
+igvf_sequence_file = AsyncReadOnlyEndpoint(
+    models.SequencingFile.objects.select_related("sequencing_run").order_by("pk"),
+    serializers.IgvfSequenceFileSerializer,
+    prefetch=["accession"],
+    reference_tables=[reference.platforms],
+)
+
+sequencing_file = AsyncReadOnlyEndpoint(
+    models.SequencingFile.objects.order_by("pk"),
+    serializers.SequencingFileSerializer,
+    prefetch=["accession"],
+    filterset_fields=[
+        "md5sum",
+        "filename",
+        "host",
+        "sequencing_run__flowcell_id",
+        "library_in_run__subpool",
+    ],
+)
+
+urlpatterns = (
+    pipeline_sample_metadata.urls("pipeline/sample-metadata", "async-pipeline-sample-metadata")
+    + igvf_sequence_file.urls("igvf/sequence-file", "async-igvf-sequence-file")
+    + sequencing_file.urls("sequencing-file", "async-sequencing-file")
+)
@@ -0,0 +1,206 @@
+"""Compare database backends under concurrent imports and reads
+
+Writer threads import synthetic plates the way the loaders do, each
+plate with its wells, barcodes, subpools, run and files in one
+transaction, while reader threads keep listing the newest sequencing
+files like the API does. Running it against SQLite and PostgreSQL
+shows how much the single SQLite writer lock costs.
+
+Unlike the lookup benchmark the threads need committed data, so the
+synthetic rows are written for real and deleted again afterwards.
+"""
+import statistics
+import threading
+import time
+
+from django.db import connections, DatabaseError, DEFAULT_DB_ALIAS, transaction
+
+from .. import models
+
+BENCHMARK_PREFIX = "CONCURRENT"
+SUBPOOLS_PER_PLATE = 4
+FILES_PER_LIBRARY = [(lane, read) for lane in (1, 2) for read in ("R1", "R2")]
+WELL_CODES = ["{}{}".format(row, column) for row in "ABCDEFGH" for column in range(1, 13)]
+
+
+def _name(suffix):
+    return "{}_{}".format(BENCHMARK_PREFIX, suffix)
+
+
+def create_reference_rows(using=DEFAULT_DB_ALIAS):
+    """Create the source, platform, reagent and barcodes the imports use"""
+    source = models.Source.objects.using(using).create(
+        name=_name("source"), display_name="benchmark")
+    models.Platform.objects.using(using).create(
+        name=_name("platform"), display_name="benchmark", family="illumina")
+    reagent = models.LibraryConstructionReagent.objects.using(using).create(
+        name=_name("reagent"), display_name="benchmark", version="1", source=source)
+    models.LibraryBarcode.objects.using(using).bulk_create(
+        models.LibraryBarcode(
+            reagent=reagent,
+            name=code,
+            code=code,
+            i7_sequence="ACGT",
+            barcode_type=barcode_type,
+            well_position=code,
+        )
+        for code in WELL_CODES
+        for barcode_type in ["T", "R"]
+    )
+
+
+def import_plate(plate_name, using=DEFAULT_DB_ALIAS):
+    """Import one synthetic plate in a single transaction"""
+    barcodes = {}
+    for barcode_id, code in models.LibraryBarcode.objects.using(using).filter(
+            reagent=_name("reagent")).values_list("id", "code"):
+        barcodes.setdefault(code, []).append(barcode_id)
+
+    with transaction.atomic(using=using):
+        plate = models.SplitSeqPlate.objects.using(using).create(name=plate_name)
+        models.SplitSeqWell.objects.using(using).bulk_create(
+            models.SplitSeqWell(plate=plate, row=code[0], column=int(code[1:]))
+            for code in WELL_CODES
+        )
+        BarcodeThrough = models.SplitSeqWell.barcode.through
+        BarcodeThrough.objects.using(using).bulk_create(
+            BarcodeThrough(splitseqwell_id=well_id, librarybarcode_id=barcode_id)
+            for well_id, row, column in models.SplitSeqWell.objects.using(using).filter(
+                plate=plate).values_list("id", "row", "column")
+            for barcode_id in barcodes["{}{}".format(row, column)]
+        )
+
+        run = models.SequencingRun.objects.using(using).create(
+            name=plate_name, platform_id=_name("platform"), plate=plate)
+        for index in range(1, SUBPOOLS_PER_PLATE + 1):
+            subpool = models.Subpool.objects.using(using).create(
+                name="{}_{}".format(plate_name, index), plate=plate, nuclei=13000, index=str(index))
+            library = models.LibraryInRun.objects.using(using).create(
+                subpool=subpool, sequencing_run=run)
+            models.SequencingFile.objects.using(using).bulk_create(
+                models.SequencingFile(
+                    sequencing_run=run,
+                    library_in_run=library,
+                    filename="{}_L00{}_{}_001.fastq.gz".format(subpool.name, lane, read),
+                    lane=lane,
+                    read=read,
+                )
+                for lane, read in FILES_PER_LIBRARY
+            )
+
+
+def read_recent_files(using=DEFAULT_DB_ALIAS):
+    """List the newest sequencing files with their runs and subpools"""
+    files = list(
+        models.SequencingFile.objects.using(using)
+        .filter(sequencing_run__name__startswith=BENCHMARK_PREFIX)
+        .select_related("sequencing_run", "library_in_run__subpool")
+        .order_by("-pk")[:100]
+    )
+    wells = models.SplitSeqWell.objects.using(using).filter(
+        plate__name__startswith=BENCHMARK_PREFIX).count()
+    return len(files), wells
+
+
+def delete_benchmark_rows(using=DEFAULT_DB_ALIAS):
+    """Remove everything the benchmark created"""
+    def prefixed(model, field="name"):
+        return model.objects.using(using).filter(
+            **{"{}__startswith".format(field): BENCHMARK_PREFIX})
+
+    with transaction.atomic(using=using):
+        prefixed(models.SequencingFile, "sequencing_run__name").delete()
+        prefixed(models.LibraryInRun, "sequencing_run__name").delete()
+        prefixed(models.SequencingRun).delete()
+        prefixed(models.Subpool, "plate__name").delete()
+        prefixed(models.SplitSeqWell, "plate__name").delete()
+        prefixed(models.SplitSeqPlate).delete()
+        prefixed(models.LibraryBarcode, "reagent__name").delete()
+        prefixed(models.LibraryConstructionReagent).delete()
+        prefixed(models.Platform).delete()
+        prefixed(models.Source).delete()
+
+
+def summarize(latencies):
+    """Return the count, median and 95th percentile of a list of seconds, in ms"""
+    if len(latencies) == 0:
+        return {"count": 0, "p50_ms": None, "p95_ms": None}
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+    }
+
+
+def run_concurrent_benchmark(using=DEFAULT_DB_ALIAS, writers=2, readers=4, imports=10):
+    """Import plates from writer threads while reader threads query
+
+    Each writer imports imports plates, the readers read until the
+    writers are done. Failed operations, like SQLite's "database is
+    locked", are counted as errors instead of stopping the run.
+    Returns a dict with the database vendor, the elapsed seconds, the
+    summaries of the writes and reads, their error counts and the
+    first error message.
+    """
+    delete_benchmark_rows(using)
+    create_reference_rows(using)
+
+    lock = threading.Lock()
+    results = {"writes": [], "reads": [], "write_errors": 0, "read_errors": 0, "error": None}
+    writers_done = threading.Event()
+
+    def record(kind, duration=None, error=None):
+        with lock:
+            if error is None:
+                results[kind].append(duration)
+            else:
+                results["{}_errors".format(kind[:-1])] += 1
+                if results["error"] is None:
+                    results["error"] = str(error)
+
+    def timed(kind, function, *args):
+        start = time.perf_counter()
+        try:
+            function(*args)
+        except DatabaseError as e:
+            record(kind, error=e)
+        else:
+            record(kind, time.perf_counter() - start)
+
+    def writer(number):
+        try:
+            for i in range(imports):
+                timed("writes", import_plate, _name("{:03d}_{:05d}".format(number, i)), using)
+        finally:
+            connections[using].close()
+
+    def reader():
+        try:
+            while not writers_done.is_set():
+                timed("reads", read_recent_files, using)
+        finally:
+            connections[using].close()
+
+    writer_threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    reader_threads = [threading.Thread(target=reader) for _ in range(readers)]
+    start = time.perf_counter()
+    for thread in writer_threads + reader_threads:
+        thread.start()
+    for thread in writer_threads:
+        thread.join()
+    writers_done.set()
+    for thread in reader_threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    delete_benchmark_rows(using)
+    return {
+        "vendor": connections[using].vendor,
+        "elapsed_s": elapsed,
+        "writes": summarize(results["writes"]),
+        "reads": summarize(results["reads"]),
+        "write_errors": results["write_errors"],
+        "read_errors": results["read_errors"],
+        "error": results["error"],
+    }
@@ -0,0 +1,233 @@
+"""Match observed barcode sequences against LibraryBarcode records
+
+Sequences are packed into integers two bits per base behind a leading
+sentinel bit, so barcodes of different lengths never collide and
+whole arrays of reads can be matched with numpy.searchsorted instead
+of a python loop per read.
+"""
+import numpy
+
+# A=0, C=1, G=2, T=3 everything else is invalid
+_INVALID = 255
+_BASE_CODES = numpy.full(256, _INVALID, dtype=numpy.uint8)
+for _code, _bases in enumerate(["Aa", "Cc", "Gg", "Tt"]):
+    for _base in _bases:
+        _BASE_CODES[ord(_base)] = _code
+
+# keep room for the sentinel bit in a uint64
+MAX_BARCODE_LENGTH = 31
+NO_MATCH = -1
+
+
+def _as_ascii_matrix(sequences):
+    """Convert sequences to a 2D uint8 matrix and a vector of lengths
+
+    Accepts either a sequence of str/bytes, or an already extracted 2D
+    uint8 matrix of ASCII codes (one read per row).
+    """
+    sequences = numpy.asarray(sequences)
+
+    if sequences.ndim == 2 and sequences.dtype == numpy.uint8:
+        lengths = numpy.full(sequences.shape[0], sequences.shape[1], dtype=numpy.int64)
+        return sequences, lengths
+
+    if sequences.ndim != 1:
+        raise ValueError("Expected a 1D array of sequences or a 2D uint8 array")
+
+    # an empty list has no strings to give it a string dtype
+    if len(sequences) == 0:
+        return numpy.zeros((0, 0), dtype=numpy.uint8), numpy.zeros(0, dtype=numpy.int64)
+
+    if sequences.dtype.kind == "U":
+        sequences = numpy.char.encode(sequences, "ascii")
+    elif sequences.dtype.kind == "O":
+        sequences = numpy.array(
+            [x.encode("ascii") if isinstance(x, str) else (x or b"") for x in sequences],
+            dtype=bytes,
+        )
+    elif sequences.dtype.kind != "S":
+        raise ValueError("Unsupported sequence dtype {}".format(sequences.dtype))
+
+    lengths = numpy.char.str_len(sequences).astype(numpy.int64)
+    width = max(sequences.dtype.itemsize, 1)
+    matrix = numpy.frombuffer(
+        numpy.ascontiguousarray(sequences, dtype="S{}".format(width)).tobytes(),
+        dtype=numpy.uint8,
+    ).reshape(len(sequences), width)
+    return matrix, lengths
+
+
+def pack_sequences(sequences):
+    """Pack DNA sequences into uint64 keys
+
+    Returns a tuple of (keys, valid). Sequences containing anything
+    other than ACGT, or that are longer than MAX_BARCODE_LENGTH are
+    marked invalid and their key should be ignored.
+    """
+    matrix, lengths = _as_ascii_matrix(sequences)
+    codes = _BASE_CODES[matrix]
+
+    keys = numpy.ones(len(lengths), dtype=numpy.uint64)
+    valid = (lengths > 0) & (lengths <= MAX_BARCODE_LENGTH)
+    for column in range(min(codes.shape[1], MAX_BARCODE_LENGTH)):
+        in_sequence = column < lengths
+        column_codes = codes[:, column]
+        valid &= ~in_sequence | (column_codes != _INVALID)
+        keys = numpy.where(
+            in_sequence,
+            (keys << numpy.uint64(2)) | (column_codes & 3).astype(numpy.uint64),
+            keys,
+        )
+
+    return keys, valid
+
+
+def _single_mismatch_neighbors(keys, lengths):
+    """Generate every single substitution for each packed key
+
+    Returns (neighbor_keys, source_offsets) where source_offsets are
+    indexes into keys.
+    """
+    neighbors = []
+    sources = []
+    for offset in range(int(lengths.max(initial=0))):
+        has_position = offset < lengths
+        shift = numpy.uint64(2 * offset)
+        current = keys[has_position]
+        for delta in (1, 2, 3):
+            neighbors.append(current ^ (numpy.uint64(delta) << shift))
+            sources.append(numpy.flatnonzero(has_position))
+
+    if len(neighbors) == 0:
+        return numpy.array([], dtype=numpy.uint64), numpy.array([], dtype=numpy.int64)
+
+    return numpy.concatenate(neighbors), numpy.concatenate(sources)
+
+
+class BarcodeIndex:
+    """Exact and one mismatch lookup table for a set of barcodes
+
+    :param barcode_ids: list of values to return for each barcode,
+        usually the LibraryBarcode primary keys. Ids may repeat when
+        several sequences should resolve to the same thing.
+    :param sequences: list of barcode sequences
+    :param max_mismatches: 0 for exact matching only, or 1 to also
+        accept a single substitution when it is unambiguous.
+    """
+    def __init__(self, barcode_ids, sequences, max_mismatches=1):
+        if max_mismatches not in (0, 1):
+            raise ValueError("Only 0 or 1 mismatches are supported")
+
+        barcode_ids = numpy.asarray(barcode_ids, dtype=numpy.int64)
+        keys, valid = pack_sequences(sequences)
+        if not valid.all():
+            bad = numpy.asarray(sequences, dtype=object)[~valid]
+            raise ValueError("Invalid barcode sequences {}".format(list(bad)))
+
+        _, counts = numpy.unique(keys, return_counts=True)
+        if (counts > 1).any():
+            raise ValueError("Duplicate barcode sequences in index")
+
+        self.max_mismatches = max_mismatches
+        order = numpy.argsort(keys)
+        self._exact_keys = keys[order]
+        self._exact_ids = barcode_ids[order]
+
+        self._neighbor_keys = numpy.array([], dtype=numpy.uint64)
+        self._neighbor_ids = numpy.array([], dtype=numpy.int64)
+        if max_mismatches == 1:
+            _, lengths = _as_ascii_matrix(sequences)
+            neighbor_keys, sources = _single_mismatch_neighbors(keys, lengths)
+            # several barcodes may share an id (e.g. the random hexamer
+            # and oligo-dT barcodes of one well), so only count a
+            # neighbor as ambiguous when it leads to different ids.
+            pairs = numpy.unique(
+                numpy.rec.fromarrays(
+                    [neighbor_keys, barcode_ids[sources]], names="key,id"))
+            neighbor_keys, first, counts = numpy.unique(
+                pairs["key"], return_index=True, return_counts=True)
+            # drop neighbors that are within 1 of two barcodes or
+            # are another barcode
+            unambiguous = counts == 1
+            unambiguous &= ~numpy.isin(neighbor_keys, self._exact_keys)
+            self._neighbor_keys = neighbor_keys[unambiguous]
+            self._neighbor_ids = pairs["id"][first[unambiguous]]
+
+    def __len__(self):
+        return len(self._exact_keys)
+
+    @classmethod
+    def from_queryset(cls, queryset, sequence_field="i7_sequence", max_mismatches=1):
+        """Build an index from a LibraryBarcode queryset"""
+        records = list(queryset.exclude(
+            **{"{}__isnull".format(sequence_field): True}
+        ).values_list("id", sequence_field))
+        barcode_ids = [x[0] for x in records]
+        sequences = [x[1] for x in records]
+        return cls(barcode_ids, sequences, max_mismatches=max_mismatches)
+
+    @staticmethod
+    def _search(haystack, needles):
+        if len(haystack) == 0:
+            return numpy.zeros(len(needles), dtype=bool), numpy.zeros(len(needles), dtype=numpy.int64)
+        offsets = numpy.searchsorted(haystack, needles)
+        offsets = numpy.minimum(offsets, len(haystack) - 1)
+        return haystack[offsets] == needles, offsets
+
+    def lookup_array(self, sequences, return_distance=False):
+        """Match an array of observed sequences
+
+        Returns an int64 array of barcode ids with NO_MATCH where
+        there was no unambiguous match. When return_distance is True
+        also returns the number of mismatches for each hit (or -1).
+        """
+        keys, valid = pack_sequences(sequences)
+        result = numpy.full(len(keys), NO_MATCH, dtype=numpy.int64)
+        distance = numpy.full(len(keys), -1, dtype=numpy.int8)
+
+        found, offsets = self._search(self._exact_keys, keys)
+        found &= valid
+        result[found] = self._exact_ids[offsets[found]]
+        distance[found] = 0
+
+        remaining = valid & ~found
+        if self.max_mismatches > 0 and remaining.any():
+            neighbor_found, offsets = self._search(self._neighbor_keys, keys[remaining])
+            remaining_index = numpy.flatnonzero(remaining)[neighbor_found]
+            result[remaining_index] = self._neighbor_ids[offsets[neighbor_found]]
+            distance[remaining_index] = 1
+
+        if return_distance:
+            return result, distance
+        return result
+
+    def lookup(self, sequence):
+        """Return the barcode id matching a single sequence or None"""
+        barcode_id = self.lookup_array([sequence])[0]
+        if barcode_id == NO_MATCH:
+            return None
+        return int(barcode_id)
+
+
+def build_barcode_indexes(reagent=None, sequence_field="i7_sequence", max_mismatches=1):
+    """Build a BarcodeIndex for each (reagent, barcode_type) pair
+
+    :param reagent: optional LibraryConstructionReagent or name to limit
+        which indexes are built.
+    """
+    # imported here so worker processes can unpickle an index without
+    # configuring django
+    from .. import models
+
+    barcodes = models.LibraryBarcode.objects.all()
+    if reagent is not None:
+        barcodes = barcodes.filter(reagent=reagent)
+
+    partitions = barcodes.order_by().values_list("reagent", "barcode_type").distinct()
+    indexes = {}
+    for reagent_name, barcode_type in partitions:
+        # filter(barcode_type=None) becomes IS NULL for the illumina indexes
+        queryset = barcodes.filter(reagent=reagent_name, barcode_type=barcode_type)
+        indexes[(reagent_name, barcode_type)] = BarcodeIndex.from_queryset(
+            queryset, sequence_field=sequence_field, max_mismatches=max_mismatches)
+    return indexes
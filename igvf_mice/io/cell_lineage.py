@@ -0,0 +1,212 @@
+"""Attach database sample lineage to the cells of an h5ad obs table
+
+The obs cellID is bc1_bc2_bc3_subpool_plate, e.g. 45_12_88_13A_igvf_003,
+so the round 1 barcode and the plate name are enough to find the
+:model:`igvf_mice.SplitSeqWell` a cell came from, and from there the
+samples, tissues and mice.
+
+Millions of cells only share a few thousand (plate, bc1) pairs, so the
+lineage is looked up once per distinct pair and then broadcast back to
+the cells with numpy.
+"""
+import re
+
+import numpy
+import pandas
+
+from .. import models
+from .converters import normalize_plate_name
+
+CELL_ID_FIELDS = ["bc1", "bc2", "bc3", "subpool", "plate"]
+
+# columns added to obs, named after the DEFINITIONS in the h5ad report
+LINEAGE_COLUMNS = [
+    "bc1_well",
+    "parse_fixed_sample",
+    "lab_sample_id",
+    "sample_accession",
+    "mouse_id",
+    "donor_accession",
+]
+
+_WELL_RE = re.compile("^[A-P][0-9]{1,2}$")
+_SEQUENCE_RE = re.compile("^[ACGTN]+$")
+WELLS_PER_ROW = 12
+
+
+def parse_cell_ids(cell_ids):
+    """Split cellIDs into a DataFrame of bc1, bc2, bc3, subpool and plate
+
+    The plate name may itself contain underscores so only the first
+    four are split. cellIDs that don't have all five parts have
+    missing values.
+    """
+    cell_ids = pandas.Series(numpy.asarray(cell_ids, dtype=object))
+    parts = cell_ids.str.split("_", n=len(CELL_ID_FIELDS) - 1, expand=True)
+    parts = parts.reindex(columns=range(len(CELL_ID_FIELDS)))
+    parts.columns = CELL_ID_FIELDS
+    return parts
+
+
+def bc1_to_well_position(bc1):
+    """Convert a round 1 barcode label to a well position or sequence
+
+    The pipelines have written bc1 as a 1 based well number (1 is A1,
+    13 is B1), a well name, or the barcode sequence, so the result is
+    either a well position like "B1" or an upper case sequence.
+    Returns None for anything else.
+    """
+    if pandas.isnull(bc1):
+        return None
+
+    bc1 = str(bc1).upper()
+    if bc1.isdigit():
+        number = int(bc1) - 1
+        if number < 0 or number >= 8 * WELLS_PER_ROW:
+            return None
+        return "{}{}".format(chr(ord("A") + number // WELLS_PER_ROW), number % WELLS_PER_ROW + 1)
+    elif _WELL_RE.match(bc1):
+        return "{}{}".format(bc1[0], int(bc1[1:]))
+    elif _SEQUENCE_RE.match(bc1):
+        return bc1
+    return None
+
+
+def _join_unique(values):
+    values = sorted(set(x for x in values if not pandas.isnull(x)))
+    if len(values) == 0:
+        return None
+    return ",".join(values)
+
+
+def get_plate_lineage(plate, accession_prefix=models.AccessionNamespacesEnum.IGVF):
+    """Build the lookup table from round 1 barcodes to sample lineage for a plate
+
+    Returns a DataFrame indexed by both the well position and the i7
+    sequence of every round 1 barcode linked to the plate wells, with
+    one column per entry of LINEAGE_COLUMNS. Wells holding several
+    samples have comma separated values.
+
+    :param plate: SplitSeqPlate or its name
+    :param accession_prefix: only report accessions from this namespace
+    """
+    barcodes = pandas.DataFrame(
+        models.SplitSeqWell.barcode.through.objects.filter(
+            splitseqwell__plate=plate,
+        ).values_list(
+            "splitseqwell_id",
+            "librarybarcode__well_position",
+            "librarybarcode__i7_sequence",
+        ),
+        columns=["well_id", "well_position", "sequence"],
+    )
+
+    tissue = "biosample__extraction__tissue"
+    lineage = pandas.DataFrame(
+        models.SplitSeqWell.objects.filter(plate=plate).values_list(
+            "id",
+            "biosample__name",
+            "{}__name".format(tissue),
+            "{}__accession__accession_prefix".format(tissue),
+            "{}__accession__name".format(tissue),
+            "{}__mouse__name".format(tissue),
+            "{}__mouse__accession__accession_prefix".format(tissue),
+            "{}__mouse__accession__name".format(tissue),
+        ),
+        columns=[
+            "well_id",
+            "parse_fixed_sample",
+            "lab_sample_id",
+            "sample_prefix",
+            "sample_accession",
+            "mouse_id",
+            "donor_prefix",
+            "donor_accession",
+        ],
+    )
+    # the accession joins are outer joins, so blank out the other
+    # namespaces instead of filtering rows away
+    lineage.loc[lineage["sample_prefix"] != accession_prefix, "sample_accession"] = None
+    lineage.loc[lineage["donor_prefix"] != accession_prefix, "donor_accession"] = None
+    lineage = lineage.groupby("well_id").agg({
+        name: _join_unique for name in LINEAGE_COLUMNS[1:]
+    })
+
+    barcodes["bc1_well"] = barcodes["well_position"]
+    by_position = barcodes[["well_id", "bc1_well", "well_position"]].rename(
+        columns={"well_position": "key"})
+    by_sequence = barcodes[["well_id", "bc1_well", "sequence"]].rename(
+        columns={"sequence": "key"})
+    keys = pandas.concat([by_position, by_sequence]).dropna(subset=["key"])
+    keys = keys.drop_duplicates(subset=["key", "well_id"])
+
+    table = keys.merge(lineage, left_on="well_id", right_index=True, how="left")
+    # both the oligo-dT and random hexamer barcodes point to the same
+    # well so the position keys repeat
+    table = table.drop_duplicates(subset=["key"]).set_index("key")
+    return table[LINEAGE_COLUMNS]
+
+
+def get_cell_lineage(cell_ids, accession_prefix=models.AccessionNamespacesEnum.IGVF):
+    """Look up the sample lineage of a list of cellIDs
+
+    Returns a DataFrame with the same order as cell_ids containing
+    the parsed CELL_ID_FIELDS and LINEAGE_COLUMNS, all as
+    categoricals. Cells whose plate or well isn't in the database get
+    missing values.
+    """
+    parsed = parse_cell_ids(cell_ids)
+
+    plate_codes, plates = pandas.factorize(parsed["plate"])
+    bc1_codes, bc1s = pandas.factorize(parsed["bc1"])
+    # give missing values their own code so they survive the unique
+    pair_codes = (plate_codes.astype(numpy.int64) + 1) * (len(bc1s) + 1) + (bc1_codes + 1)
+    unique_pairs, inverse = numpy.unique(pair_codes, return_inverse=True)
+    pair_plate = unique_pairs // (len(bc1s) + 1) - 1
+    pair_bc1 = unique_pairs % (len(bc1s) + 1) - 1
+
+    pairs = pandas.DataFrame({
+        "plate": [None if x < 0 else normalize_plate_name(plates[x]) for x in pair_plate],
+        "key": [None if x < 0 else bc1_to_well_position(bc1s[x]) for x in pair_bc1],
+    })
+
+    known_plates = set(models.SplitSeqPlate.objects.filter(
+        name__in=pairs["plate"].dropna().unique()).values_list("name", flat=True))
+    tables = []
+    for plate in sorted(known_plates):
+        table = get_plate_lineage(plate, accession_prefix=accession_prefix)
+        table["plate"] = plate
+        tables.append(table.reset_index())
+
+    if len(tables) > 0:
+        lookup = pandas.concat(tables, ignore_index=True)
+        pairs = pairs.merge(lookup, on=["plate", "key"], how="left")
+    else:
+        pairs = pairs.reindex(columns=["plate", "key"] + LINEAGE_COLUMNS)
+
+    result = {}
+    for name in CELL_ID_FIELDS:
+        result[name] = pandas.Categorical(parsed[name])
+    for name in LINEAGE_COLUMNS:
+        codes, categories = pandas.factorize(pairs[name])
+        result[name] = pandas.Categorical.from_codes(codes[inverse], categories=categories)
+
+    return pandas.DataFrame(result, index=pandas.Index(cell_ids))
+
+
+def annotate_cell_lineage(obs, cell_id_column=None,
+                          accession_prefix=models.AccessionNamespacesEnum.IGVF):
+    """Add the LINEAGE_COLUMNS to an obs DataFrame as categoricals
+
+    :param obs: an AnnData obs table, modified in place and returned
+    :param cell_id_column: column holding the cellIDs, defaults to the index
+    """
+    if cell_id_column is None:
+        cell_ids = obs.index
+    else:
+        cell_ids = obs[cell_id_column]
+
+    lineage = get_cell_lineage(cell_ids, accession_prefix=accession_prefix)
+    for name in LINEAGE_COLUMNS:
+        obs[name] = lineage[name].values
+    return obs
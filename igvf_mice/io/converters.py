@@ -7,12 +7,12 @@ conversion.
 from collections import namedtuple
 from collections.abc import Sequence
 import datetime
+import functools
 import numpy
 import pandas
+import re
 import zoneinfo
 
-from .validators import validate_mouse_age_sex
-
 
 def convert_plate_id_to_name(value):
     if pandas.notnull(value):
@@ -131,6 +131,142 @@ def str_or_none(x):
         return x
 
 
+# The column versions of the converters above. They take a whole
+# pandas.Series and return a Series with the same index, missing
+# values use the pandas nullable dtypes.
+#
+# Spreadsheet columns repeat the same few values, so object columns
+# are factorized and only the distinct values are converted.
+EXCEL_ERRORS = ["N/A", "#DIV/0!", "#VALUE!", "-"]
+EXCEL_BLANKS = EXCEL_ERRORS + [""]
+_INTEGER_STRING = r"^\s*[+-]?[0-9]+\s*$"
+
+
+def _convert_column(series, convert):
+    """Apply a Series converter to the distinct values of a column"""
+    series = pandas.Series(series)
+    if series.dtype != object:
+        return convert(series)
+
+    codes, uniques = pandas.factorize(series)
+    converted = convert(pandas.Series(uniques, dtype=object))
+    # factorize marks missing values with -1, which reindex fills with NaN
+    values = converted.reindex(codes)
+    values.index = series.index
+    values.name = series.name
+    return values
+
+
+def _strip_strings(series):
+    if series.dtype != object:
+        return series
+    is_string = series.map(type) == str
+    if not is_string.any():
+        return series
+    return series.where(~is_string, series[is_string].str.strip())
+
+
+def _scalar_fallback(values, present, failed, scalar):
+    """Convert the values a column converter couldn't parse one by one
+
+    pandas.to_numeric is stricter than float() and int(), it rejects
+    strings like "nan", "1_000" or non-ASCII digits. Those go through
+    the scalar converter instead, which raises the usual ValueError
+    for values neither accepts.
+    """
+    if not failed.any():
+        return values
+    values = values.astype(object)
+    values[failed] = present[failed].map(scalar)
+    return values
+
+
+def _to_float(series):
+    missing = series.isna() | series.isin(EXCEL_ERRORS)
+    present = series.mask(missing)
+    values = pandas.to_numeric(present, errors="coerce")
+    # to_numeric also turns blank strings into NaN, float() rejects them
+    failed = values.isna() & present.notna()
+    return _scalar_fallback(values, present, failed, float_or_none).astype("Float64")
+
+
+def float_or_none_series(series):
+    """Convert a column like float_or_none to Float64"""
+    return _convert_column(series, _to_float).astype("Float64")
+
+
+def _to_float_or_nan(series):
+    missing = series.isna() | _strip_strings(series).isin(EXCEL_BLANKS + ["missing"])
+    present = series.mask(missing)
+    values = pandas.to_numeric(present, errors="coerce")
+    failed = values.isna() & present.notna()
+    return _scalar_fallback(values, present, failed, float_or_nan).astype(numpy.float64)
+
+
+def float_or_nan_series(series):
+    """Convert a column like float_or_nan to float64"""
+    return _convert_column(series, _to_float_or_nan).astype(numpy.float64)
+
+
+def _to_int(series):
+    missing = series.isna() | _strip_strings(series).isin(EXCEL_BLANKS)
+    present = series.mask(missing)
+
+    # int() rejects "3.5" while to_numeric accepts it, so only plain
+    # integer strings are parsed as a column
+    failed = pandas.Series(False, index=present.index)
+    if present.dtype == object:
+        is_string = present.map(type) == str
+        strings = present.where(is_string, "0").astype(str)
+        failed = is_string & ~strings.str.match(_INTEGER_STRING)
+
+    values = pandas.to_numeric(present.mask(failed), errors="coerce")
+    failed |= values.isna() & present.notna()
+    if values.dtype.kind == "f":
+        # int() truncates floats toward zero
+        values = numpy.trunc(values)
+    values = values.mask(failed).astype("Int64")
+    return _scalar_fallback(values, present, failed, int_or_none).astype("Int64")
+
+
+def int_or_none_series(series):
+    """Convert a column like int_or_none to Int64"""
+    return _convert_column(series, _to_int).astype("Int64")
+
+
+def positive_int_or_none_series(series):
+    """Convert a column like positive_int_or_none to Int64"""
+    values = int_or_none_series(series)
+    return values.mask(values < 0)
+
+
+def _to_date(series):
+    if series.dtype.kind == "M":
+        return series.dt.date.astype(object).where(series.notna(), None)
+
+    missing = series.isna() | series.isin(["-"]) | (series == 0)
+    is_datetime = series.map(type).isin([datetime.datetime, pandas.Timestamp])
+    result = series.copy()
+    if is_datetime.any():
+        result[is_datetime] = pandas.to_datetime(series[is_datetime]).dt.date
+    return result.where(~missing, None)
+
+
+def date_or_none_series(series):
+    """Convert a column like date_or_none to an object column of dates
+
+    Datetimes become dates, other values are passed through.
+    """
+    dates = _convert_column(series, _to_date).astype(object)
+    return dates.where(dates.notna(), None)
+
+
+def str_or_none_series(series):
+    """Convert a column like str_or_none, with None for missing values"""
+    series = pandas.Series(series).astype(object)
+    return series.where(series.notna(), None)
+
+
 def normalize_barcode_index(value):
     if isinstance(value, str):
         if value.startswith("UDI_WT_"):
@@ -166,6 +302,32 @@ def normalize_mice_date(date_column, time_column):
             yield datetime.datetime.combine(date, time)
 
 
+def normalize_mice_date_series(date_column, time_column):
+    """Combine date and time columns into one datetime64 column
+
+    Like normalize_mice_date, missing or "-" values give NaT. Instead
+    of raising, entries with the wrong types are returned as NaT and
+    flagged in the invalid mask.
+
+    Returns (datetimes, invalid) as Series aligned to date_column.
+    """
+    dates = pandas.Series(date_column, dtype=object)
+    times = pandas.Series(time_column, dtype=object, index=dates.index)
+
+    missing = dates.isna() | times.isna() | (dates == "-") | (times == "-")
+    is_date = dates.map(type).isin([datetime.date, datetime.datetime, pandas.Timestamp])
+    is_time = times.map(type) == datetime.time
+    valid = ~missing & is_date & is_time
+
+    result = pandas.Series(pandas.NaT, index=dates.index, dtype="datetime64[ns]")
+    if valid.any():
+        days = pandas.to_datetime(dates[valid]).dt.normalize()
+        offsets = pandas.to_timedelta(times[valid].astype(str))
+        result[valid] = days + offsets
+
+    return result, ~missing & ~valid
+
+
 genotype_to_strain = {
     "129S1/SvImJ": "129S1J",
     "B6129SF1/J": "B6129S1F1J",
@@ -232,6 +394,61 @@ mouse_tissue_tuple_lens = {
     len(mouse_tissue_tuple._fields),
 }
 
+# mouse_id_strain[_L|_D]_agesex, with _tissue for tissue ids, e.g.
+# 778_B6J_L_12F_03. Age is a number of months or 6mo, sex is M or F.
+_MOUSE_NAME_PATTERN = (
+    r"(?P<mouse_id>[^_]+)_(?P<strain>[^_]+)(?:_(?P<light_status>[LD]))?"
+    r"_(?P<age>[0-9]+|6mo)(?P<sex>[MF])"
+)
+MOUSE_NAME_RE = re.compile("^{}$".format(_MOUSE_NAME_PATTERN))
+MOUSE_TISSUE_RE = re.compile("^{}_(?P<tissue_id>[^_]+)$".format(_MOUSE_NAME_PATTERN))
+
+
+def _match_mouse_grammar(grammar, value, description):
+    match = grammar.match(value) if isinstance(value, str) else None
+    if match is None:
+        raise ValueError("{!r} is not a valid {}".format(value, description))
+    return match
+
+
+def _parse_mouse_series(series, grammar, description, errors):
+    series = pandas.Series(series)
+    codes, uniques = pandas.factorize(series)
+    uniques = pandas.Series(uniques, dtype=object)
+
+    is_string = uniques.map(type) == str
+    parsed = uniques[is_string].astype(str).str.extract(grammar)
+    parsed = parsed.reindex(uniques.index)
+    invalid = parsed["mouse_id"].isna()
+    if errors == "raise" and invalid.any():
+        raise ValueError("{!r} is not a valid {}".format(uniques[invalid].iloc[0], description))
+    elif errors not in ("raise", "coerce"):
+        raise ValueError("errors must be raise or coerce")
+
+    parsed["strain"] = parsed["strain"].replace(genotype_to_strain)
+    # factorize marks missing values with -1, which reindex fills with NaN
+    parsed = parsed.reindex(codes)
+    parsed.index = series.index
+    return parsed
+
+
+def parse_mouse_name_series(series, errors="raise"):
+    """Parse a column of mouse names into a DataFrame
+
+    Returns the columns mouse_id, strain, light_status, age and sex.
+    Missing values give rows of missing values. Invalid names raise a
+    ValueError, or with errors="coerce" are treated as missing.
+    """
+    return _parse_mouse_series(series, MOUSE_NAME_RE, "mouse name", errors)
+
+
+def parse_mouse_tissue_series(series, errors="raise"):
+    """Parse a column of mouse tissue ids into a DataFrame
+
+    Like parse_mouse_name_series with an additional tissue_id column.
+    """
+    return _parse_mouse_series(series, MOUSE_TISSUE_RE, "mouse tissue id", errors)
+
 
 def parse_mouse_age_sex(mouse_age_sex):
     """Parse age/sex combined files like 10F or 6moM"""
@@ -268,30 +485,16 @@ def join_mouse_age_sex(value):
     return mouse_age + mouse_sex
 
 
+@functools.lru_cache(maxsize=4096)
 def parse_mouse_name(mouse_name):
-    # mouse_id_end = mouse_name.find("_")
-    # mouse_age_sex_start = mouse_name.rfind("_") + 1
-
-    # mouse_id = mouse_name[0:mouse_id_end]
-    # mouse_strain = normalize_strain(mouse_name[mouse_id_end+1:mouse_age_sex_start-1])
-    # mouse_age, mouse_sex = parse_mouse_age_sex(mouse_name[mouse_age_sex_start:])
-    # return mouse_name_tuple(mouse_id, mouse_strain, mouse_age, mouse_sex)
-
-    fields = mouse_name.split("_")
-
-    mouse_id = fields.pop(0)
-    mouse_strain = fields.pop(0)
-    mouse_strain = normalize_strain(mouse_strain)
-    if fields[0] in ("L", "D"):
-        light_status = fields.pop(0)
-    else:
-        light_status = None
-    mouse_age_sex = fields.pop(0)
-    mouse_age, mouse_sex = parse_mouse_age_sex(mouse_age_sex)
-    validate_mouse_age_sex(mouse_age_sex)
-    assert len(fields) == 0
-
-    return mouse_name_tuple(mouse_id, mouse_strain, light_status, mouse_age, mouse_sex)
+    match = _match_mouse_grammar(MOUSE_NAME_RE, mouse_name, "mouse name")
+    return mouse_name_tuple(
+        match["mouse_id"],
+        normalize_strain(match["strain"]),
+        match["light_status"],
+        match["age"],
+        match["sex"],
+    )
 
 
 def join_mouse_name(value):
@@ -327,24 +530,16 @@ def join_mouse_name(value):
     return "_".join(fields)
 
 
+@functools.lru_cache(maxsize=4096)
 def parse_mouse_tissue(mouse_tissue):
-    fields = mouse_tissue.split("_")
-
-    mouse_id = fields.pop(0)
-    mouse_strain = fields.pop(0)
-    mouse_strain = normalize_strain(mouse_strain)
-    if fields[0] in ("L", "D"):
-        light_status = fields.pop(0)
-    else:
-        light_status = None
-    mouse_age_sex = fields.pop(0)
-    mouse_age, mouse_sex = parse_mouse_age_sex(mouse_age_sex)
-    validate_mouse_age_sex(mouse_age_sex)
-    tissue_id = fields.pop(0)
-    assert len(fields) == 0
-
+    match = _match_mouse_grammar(MOUSE_TISSUE_RE, mouse_tissue, "mouse tissue id")
     return mouse_tissue_tuple(
-        mouse_id, mouse_strain, light_status, mouse_age, mouse_sex, tissue_id
+        match["mouse_id"],
+        normalize_strain(match["strain"]),
+        match["light_status"],
+        match["age"],
+        match["sex"],
+        match["tissue_id"],
     )
 
 
@@ -382,15 +577,49 @@ def get_strain_from_mouse_tissue(mouse_tissue):
     return fields[1]
 
 
-def uci_tz_or_none(value):
-    los_angeles_tz = zoneinfo.ZoneInfo("America/Los_Angeles")
+UCI_TZ = zoneinfo.ZoneInfo("America/Los_Angeles")
 
+
+def uci_tz_or_none(value):
     if pandas.isnull(value):
         return None
     elif isinstance(value, pandas.Timestamp):
-        return value.tz_localize("America/Los_Angeles")
+        return value.tz_localize(UCI_TZ)
     elif isinstance(value, datetime.datetime):
-        return value.astimezone(los_angeles_tz)
+        return value.astimezone(UCI_TZ)
+
+
+def uci_tz_or_none_series(series):
+    """Localize a column of UCI datetimes and convert them to UTC
+
+    Naive values are taken to be Los Angeles time. Anything that isn't
+    a datetime, or a wall clock time skipped or repeated by a daylight
+    savings change, becomes NaT and is flagged in the invalid mask.
+
+    Returns (datetimes, invalid) as Series with the same index.
+    """
+    series = pandas.Series(series)
+    if series.dtype.kind == "M":
+        local = series
+        if series.dt.tz is None:
+            local = series.dt.tz_localize(UCI_TZ, ambiguous="NaT", nonexistent="NaT")
+        result = local.dt.tz_convert("UTC")
+        return result, result.isna() & series.notna()
+
+    values = series.astype(object)
+    is_datetime = values.map(lambda x: isinstance(x, datetime.datetime))
+    is_aware = is_datetime & values.map(lambda x: getattr(x, "tzinfo", None) is not None)
+    naive = is_datetime & ~is_aware
+
+    result = pandas.Series(pandas.NaT, index=series.index, dtype="datetime64[ns, UTC]")
+    if naive.any():
+        local = pandas.to_datetime(values[naive].tolist()).tz_localize(
+            UCI_TZ, ambiguous="NaT", nonexistent="NaT")
+        result[naive] = local.tz_convert("UTC")
+    if is_aware.any():
+        result[is_aware] = pandas.to_datetime(values[is_aware].tolist(), utc=True)
+
+    return result, series.notna() & result.isna()
 
 
 def instrument_name_to_platform_id(value):
@@ -0,0 +1,104 @@
+"""Database maintenance helpers that work on SQLite and PostgreSQL
+
+SQLite connections also get a performance profile when they are
+opened. Write ahead logging lets the API keep reading while a loader
+holds a long write transaction, and the busy timeout makes a second
+writer wait for the first instead of failing. IGVF_MICE_SQLITE_PRAGMAS
+replaces the default pragmas, an empty dict leaves SQLite alone.
+"""
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connections, DEFAULT_DB_ALIAS
+
+# applied in this order, journal_mode first since it takes a lock
+DEFAULT_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    # with WAL only a power loss can roll back the last transactions
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    # negative sizes are in KiB
+    "cache_size": -64 * 1024,
+    "busy_timeout": 5000,
+    "foreign_keys": "ON",
+}
+
+
+def get_sqlite_pragmas():
+    pragmas = getattr(settings, "IGVF_MICE_SQLITE_PRAGMAS", None)
+    if pragmas is None:
+        return DEFAULT_SQLITE_PRAGMAS
+    return pragmas
+
+
+def apply_sqlite_pragmas(sender=None, connection=None, **kwargs):
+    """connection_created receiver setting the SQLite pragmas"""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in get_sqlite_pragmas().items():
+            cursor.execute("PRAGMA {} = {}".format(name, value))
+
+
+def get_sqlite_pragma(name, using=DEFAULT_DB_ALIAS):
+    with connections[using].cursor() as cursor:
+        cursor.execute("PRAGMA {}".format(name))
+        return cursor.fetchone()[0]
+
+
+def truncate(*model_classes, cascade=False, using=DEFAULT_DB_ALIAS):
+    """Delete every row of the models and restart their id sequences
+
+    The tables are emptied in one statement list, so models that
+    refer to each other can be truncated together.
+
+    :param cascade: also empty the tables with foreign keys to these
+        models. Without it PostgreSQL refuses to truncate a table
+        that a model not listed refers to, while SQLite empties it
+        and leaves the references dangling.
+    """
+    connection = connections[using]
+    tables = [model._meta.db_table for model in model_classes]
+    sql_list = connection.ops.sql_flush(
+        no_style(), tables, reset_sequences=True, allow_cascade=cascade)
+    connection.ops.execute_sql_flush(sql_list)
+
+
+def reset_sequences(*model_classes, using=DEFAULT_DB_ALIAS):
+    """Move the id sequences past rows inserted with explicit ids
+
+    loaddata does this after loading fixtures. SQLite doesn't need it
+    and gets no statements.
+    """
+    connection = connections[using]
+    sql_list = connection.ops.sequence_reset_sql(no_style(), model_classes)
+    if sql_list:
+        with connection.cursor() as cursor:
+            for sql in sql_list:
+                cursor.execute(sql)
+
+
+def optimize_database(analyze=True, vacuum=False, using=DEFAULT_DB_ALIAS):
+    """Refresh the planner statistics and optionally compact the database
+
+    On SQLite this runs PRAGMA optimize, ANALYZE and VACUUM, which
+    also checkpoints the write ahead log. On PostgreSQL ANALYZE and
+    VACUUM. VACUUM locks the database while it runs.
+    Returns the list of statements run.
+    """
+    connection = connections[using]
+    statements = []
+    if analyze:
+        if connection.vendor == "sqlite":
+            statements.append("PRAGMA optimize")
+        statements.append("ANALYZE")
+    if vacuum:
+        statements.append("VACUUM")
+        if connection.vendor == "sqlite":
+            statements.append("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    if connection.in_atomic_block and vacuum:
+        raise RuntimeError("VACUUM can't run inside a transaction")
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    return statements
@@ -2,6 +2,7 @@ import pandas
 import numpy
 
 from .. import models
+from .. import reference
 from .converters import (
     date_or_none,
     float_or_nan,
@@ -10,7 +11,7 @@ from .converters import (
     int_or_none,
     int_or_0,
     str_or_empty,
-    uci_tz_or_none,
+    uci_tz_or_none_series,
 )
 
 
@@ -41,7 +42,7 @@ def load_accessions(submitted_accessions, record):
 
 
 def load_protocols(sheet):
-    current_protocols = {x.name for x in models.ProtocolLink.objects.all()}
+    current_protocols = {x.name for x in reference.protocols.all()}
 
     for i, row in sheet.iterrows():
         if row["Protocol"] not in current_protocols:
@@ -54,6 +55,14 @@ def load_protocols(sheet):
             record.save()
 
 
+def localize_column(sheet, column):
+    """Convert a sheet column to UTC datetimes with None for missing values"""
+    values, invalid = uci_tz_or_none_series(sheet[column])
+    for i, value in sheet[column][invalid].items():
+        print("{} on row {} is not a valid time: {}".format(column, i, value))
+    return values.astype(object).where(values.notna(), None)
+
+
 def load_mice(mice, submitted_accessions=None):
     if submitted_accessions is None:
         submitted_accessions = {}
@@ -75,8 +84,10 @@ def load_mice(mice, submitted_accessions=None):
     if len(missing_columns) > 0:
         raise KeyError(f"Missing column names {missing_columns}")
 
-    mouse_strains = {x.name: x for x in models.MouseStrain.objects.all()}
     current_mice = {x.name for x in models.Mouse.objects.all()}
+    mice = mice.copy()
+    for column in ["Dissection start time", "Dissection finish time"]:
+        mice[column] = localize_column(mice, column)
     failed = 0
     added = 0
 
@@ -88,12 +99,12 @@ def load_mice(mice, submitted_accessions=None):
                 # should i use liz's disection id?
                 name=name,
                 dissection=int_or_none(row["Mouse ID"]),
-                strain=mouse_strains[row["Strain code"]],
+                strain=reference.get_mouse_strain(row["Strain code"]),
                 sex=row["Sex"],
                 weight_g=row["Weight (g)"],
                 date_of_birth=row["DOB"].date() if pandas.notnull(row["DOB"]) else None,
-                dissection_start_time=uci_tz_or_none(row["Dissection start time"]),
-                dissection_end_time=uci_tz_or_none(row["Dissection finish time"]),
+                dissection_start_time=row["Dissection start time"],
+                dissection_end_time=row["Dissection finish time"],
                 timepoint=row["Timepoint"],
                 timepoint_unit=row["Timepoint unit"],
                 life_stage=models.LifeStageEnum.ADULT,
@@ -122,10 +133,11 @@ def load_tissues(tissue_sheets, submitted_tissues=None):
         submitted_tissues = {}
 
     loaded_mice = {x.name: x for x in models.Mouse.objects.all()}
-    ontology_map = {x.curie: x for x in models.OntologyTerm.objects.all()}
 
     tissue_sheets = tissue_sheets.copy()
     tissue_sheets.columns = [x.lower() for x in tissue_sheets.columns]
+    for column in ["dissection start", "dissection end"]:
+        tissue_sheets[column] = localize_column(tissue_sheets, column)
     added = 0
     failed = 0
     for i, row in tissue_sheets.iterrows():
@@ -149,14 +161,14 @@ def load_tissues(tissue_sheets, submitted_tissues=None):
         elif mouse_name == "046_NZOJ_10F":
             genotype = 'NZOJ'
 
-        if mouse.strain.name != genotype:
-            print(f"{tissue_name} Mouse strain {mouse.strain.name} != {genotype}")
+        if mouse.strain_id != genotype:
+            print(f"{tissue_name} Mouse strain {mouse.strain_id} != {genotype}")
             failed += 1
             continue
 
         tissue_terms = []
         for term_curie in row["tissue_id"]:
-            tissue_terms.append(ontology_map[term_curie])
+            tissue_terms.append(reference.get_ontology_term(term_curie))
 
         record = models.Tissue(
             mouse=mouse,
@@ -168,10 +180,10 @@ def load_tissues(tissue_sheets, submitted_tissues=None):
         )
 
         if pandas.notnull(row["dissection start"]):
-            record.dissection_start_time = uci_tz_or_none(row["dissection start"])
+            record.dissection_start_time = row["dissection start"]
 
         if pandas.notnull(row["dissection end"]):
-            record.dissection_end_time = uci_tz_or_none(row["dissection end"])
+            record.dissection_end_time = row["dissection end"]
 
         tube_weight_label = "tube weight (g)"
         if pandas.notnull(row[tube_weight_label]):
@@ -312,8 +324,7 @@ def get_or_create_ont_splitseq_sequencing_run(row):
         run = models.SequencingRun.objects.get(name=name)
     except models.SequencingRun.DoesNotExist:
         plate = models.SplitSeqPlate.objects.get(pk=row["plate"])
-        platform = models.Platform.objects.get(
-            name=row["sequencing_run_platform"])
+        platform = reference.get_platform(row["sequencing_run_platform"])
 
         run = models.SequencingRun.objects.create(
             # name is supposed to be the directory
@@ -0,0 +1,214 @@
+"""Measure the hot lookup paths against a scaled up synthetic database
+
+The plate loader, fastq metadata import and the pipeline views look
+rows up by a few composite keys. This fills the database with
+synthetic plates, times those lookups and shows their query plans,
+then drops the supporting indexes and times them again so the two
+can be compared.
+
+Everything happens inside one transaction that is rolled back, so
+this only works on databases with transactional DDL (SQLite and
+PostgreSQL).
+"""
+import time
+
+from django.db import connection, transaction
+
+from .. import models
+
+BENCHMARK_PREFIX = "BENCH"
+BARCODE_TYPES = ["T", "R"]
+SUBPOOLS_PER_PLATE = 16
+FILES_PER_LIBRARY = [(lane, read) for lane in (1, 2) for read in ("R1", "R2")]
+
+
+def _plate_name(i):
+    return "{}_{:05d}".format(BENCHMARK_PREFIX, i)
+
+
+def populate(plates):
+    """Create plates worth of synthetic wells, barcodes, subpools, runs and files
+
+    Each plate gets 96 wells, its own reagent with a T and R barcode per
+    well, 16 subpools sequenced on one run with 4 files each, and an
+    accession for every subpool.
+    """
+    source = models.Source.objects.create(
+        name="{}-source".format(BENCHMARK_PREFIX.lower()), display_name="benchmark")
+    platform = models.Platform.objects.create(
+        name="{}-platform".format(BENCHMARK_PREFIX.lower()),
+        display_name="benchmark",
+        family="illumina",
+    )
+    prefixes = [x for x, _ in models.AccessionNamespacesEnum.choices]
+
+    for i in range(plates):
+        plate = models.SplitSeqPlate.objects.create(name=_plate_name(i))
+        reagent = models.LibraryConstructionReagent.objects.create(
+            name=plate.name, display_name="benchmark", version="1", source=source)
+        run = models.SequencingRun.objects.create(
+            name=plate.name, platform=platform, plate=plate)
+
+        wells = []
+        barcodes = []
+        for row in "ABCDEFGH":
+            for column in range(1, 13):
+                code = "{}{}".format(row, column)
+                wells.append(models.SplitSeqWell(plate=plate, row=row, column=column))
+                barcodes.extend(
+                    models.LibraryBarcode(
+                        reagent=reagent,
+                        name=code,
+                        code=code,
+                        i7_sequence="ACGT",
+                        barcode_type=barcode_type,
+                        well_position=code,
+                    )
+                    for barcode_type in BARCODE_TYPES
+                )
+        models.SplitSeqWell.objects.bulk_create(wells)
+        models.LibraryBarcode.objects.bulk_create(barcodes)
+
+        subpools = models.Subpool.objects.bulk_create(
+            models.Subpool(
+                name="{}_{}".format(plate.name, index),
+                plate=plate,
+                nuclei=13000,
+                index=str(index),
+            )
+            for index in range(1, SUBPOOLS_PER_PLATE + 1)
+        )
+        libraries = models.LibraryInRun.objects.bulk_create(
+            models.LibraryInRun(subpool=subpool, sequencing_run=run)
+            for subpool in subpools
+        )
+        models.SequencingFile.objects.bulk_create(
+            models.SequencingFile(
+                sequencing_run=run,
+                library_in_run=library,
+                filename="{}_L00{}_{}_001.fastq.gz".format(library.subpool_id, lane, read),
+                lane=lane,
+                read=read,
+            )
+            for library in libraries
+            for lane, read in FILES_PER_LIBRARY
+        )
+        models.Accession.objects.bulk_create(
+            models.Accession(
+                name="{}SM{}".format(plate.name, j),
+                accession_prefix=prefixes[j % len(prefixes)],
+                see_also="https://example.org/{}/{}/".format(plate.name, j),
+            )
+            for j in range(SUBPOOLS_PER_PLATE)
+        )
+
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def get_hot_lookups(plate_name):
+    """Return (name, model, indexed columns, queryset) for each hot lookup"""
+    plate = models.SplitSeqPlate.objects.get(name=plate_name)
+    run = models.SequencingRun.objects.get(name=plate_name)
+    library = models.LibraryInRun.objects.filter(sequencing_run=run).first()
+    return [
+        ("well", models.SplitSeqWell, ["plate_id", "row", "column"],
+         models.SplitSeqWell.objects.filter(plate=plate, row="D", column=6)),
+        ("barcode", models.LibraryBarcode, ["reagent_id", "code", "barcode_type"],
+         models.LibraryBarcode.objects.filter(reagent_id=plate_name, code="D6")),
+        ("subpool", models.Subpool, ["plate_id", "index", "selection_type"],
+         models.Subpool.objects.filter(plate=plate, index="3", selection_type="NO")),
+        ("file by name", models.SequencingFile, ["filename"],
+         models.SequencingFile.objects.filter(
+             filename="{}_L001_R1_001.fastq.gz".format(library.subpool_id))),
+        ("file by library", models.SequencingFile, ["sequencing_run_id", "library_in_run_id"],
+         models.SequencingFile.objects.filter(sequencing_run=run, library_in_run=library)),
+        ("accession prefix", models.Accession, ["accession_prefix"],
+         models.Accession.objects.filter(accession_prefix="igvftst")),
+    ]
+
+
+def drop_indexes(model, columns):
+    """Drop the indexes of model whose columns are exactly columns
+
+    PostgreSQL backs unique_together with a constraint instead of a
+    plain index, so those are dropped as constraints.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+        for name, details in constraints.items():
+            if details["columns"] != columns or details["primary_key"]:
+                continue
+            if details["index"]:
+                cursor.execute("DROP INDEX {}".format(connection.ops.quote_name(name)))
+            else:
+                cursor.execute("ALTER TABLE {} DROP CONSTRAINT {}".format(
+                    connection.ops.quote_name(table), connection.ops.quote_name(name)))
+
+
+def get_sql(queryset, label):
+    """Return the SQL and params of queryset tagged with a comment
+
+    The comment keeps the database driver from reusing a statement
+    prepared before the indexes were dropped.
+    """
+    sql, params = queryset.query.sql_with_params()
+    return "/* {} */ {}".format(label, sql), params
+
+
+def explain_queryset(queryset, label):
+    sql, params = get_sql(queryset, label)
+    with connection.cursor() as cursor:
+        cursor.execute("{} {}".format(connection.ops.explain_query_prefix(), sql), params)
+        return "\n".join(" ".join(str(x) for x in row) for row in cursor.fetchall())
+
+
+def time_queryset(queryset, label, repeat):
+    """Average milliseconds to run the SQL of queryset, and the number of rows
+
+    The SQL is executed directly so the ORM overhead doesn't hide the
+    difference the index makes.
+    """
+    sql, params = get_sql(queryset, label)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = len(cursor.fetchall())
+        start = time.perf_counter()
+        for _ in range(repeat):
+            cursor.execute(sql, params)
+            cursor.fetchall()
+    return (time.perf_counter() - start) * 1000 / repeat, rows
+
+
+def run_benchmark(plates, repeat=100, compare=True):
+    """Time the hot lookups on plates of synthetic data
+
+    With compare the covering indexes are dropped afterwards and the
+    lookups are timed again. All changes are rolled back.
+    Returns a list of dicts with the lookup name, rows found, and the
+    indexed_ms, plan, unindexed_ms and unindexed_plan of each lookup.
+    """
+    results = []
+    with transaction.atomic():
+        populate(plates)
+        lookups = get_hot_lookups(_plate_name(plates // 2))
+        for name, model, columns, queryset in lookups:
+            indexed_ms, rows = time_queryset(queryset, "indexed", repeat)
+            results.append({
+                "name": name,
+                "rows": rows,
+                "indexed_ms": indexed_ms,
+                "plan": explain_queryset(queryset, "indexed"),
+                "unindexed_ms": None,
+                "unindexed_plan": None,
+            })
+
+        if compare:
+            for result, (_, model, columns, queryset) in zip(results, lookups):
+                drop_indexes(model, columns)
+                result["unindexed_ms"], _ = time_queryset(queryset, "unindexed", repeat)
+                result["unindexed_plan"] = explain_queryset(queryset, "unindexed")
+
+        transaction.set_rollback(True)
+    return results
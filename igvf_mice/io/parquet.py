@@ -0,0 +1,234 @@
+"""Export the tracking database to Parquet files
+
+Every igvf_mice model and each of its many to many through tables is
+written to its own directory of parquet parts, along with a flattened
+lineage table linking wells to samples, tissues and mice. Tables are
+streamed from the database in batches, so memory use is bounded by the
+batch size rather than the size of the table.
+
+The export can be read back with pandas.read_parquet(directory) or
+read_table below, which memory maps the files.
+"""
+import json
+from pathlib import Path
+
+from django.apps import apps
+import pyarrow
+import pyarrow.parquet
+
+DEFAULT_BATCH_SIZE = 10_000
+STATE_FILENAME = "export_state.json"
+LINEAGE_TABLE = "lineage"
+
+_INTEGER_TYPES = {
+    "AutoField",
+    "BigAutoField",
+    "SmallAutoField",
+    "IntegerField",
+    "BigIntegerField",
+    "SmallIntegerField",
+    "PositiveIntegerField",
+    "PositiveBigIntegerField",
+    "PositiveSmallIntegerField",
+}
+
+# split-seq well to mouse, one row per well and sample
+LINEAGE_FIELDS = [
+    ("plate", "plate_id"),
+    ("well_id", "id"),
+    ("row", "row"),
+    ("column", "column"),
+    ("parse_fixed_sample", "biosample__name"),
+    ("sample_extraction", "biosample__extraction__name"),
+    ("tissue", "biosample__extraction__tissue__name"),
+    ("tissue_description", "biosample__extraction__tissue__description"),
+    ("mouse", "biosample__extraction__tissue__mouse__name"),
+    ("strain", "biosample__extraction__tissue__mouse__strain_id"),
+    ("sex", "biosample__extraction__tissue__mouse__sex"),
+]
+
+
+def get_arrow_type(field):
+    """Pick the arrow type to store a django model field"""
+    if field.is_relation:
+        return get_arrow_type(field.target_field)
+
+    internal_type = field.get_internal_type()
+    if internal_type in _INTEGER_TYPES:
+        return pyarrow.int64()
+    elif internal_type == "FloatField":
+        return pyarrow.float64()
+    elif internal_type == "BooleanField":
+        return pyarrow.bool_()
+    elif internal_type == "DateField":
+        return pyarrow.date32()
+    elif internal_type == "DateTimeField":
+        return pyarrow.timestamp("us", tz="UTC")
+    return pyarrow.string()
+
+
+def get_model_columns(model):
+    """Return (column name, field) pairs for the concrete fields of a model"""
+    return [(field.attname, field) for field in model._meta.concrete_fields]
+
+
+def get_export_tables(app_label="igvf_mice"):
+    """List every table to export as (name, queryset, columns)
+
+    columns is a list of (column name, ORM lookup, arrow type). The
+    many to many through tables are named after their through model,
+    e.g. tissue_accession.
+    """
+    tables = []
+    for model in apps.get_app_config(app_label).get_models():
+        models_to_export = [model]
+        models_to_export.extend(
+            field.remote_field.through
+            for field in model._meta.local_many_to_many
+            if field.remote_field.through._meta.auto_created
+        )
+        for current in models_to_export:
+            columns = [
+                (name, name, get_arrow_type(field))
+                for name, field in get_model_columns(current)
+            ]
+            tables.append((current._meta.model_name, current.objects.all(), columns))
+
+    SplitSeqWell = apps.get_model(app_label, "SplitSeqWell")
+    lineage_columns = [
+        (name, lookup, get_arrow_type(get_lookup_field(SplitSeqWell, lookup)))
+        for name, lookup in LINEAGE_FIELDS
+    ]
+    tables.append((LINEAGE_TABLE, SplitSeqWell.objects.all(), lineage_columns))
+    return tables
+
+
+def get_lookup_field(model, lookup):
+    """Follow a double underscore ORM lookup to the field it ends on"""
+    parts = lookup.split("__")
+    for part in parts[:-1]:
+        model = model._meta.get_field(part).related_model
+    return model._meta.get_field(parts[-1])
+
+
+def make_schema(columns):
+    return pyarrow.schema([(name, arrow_type) for name, _, arrow_type in columns])
+
+
+def iter_record_batches(queryset, columns, batch_size=DEFAULT_BATCH_SIZE):
+    """Stream a queryset as arrow RecordBatches of up to batch_size rows"""
+    schema = make_schema(columns)
+    lookups = [lookup for _, lookup, _ in columns]
+    is_string = [arrow_type == pyarrow.string() for _, _, arrow_type in columns]
+
+    rows = []
+    for row in queryset.values_list(*lookups).iterator(chunk_size=batch_size):
+        rows.append(row)
+        if len(rows) >= batch_size:
+            yield _rows_to_batch(rows, schema, is_string)
+            rows = []
+
+    if len(rows) > 0:
+        yield _rows_to_batch(rows, schema, is_string)
+
+
+def _rows_to_batch(rows, schema, is_string):
+    arrays = []
+    for values, arrow_type, to_string in zip(zip(*rows), schema.types, is_string):
+        if to_string:
+            # UUIDs and other odd types are stored as their text form
+            values = [x if x is None or isinstance(x, str) else str(x) for x in values]
+        arrays.append(pyarrow.array(values, type=arrow_type))
+    return pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_parquet(filename, queryset, columns, batch_size=DEFAULT_BATCH_SIZE):
+    """Write a queryset to a parquet file, returning the number of rows"""
+    rows = 0
+    with pyarrow.parquet.ParquetWriter(filename, make_schema(columns)) as writer:
+        for batch in iter_record_batches(queryset, columns, batch_size):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+def has_integer_pk(queryset):
+    return queryset.model._meta.pk.get_internal_type() in _INTEGER_TYPES
+
+
+def load_export_state(output_dir):
+    try:
+        with open(Path(output_dir) / STATE_FILENAME, "rt") as instream:
+            return json.load(instream)
+    except FileNotFoundError:
+        return {}
+
+
+def export_database(output_dir, incremental=False, batch_size=DEFAULT_BATCH_SIZE, tables=None):
+    """Export all igvf_mice tables to parquet directories under output_dir
+
+    With incremental, tables with an integer primary key only have rows
+    added since the previous export appended as a new part. Tables keyed
+    by name are always rewritten, and deletions are only picked up by a
+    full export.
+
+    :param tables: optional list of table names to limit the export
+    Returns {table_name: rows written}
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    state = load_export_state(output_dir)
+    written = {}
+
+    for name, queryset, columns in get_export_tables():
+        if tables is not None and name not in tables:
+            continue
+
+        table_dir = output_dir / name
+        table_dir.mkdir(exist_ok=True)
+        previous = state.get(name) if incremental else None
+        appending = (
+            incremental
+            and previous is not None
+            and previous.get("max_pk") is not None
+            and has_integer_pk(queryset)
+            and name != LINEAGE_TABLE
+        )
+
+        if appending:
+            queryset = queryset.filter(pk__gt=previous["max_pk"])
+            part = previous["parts"]
+        else:
+            for filename in table_dir.glob("part-*.parquet"):
+                filename.unlink()
+            part = 0
+
+        queryset = queryset.order_by("pk")
+        rows = 0
+        if not appending or queryset.exists():
+            filename = table_dir / "part-{:05d}.parquet".format(part)
+            rows = write_parquet(filename, queryset, columns, batch_size)
+            part += 1
+
+        max_pk = None
+        if has_integer_pk(queryset) and name != LINEAGE_TABLE:
+            last = queryset.values_list("pk", flat=True).last()
+            max_pk = last if last is not None else (previous or {}).get("max_pk")
+
+        state[name] = {"max_pk": max_pk, "parts": part}
+        written[name] = rows
+
+    with open(output_dir / STATE_FILENAME, "wt") as outstream:
+        json.dump(state, outstream, indent=1, sort_keys=True)
+
+    return written
+
+
+def read_table(output_dir, name):
+    """Load an exported table into a pandas DataFrame from memory mapped files"""
+    table_dir = Path(output_dir) / name
+    parts = [
+        pyarrow.parquet.read_table(filename, memory_map=True)
+        for filename in sorted(table_dir.glob("part-*.parquet"))
+    ]
+    return pyarrow.concat_tables(parts).to_pandas()
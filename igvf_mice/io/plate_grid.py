@@ -0,0 +1,167 @@
+"""Load and save a whole split-seq plate layout at once
+
+The admin plate grid shows every :model:`igvf_mice.SplitSeqWell` of
+a plate with its samples and round 1 barcode codes. Loading it takes
+one query each for the wells, their samples and their barcodes, and
+saving replaces the edited wells with bulk operations in a single
+transaction.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .. import models
+
+# plate size to (rows, columns). SplitSeqWell.row only has the choices
+# A-H, so 384 well plates can't be edited as a grid yet.
+PLATE_DIMENSIONS = {
+    96: (8, 12),
+}
+
+
+def get_plate_dimensions(plate):
+    """Return the row letters and column numbers of a plate
+
+    Raises ValueError for plate sizes the grid doesn't support.
+    """
+    size = int(plate.size)
+    if size not in PLATE_DIMENSIONS:
+        raise ValueError("{} well plates can't be edited as a grid".format(size))
+    rows, columns = PLATE_DIMENSIONS[size]
+    return [chr(ord("A") + i) for i in range(rows)], list(range(1, columns + 1))
+
+
+def load_plate_grid(plate):
+    """Return {well position: {"id", "biosamples", "barcodes"}} for a plate
+
+    biosamples is the sorted list of sample names and barcodes the
+    sorted unique barcode codes of the well.
+    """
+    cells = {}
+    well_positions = {}
+    for well_id, row, column in models.SplitSeqWell.objects.filter(
+            plate=plate).values_list("id", "row", "column"):
+        position = "{}{}".format(row, column)
+        well_positions[well_id] = position
+        cells[position] = {"id": well_id, "biosamples": [], "barcodes": []}
+
+    for well_id, name in models.SplitSeqWell.biosample.through.objects.filter(
+            splitseqwell__plate=plate).values_list("splitseqwell_id", "parsefixedsample_id"):
+        cells[well_positions[well_id]]["biosamples"].append(name)
+
+    for well_id, code in models.SplitSeqWell.barcode.through.objects.filter(
+            splitseqwell__plate=plate).values_list("splitseqwell_id", "librarybarcode__code"):
+        barcodes = cells[well_positions[well_id]]["barcodes"]
+        if code not in barcodes:
+            barcodes.append(code)
+
+    for cell in cells.values():
+        cell["biosamples"].sort()
+        cell["barcodes"].sort()
+    return cells
+
+
+def get_plate_reagent(plate):
+    """Return the name of the reagent used for the plate barcodes, or None"""
+    return models.SplitSeqWell.barcode.through.objects.filter(
+        splitseqwell__plate=plate,
+    ).values_list("librarybarcode__reagent_id", flat=True).first()
+
+
+def save_plate_grid(plate, cells, reagent):
+    """Replace the contents of the edited wells of a plate
+
+    :param cells: {well position: (sample names, barcode codes)}, a
+        well with no samples and no barcodes is removed, unless it has
+        read counts which deleting it would cascade to. Those wells
+        are kept without samples or barcodes.
+    :param reagent: LibraryConstructionReagent name to find barcodes in
+    Returns the number of wells changed.
+    Raises ValidationError listing well positions outside the plate and
+    unknown samples or barcodes.
+    """
+    rows, columns = get_plate_dimensions(plate)
+    positions = {"{}{}".format(row, column) for row in rows for column in columns}
+    outside = sorted(set(cells) - positions)
+    if len(outside) > 0:
+        raise ValidationError(
+            ["{}: not a well of a {} well plate".format(x, plate.size) for x in outside])
+
+    current = load_plate_grid(plate)
+    changed = {}
+    for position, (biosamples, codes) in cells.items():
+        biosamples = sorted(set(biosamples))
+        codes = sorted(set(codes))
+        existing = current.get(position)
+        if existing is None and len(biosamples) == 0 and len(codes) == 0:
+            continue
+        if existing is not None and existing["biosamples"] == biosamples \
+                and existing["barcodes"] == codes:
+            continue
+        changed[position] = (biosamples, codes)
+
+    if len(changed) == 0:
+        return 0
+
+    names = {name for biosamples, _ in changed.values() for name in biosamples}
+    known_names = set(models.ParseFixedSample.objects.filter(
+        name__in=names).values_list("name", flat=True))
+    all_codes = {code for _, codes in changed.values() for code in codes}
+    barcode_ids = {}
+    for barcode_id, code in models.LibraryBarcode.objects.filter(
+            models.SplitSeqWell.barcode_filter,
+            reagent=reagent,
+            code__in=all_codes,
+    ).values_list("id", "code"):
+        barcode_ids.setdefault(code, []).append(barcode_id)
+
+    errors = []
+    for position, (biosamples, codes) in sorted(changed.items()):
+        for name in biosamples:
+            if name not in known_names:
+                errors.append("{}: unknown sample {}".format(position, name))
+        for code in codes:
+            if code not in barcode_ids:
+                errors.append("{}: unknown barcode {} for {}".format(position, code, reagent))
+    if len(errors) > 0:
+        raise ValidationError(errors)
+
+    BiosampleThrough = models.SplitSeqWell.biosample.through
+    BarcodeThrough = models.SplitSeqWell.barcode.through
+    with transaction.atomic():
+        well_ids = [current[x]["id"] for x in changed if x in current]
+        BiosampleThrough.objects.filter(splitseqwell_id__in=well_ids).delete()
+        BarcodeThrough.objects.filter(splitseqwell_id__in=well_ids).delete()
+
+        emptied = [
+            current[position]["id"]
+            for position, (biosamples, codes) in changed.items()
+            if position in current and len(biosamples) == 0 and len(codes) == 0
+        ]
+        models.SplitSeqWell.objects.filter(
+            id__in=emptied, splitseqwellreadcount__isnull=True).delete()
+
+        models.SplitSeqWell.objects.bulk_create(
+            models.SplitSeqWell(plate=plate, row=position[0], column=int(position[1:]))
+            for position, (biosamples, codes) in changed.items()
+            if position not in current and (len(biosamples) > 0 or len(codes) > 0)
+        )
+        wells = {
+            "{}{}".format(row, column): well_id
+            for well_id, row, column in models.SplitSeqWell.objects.filter(
+                plate=plate).values_list("id", "row", "column")
+        }
+
+        BiosampleThrough.objects.bulk_create(
+            BiosampleThrough(splitseqwell_id=wells[position], parsefixedsample_id=name)
+            for position, (biosamples, _) in changed.items()
+            if position in wells
+            for name in biosamples
+        )
+        BarcodeThrough.objects.bulk_create(
+            BarcodeThrough(splitseqwell_id=wells[position], librarybarcode_id=barcode_id)
+            for position, (_, codes) in changed.items()
+            if position in wells
+            for code in codes
+            for barcode_id in barcode_ids[code]
+        )
+    return len(changed)
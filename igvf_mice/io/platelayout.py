@@ -9,6 +9,7 @@ import re
 from django.db import transaction
 
 from .. import models
+from .. import reference
 from .converters import (
     normalize_plate_name,
     parse_mouse_tissue,
@@ -43,7 +44,7 @@ class PlateLayoutParser:
         self._well_id_re = re.compile("^[A-H]1?[\d]$")
 
         # Used for validation rules
-        self._mouse_strains = {x.name for x in models.MouseStrain.objects.all()}
+        self._mouse_strains = {x.name for x in reference.mouse_strains.all()}
         self._sex_re = re.compile("^(Tissue[0-9]_)?(?P<sex>[MF])(_rep[0-9]+)?$")
 
     def find_plate_start(self, sheet):
@@ -341,12 +342,10 @@ class PlateLayoutParser:
 
 
     def _guess_barcode_reagent_from_plate(self, plate_name, plate_contents):
-        wt_mega_2_reagent = models.LibraryConstructionReagent.objects.get(name="wt-mega-v2")
-        wt_regular_2_reagent = models.LibraryConstructionReagent.objects.get(name="wt-v2")
         if len(plate_contents) == 48:
-            return wt_regular_2_reagent
+            return reference.get_reagent("wt-v2")
         elif len(plate_contents) == 96:
-            return wt_mega_2_reagent
+            return reference.get_reagent("wt-mega-v2")
         else:
             raise RuntimeError("Unrecognized plate {} size {}".format(
                 plate_name, len(plate_contents)))
@@ -362,10 +361,8 @@ class PlateLayoutParser:
 
                     biosamples = [biosample_table[item.tissue_id] for item in well_contents]
                     reagent = self._guess_barcode_reagent_from_plate(plate_name, plate_contents)
-                    barcodes = models.LibraryBarcode.objects.filter(
-                        reagent=reagent,
-                        code="{}{}".format(well_id[0], well_id[1]),
-                    )
+                    barcodes = reference.get_barcodes(
+                        reagent, "{}{}".format(well_id[0], well_id[1]))
 
                     assert len(barcodes) > 0, "We should find bar codes to attach to a well"
 
@@ -1,49 +1,60 @@
+from abc import abstractmethod
 from collections.abc import Mapping
 import pandas
 
 from .. import models
+from .. import reference
 from .converters import normalize_strain
 
 
-class StrainCode(Mapping):
+class _StrainMapping(Mapping):
+    """Read only mapping over the cached mouse strains with some name overrides
+
+    The strains come from reference.mouse_strains, so normalizing a
+    sheet doesn't query per row.
+    """
+    overrides = {}
+    key_field = None
+    value_field = None
+
+    @abstractmethod
+    def _get_strain(self, key):
+        """Return the MouseStrain for key or raise MouseStrain.DoesNotExist"""
+
     def __getitem__(self, key):
-        overrides = {
-            "B6129SF1J": "B6129S1F1J",
-            "B6AF1": "B6AF1J",
-        }
-        key = overrides.get(key, key)
+        key = self.overrides.get(key, key)
 
         try:
-            x = models.MouseStrain.objects.get(name=key)
-            return x.display_name
+            return getattr(self._get_strain(key), self.value_field)
         except models.MouseStrain.DoesNotExist:
-            raise KeyError("{} was not found".format(key))
+            raise KeyError("{} was not found".format(key)) from None
 
     def __len__(self):
-        return models.MouseStrain.objects.count()
+        return len(reference.mouse_strains.all())
 
     def __iter__(self):
-        for strain in models.MouseStrain.objects.all():
-            yield strain.name
+        return iter([getattr(x, self.key_field) for x in reference.mouse_strains.all()])
 
 
-class StrainName(Mapping):
-    def __getitem__(self, key):
-        overrides = {"B6129SF1J": "B6129S1F1/J"}
-        key = overrides.get(key, key)
+class StrainCode(_StrainMapping):
+    overrides = {
+        "B6129SF1J": "B6129S1F1J",
+        "B6AF1": "B6AF1J",
+    }
+    key_field = "name"
+    value_field = "display_name"
 
-        try:
-            x = models.MouseStrain.objects.get(display_name=key)
-            return x.name
-        except models.MouseStrain.DoesNotExist:
-            raise KeyError("{} was not found".format(key))
+    def _get_strain(self, key):
+        return reference.get_mouse_strain(key)
 
-    def __len__(self):
-        return models.MouseStrain.objects.count()
 
-    def __iter__(self):
-        for strain in models.MouseStrain.objects.all():
-            yield strain.display_name
+class StrainName(_StrainMapping):
+    overrides = {"B6129SF1J": "B6129S1F1/J"}
+    key_field = "display_name"
+    value_field = "name"
+
+    def _get_strain(self, key):
+        return reference.mouse_strains.get_by(display_name=key)
 
 
 strain_code_to_name = StrainCode()
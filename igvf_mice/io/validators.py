@@ -1,15 +1,72 @@
 import pandas
 import re
 
+# Lab prefixes the IGVF portal accepts for aliases
+IGVF_LABS = frozenset([
+    "j-michael-cherry", "ali-mortazavi", "barbara-wold", "lior-pachter",
+    "grant-macgregor", "kim-green", "mark-craven", "qiongshi-lu",
+    "audrey-gasch", "robert-steiner", "jesse-engreitz", "thomas-quertermous",
+    "anshul-kundaje", "michael-bassik", "will-greenleaf",
+    "marlene-rabinovitch", "lars-steinmetz", "jay-shendure", "nadav-ahituv",
+    "martin-kircher", "danwei-huangfu", "michael-beer",
+    "anna-katerina-hadjantonakis", "christina-leslie", "alexander-rudensky",
+    "laura-donlin", "hannah-carter", "bing-ren", "kyle-gaulton",
+    "maike-sander", "charles-gersbach", "gregory-crawford", "tim-reddy",
+    "ansuman-satpathy", "andrew-allen", "gary-hon", "nikhil-munshi",
+    "w-lee-kraus", "lea-starita", "doug-fowler", "luca-pinello",
+    "guillaume-lettre", "benhur-lee", "daniel-bauer", "richard-sherwood",
+    "benjamin-kleinstiver", "marc-vidal", "david-hill", "frederick-roth",
+    "mikko-taipale", "anne-carpenter", "hyejung-won", "karen-mohlke",
+    "michael-love", "jason-buenrostro", "bradley-bernstein", "hilary-finucane",
+    "chongyuan-luo", "noah-zaitlen", "kathrin-plath", "roy-wollman",
+    "jason-ernst", "zhiping-weng", "manuel-garber", "xihong-lin", "alan-boyle",
+    "ryan-mills", "jie-liu", "maureen-sartor", "joshua-welch",
+    "stephen-montgomery", "alexis-battle", "livnat-jerby",
+    "jonathan-pritchard", "predrag-radivojac", "sean-mooney", "harinder-singh",
+    "nidhi-sahni", "jishnu-das", "hao-wu", "sreeram-kannan", "hongjun-song",
+    "alkes-price", "soumya-raychaudhuri", "shamil-sunyaev", "len-pennacchio",
+    "axel-visel", "jill-moore", "ting-wang", "feng-yue", "igvf", "igvf-dacc",
+])
+ALIAS_NAME_RE = re.compile(r"^[a-zA-Z\d_$.+!*,()'-]+(?:\s[a-zA-Z\d_$.+!*,()'-]+)*$")
+
+
+def is_valid_alias(alias):
+    if not isinstance(alias, str):
+        return False
+    lab, sep, name = alias.partition(":")
+    return sep == ":" and lab in IGVF_LABS and ALIAS_NAME_RE.match(name) is not None
+
+
 def validate_alias(alias):
-    alias_pattern = re.compile("^(?:j-michael-cherry|ali-mortazavi|barbara-wold|lior-pachter|grant-macgregor|kim-green|mark-craven|qiongshi-lu|audrey-gasch|robert-steiner|jesse-engreitz|thomas-quertermous|anshul-kundaje|michael-bassik|will-greenleaf|marlene-rabinovitch|lars-steinmetz|jay-shendure|nadav-ahituv|martin-kircher|danwei-huangfu|michael-beer|anna-katerina-hadjantonakis|christina-leslie|alexander-rudensky|laura-donlin|hannah-carter|bing-ren|kyle-gaulton|maike-sander|charles-gersbach|gregory-crawford|tim-reddy|ansuman-satpathy|andrew-allen|gary-hon|nikhil-munshi|w-lee-kraus|lea-starita|doug-fowler|luca-pinello|guillaume-lettre|benhur-lee|daniel-bauer|richard-sherwood|benjamin-kleinstiver|marc-vidal|david-hill|frederick-roth|mikko-taipale|anne-carpenter|hyejung-won|karen-mohlke|michael-love|jason-buenrostro|bradley-bernstein|hilary-finucane|chongyuan-luo|noah-zaitlen|kathrin-plath|roy-wollman|jason-ernst|zhiping-weng|manuel-garber|xihong-lin|alan-boyle|ryan-mills|jie-liu|maureen-sartor|joshua-welch|stephen-montgomery|alexis-battle|livnat-jerby|jonathan-pritchard|predrag-radivojac|sean-mooney|harinder-singh|nidhi-sahni|jishnu-das|hao-wu|sreeram-kannan|hongjun-song|alkes-price|soumya-raychaudhuri|shamil-sunyaev|len-pennacchio|axel-visel|jill-moore|ting-wang|feng-yue|igvf|igvf-dacc):[a-zA-Z\\d_$.+!*,()'-]+(?:\\s[a-zA-Z\\d_$.+!*,()'-]+)*$")
-    
-    if alias_pattern.match(alias) is None:
+    if not is_valid_alias(alias):
         raise ValueError("Invalid alias")
     else:
         return True
 
 
+def validate_aliases(aliases):
+    """Check a whole column of aliases at once
+
+    Returns a tuple of a boolean mask that is True for the valid
+    aliases, and a list of the invalid values.
+    """
+    aliases = pandas.Series(aliases, dtype=object)
+    is_string = (aliases.map(type) == str).astype(bool)
+    if not is_string.any():
+        # partition of an empty selection has no columns to index
+        mask = pandas.Series(False, index=aliases.index, dtype=bool)
+        return mask, list(aliases)
+
+    parts = aliases[is_string].astype(str).str.partition(":")
+    valid = (
+        (parts[1] == ":")
+        & parts[0].isin(IGVF_LABS)
+        & parts[2].str.match(ALIAS_NAME_RE)
+    )
+    mask = valid.reindex(aliases.index, fill_value=False).astype(bool)
+    return mask, list(aliases[~mask])
+
+
 def validate_mouse_age_sex(value):
     sex = value[-1]
     age = value[0:-1]
@@ -0,0 +1,193 @@
+"""Count how many reads each SplitSeqWell received
+
+The round 1 barcode sits at a fixed offset in the split-seq read 2, so
+reads can be assigned to the wells of a plate without running the full
+pipeline. This is meant as a fast sanity check of a plate layout.
+"""
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import gzip
+from itertools import islice
+import os
+
+import numpy
+
+from .barcode_index import NO_MATCH, BarcodeIndex
+
+# Parse Biosciences WT v2 read 2 layout
+# UMI [0:10], bc3 [10:18], bc2 [48:56], bc1 [78:86]
+BC1_START = 78
+BARCODE_LENGTH = 8
+DEFAULT_CHUNK_SIZE = 500_000
+
+
+def open_fastq(filename):
+    """Open a possibly gzipped fastq as a binary stream"""
+    filename = str(filename)
+    if filename.endswith(".gz"):
+        return gzip.open(filename, "rb")
+    return open(filename, "rb")
+
+
+def read_fastq_sequence_chunks(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield lists of read sequences from a fastq stream, chunk_size reads at a time
+    """
+    while True:
+        lines = list(islice(stream, 4 * chunk_size))
+        if len(lines) == 0:
+            break
+        yield lines[1::4]
+
+
+def extract_barcode_window(sequences, start=BC1_START, length=BARCODE_LENGTH):
+    """Return a (reads x length) uint8 matrix of the barcode window
+
+    Reads too short to contain the window are padded with 0 bytes which
+    will never match a barcode.
+    """
+    end = start + length
+    # a fixed width bytes dtype truncates each read to the first end bytes
+    matrix = numpy.array(sequences, dtype="S{}".format(end))
+    matrix = matrix.view(numpy.uint8).reshape(len(sequences), end)
+    return numpy.ascontiguousarray(matrix[:, start:end])
+
+
+def count_barcode_window(index, sequences, start=BC1_START, length=BARCODE_LENGTH):
+    """Count reads for each id in a barcode index
+
+    Returns a Counter keyed by the index ids, with NO_MATCH for reads
+    that didn't match.
+    """
+    window = extract_barcode_window(sequences, start, length)
+    ids, counts = numpy.unique(index.lookup_array(window), return_counts=True)
+    return Counter(dict(zip(ids.tolist(), counts.tolist())))
+
+
+_worker_index = None
+
+
+def _init_worker(index):
+    global _worker_index
+    _worker_index = index
+
+
+def _count_chunk(sequences, start, length):
+    return count_barcode_window(_worker_index, sequences, start, length)
+
+
+def count_fastq_barcodes(filenames, index, start=BC1_START, length=BARCODE_LENGTH,
+                         chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+    """Stream fastqs through a barcode index and merge the counts
+
+    Each chunk of reads is matched by a worker in a process pool. The
+    number of chunks waiting for a worker is bounded so memory stays
+    proportional to workers * chunk_size.
+
+    :param filenames: a fastq filename or list of filenames
+    :param index: BarcodeIndex whose ids are to be counted
+    :param workers: process pool size, 0 to count in this process
+    """
+    if isinstance(filenames, (str, bytes)) or not hasattr(filenames, "__iter__"):
+        filenames = [filenames]
+
+    totals = Counter()
+    if workers == 0:
+        for filename in filenames:
+            with open_fastq(filename) as stream:
+                for sequences in read_fastq_sequence_chunks(stream, chunk_size):
+                    totals.update(count_barcode_window(index, sequences, start, length))
+        return totals
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(index,)) as executor:
+        max_pending = 2 * workers
+        pending = []
+        for filename in filenames:
+            with open_fastq(filename) as stream:
+                for sequences in read_fastq_sequence_chunks(stream, chunk_size):
+                    pending.append(executor.submit(_count_chunk, sequences, start, length))
+                    if len(pending) >= max_pending:
+                        totals.update(pending.pop(0).result())
+        for future in pending:
+            totals.update(future.result())
+
+    return totals
+
+
+def build_plate_well_index(plate, max_mismatches=1):
+    """Build a BarcodeIndex that maps round 1 barcodes to SplitSeqWell ids
+
+    Uses the barcodes linked to each well of the plate, so both the
+    oligo-dT and random hexamer barcodes resolve to the same well.
+    """
+    from .. import models
+
+    links = models.SplitSeqWell.barcode.through.objects.filter(
+        splitseqwell__plate=plate,
+        librarybarcode__i7_sequence__isnull=False,
+    ).values_list("splitseqwell_id", "librarybarcode__i7_sequence")
+
+    well_ids = []
+    sequences = []
+    for well_id, sequence in links:
+        well_ids.append(well_id)
+        sequences.append(sequence)
+
+    if len(sequences) == 0:
+        raise ValueError("No barcodes are linked to the wells of {}".format(plate))
+
+    return BarcodeIndex(well_ids, sequences, max_mismatches=max_mismatches)
+
+
+def store_well_read_counts(plate, counts, sequencing_file=None):
+    """Save per well counts as SplitSeqWellReadCount records
+
+    Every well of the plate gets a record, including wells without
+    any reads, plus one record with no well for the unmatched reads.
+    """
+    from django.db import transaction
+    from .. import models
+
+    wells = models.SplitSeqWell.objects.filter(plate=plate)
+    with transaction.atomic():
+        models.SplitSeqWellReadCount.objects.filter(
+            plate=plate, sequencing_file=sequencing_file).delete()
+        records = [
+            models.SplitSeqWellReadCount(
+                plate=plate,
+                well=well,
+                sequencing_file=sequencing_file,
+                reads=counts.get(well.id, 0),
+            )
+            for well in wells
+        ]
+        records.append(models.SplitSeqWellReadCount(
+            plate=plate,
+            well=None,
+            sequencing_file=sequencing_file,
+            reads=counts.get(NO_MATCH, 0),
+        ))
+        models.SplitSeqWellReadCount.objects.bulk_create(records)
+    return records
+
+
+def count_plate_well_reads(plate, filenames, sequencing_file=None, max_mismatches=1,
+                           start=BC1_START, chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+    """Count reads per well of a plate from read 2 fastqs and store them
+
+    Returns the Counter of SplitSeqWell ids to reads.
+    """
+    index = build_plate_well_index(plate, max_mismatches=max_mismatches)
+    counts = count_fastq_barcodes(
+        filenames,
+        index,
+        start=start,
+        length=BARCODE_LENGTH,
+        chunk_size=chunk_size,
+        workers=workers,
+    )
+    store_well_read_counts(plate, counts, sequencing_file=sequencing_file)
+    return counts
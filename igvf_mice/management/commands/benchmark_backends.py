@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from ...io.backend_benchmark import run_concurrent_benchmark
+
+
+class Command(BaseCommand):
+    help = "Time concurrent plate imports and reads against one or more databases"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            action="append",
+            dest="databases",
+            help="database alias to benchmark, may be repeated (default: default)",
+        )
+        parser.add_argument("--writers", type=int, default=2, help="importing threads")
+        parser.add_argument("--readers", type=int, default=4, help="querying threads")
+        parser.add_argument(
+            "--imports", type=int, default=10, help="plates each writer imports")
+
+    def handle(self, *args, **options):
+        databases = options["databases"] or [DEFAULT_DB_ALIAS]
+        self.stdout.write("database\tvendor\tkind\tcount\terrors\tp50 ms\tp95 ms\telapsed s")
+        for alias in databases:
+            result = run_concurrent_benchmark(
+                alias,
+                writers=options["writers"],
+                readers=options["readers"],
+                imports=options["imports"],
+            )
+            for kind in ["writes", "reads"]:
+                summary = result[kind]
+                self.stdout.write("{}\t{}\t{}\t{}\t{}\t{}\t{}\t{:.2f}".format(
+                    alias,
+                    result["vendor"],
+                    kind,
+                    summary["count"],
+                    result["{}_errors".format(kind[:-1])],
+                    format_ms(summary["p50_ms"]),
+                    format_ms(summary["p95_ms"]),
+                    result["elapsed_s"],
+                ))
+            if result["error"] is not None:
+                self.stdout.write("{}\tfirst error: {}".format(alias, result["error"]))
+
+
+def format_ms(value):
+    return "-" if value is None else "{:.2f}".format(value)
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from ... import models
+from ...io.lookup_benchmark import run_benchmark
+
+
+class Command(BaseCommand):
+    help = "Time the composite key lookups against a scaled up copy of the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            type=int,
+            default=100,
+            help="synthetic plates to add per plate currently in the database",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=100, help="times to run each lookup")
+        parser.add_argument(
+            "--no-compare",
+            action="store_false",
+            dest="compare",
+            default=True,
+            help="don't drop the indexes and time the lookups again",
+        )
+
+    def handle(self, *args, **options):
+        plates = options["scale"] * max(1, models.SplitSeqPlate.objects.count())
+        self.stdout.write("Benchmarking with {} synthetic plates".format(plates))
+        results = run_benchmark(plates, repeat=options["repeat"], compare=options["compare"])
+        for result in results:
+            self.stdout.write("{}\t{} rows\t{:.4f} ms".format(
+                result["name"], result["rows"], result["indexed_ms"]))
+            self.write_plan(result["plan"])
+            if result["unindexed_ms"] is not None:
+                self.stdout.write("    without index {:.4f} ms".format(result["unindexed_ms"]))
+                self.write_plan(result["unindexed_plan"])
+
+    def write_plan(self, plan):
+        for line in plan.splitlines():
+            self.stdout.write("    {}".format(line))
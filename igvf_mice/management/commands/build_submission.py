@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import AccessionNamespacesEnum, SplitSeqPlate
+from ...submission import build_submission, SUBMISSION_TABLES, write_submission
+
+
+class Command(BaseCommand):
+    help = "Write the IGVF DACC submission tables for a split-seq plate to a spreadsheet"
+
+    def add_arguments(self, parser):
+        parser.add_argument("plate", help="name of the split-seq plate to submit")
+        parser.add_argument(
+            "output", help="spreadsheet to write, like IGVF_016.xlsx or IGVF_016.ods")
+        parser.add_argument(
+            "--accession-prefix",
+            choices=AccessionNamespacesEnum.values,
+            default=AccessionNamespacesEnum.IGVF,
+            help="accession namespace to report, igvftst for the sandbox",
+        )
+        parser.add_argument(
+            "--table",
+            action="append",
+            dest="tables",
+            choices=list(SUBMISSION_TABLES),
+            help="limit the spreadsheet to this table, may be repeated",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            tables = build_submission(
+                options["plate"],
+                accession_prefix=options["accession_prefix"],
+                tables=options["tables"],
+            )
+        except SplitSeqPlate.DoesNotExist:
+            raise CommandError("Unknown plate {}".format(options["plate"])) from None
+
+        write_submission(tables, options["output"])
+        for name, table in tables.items():
+            self.stdout.write("{}\t{}".format(name, len(table)))
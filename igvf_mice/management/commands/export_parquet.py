@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from ...io.parquet import DEFAULT_BATCH_SIZE, export_database
+
+
+class Command(BaseCommand):
+    help = "Export the igvf_mice tables and a sample lineage table to parquet"
+
+    def add_arguments(self, parser):
+        parser.add_argument("output_dir", help="directory to write the parquet tables to")
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            default=False,
+            help="only append rows added since the last export to tables with integer keys",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="rows to fetch from the database per record batch",
+        )
+        parser.add_argument(
+            "--table",
+            action="append",
+            dest="tables",
+            help="limit the export to this table, may be repeated",
+        )
+
+    def handle(self, *args, **options):
+        written = export_database(
+            options["output_dir"],
+            incremental=options["incremental"],
+            batch_size=options["batch_size"],
+            tables=options["tables"],
+        )
+        for name, rows in written.items():
+            self.stdout.write("{}\t{}".format(name, rows))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import connections, DEFAULT_DB_ALIAS
+
+from ...io.database import optimize_database
+
+
+class Command(BaseCommand):
+    help = "Refresh the query planner statistics and optionally compact the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database", default=DEFAULT_DB_ALIAS, help="database alias to optimize")
+        parser.add_argument(
+            "--no-analyze",
+            action="store_false",
+            dest="analyze",
+            default=True,
+            help="don't refresh the planner statistics",
+        )
+        parser.add_argument(
+            "--vacuum",
+            action="store_true",
+            default=False,
+            help="rebuild the database to reclaim space, this locks it while it runs",
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        for statement in optimize_database(
+                analyze=options["analyze"], vacuum=options["vacuum"], using=options["database"]):
+            self.stdout.write("{}: {}".format(connection.vendor, statement))
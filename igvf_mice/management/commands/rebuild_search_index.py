@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from ...search import create_search_index, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search entries from the mice, tissues, samples, subpools, files and accessions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database", default=DEFAULT_DB_ALIAS, help="database alias to index")
+
+    def handle(self, *args, **options):
+        create_search_index(using=options["database"])
+        count = rebuild_search_index(using=options["database"])
+        self.stdout.write("Indexed {} search entries".format(count))
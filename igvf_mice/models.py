@@ -1,6 +1,10 @@
 from django.contrib import admin
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Case, F, Q, Sum, When
+from django.db.models.functions import Coalesce, Round
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.html import format_html
 
@@ -43,10 +47,69 @@ __RC_TRANSLATE = str.maketrans({
     "n": "n",
 })
 
+class annotated_property:
+    """A read only property that a queryset annotation can replace
+
+    Unlike property this is a non-data descriptor, so a value
+    annotated onto the instance under the same name takes precedence
+    over computing it in python.
+    """
+    def __init__(self, func):
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return self.func(instance)
+
+
 def reverse_compliment(sequence):
     return sequence[::-1].translate(__RC_TRANSLATE)
 
 
+__RC_TABLE = numpy.arange(256, dtype=numpy.uint8)
+for __base, __complement in __RC_TRANSLATE.items():
+    __RC_TABLE[__base] = ord(__complement)
+
+
+def reverse_compliment_array(sequences):
+    """Reverse compliment an array of sequences at once
+
+    Missing values (None or nan) are returned as None.
+    """
+    sequences = numpy.asarray(sequences)
+    if sequences.ndim != 1:
+        raise ValueError("Expected a 1D array of sequences")
+
+    missing = None
+    if sequences.dtype.kind == "O":
+        missing = pandas.isnull(sequences)
+        sequences = numpy.where(missing, "", sequences).astype(str)
+
+    encoded = numpy.char.encode(sequences.astype(str), "ascii")
+    width = max(encoded.dtype.itemsize, 1)
+    encoded = encoded.astype("S{}".format(width))
+    lengths = numpy.char.str_len(encoded)
+
+    matrix = encoded.view(numpy.uint8).reshape(len(encoded), width)
+    # read each row backwards from the end of its own sequence
+    offsets = lengths[:, None] - 1 - numpy.arange(width)[None, :]
+    in_sequence = offsets >= 0
+    reversed_matrix = numpy.take_along_axis(matrix, numpy.maximum(offsets, 0), axis=1)
+    reversed_matrix = numpy.where(in_sequence, __RC_TABLE[reversed_matrix], 0).astype(numpy.uint8)
+
+    result = numpy.char.decode(
+        reversed_matrix.view("S{}".format(width)).reshape(len(encoded)), "ascii")
+    if missing is not None:
+        result = result.astype(object)
+        result[missing] = None
+    return result
+
+
 class AccessionNamespacesEnum(models.TextChoices):
     IGVF = ("igvf", "IGVF")
     IGVF_TEST = ("igvftst", "IGVF sandbox")
@@ -93,7 +156,8 @@ class Accession(models.Model):
     accession_prefix = models.CharField(
         max_length=10,
         choices=AccessionNamespacesEnum.choices,
-        default=AccessionNamespacesEnum.IGVF
+        default=AccessionNamespacesEnum.IGVF,
+        db_index=True,
     )
     name = models.CharField(max_length=255, primary_key=True, help_text="Accession ID")
     uuid = models.UUIDField(null=True, blank=True)
@@ -201,12 +265,26 @@ class LibraryBarcode(models.Model):
 
     class Meta:
         ordering = ["reagent", "code", "barcode_type"]
+        # the unique index also serves (reagent, code) lookups
+        unique_together = [("reagent", "code", "barcode_type")]
 
     reagent = models.ForeignKey(LibraryConstructionReagent, on_delete=models.PROTECT)
     name = models.CharField(max_length=20, null=True)
     code = models.CharField(max_length=6, null=False)
     i7_sequence = models.CharField(max_length=20, blank=True, null=True)
     i5_sequence = models.CharField(max_length=20, blank=True, null=True)
+    # reverse compliments are stored so observed index sequences can be
+    # looked up with an indexed query. update_library_barcode_rc only
+    # recomputes them when the row is saved: after changing a sequence
+    # they are stale until save(), and bulk_create, bulk_update and
+    # update() never refresh them. Use them for database lookups and
+    # i5_reverse_compliment for the current value.
+    i7_rc = models.CharField(
+        max_length=20, blank=True, null=True, editable=False, db_index=True,
+        help_text="reverse compliment of the i7 sequence, as of the last save")
+    i5_rc = models.CharField(
+        max_length=20, blank=True, null=True, editable=False, db_index=True,
+        help_text="reverse compliment of the i5 sequence, as of the last save")
     # should be an enum, but need to check with others
     barcode_type = models.CharField(max_length=2, null=True)
     well_position = models.CharField(max_length=2, blank=True, null=True)
@@ -219,8 +297,16 @@ class LibraryBarcode(models.Model):
 
     @property
     def i5_reverse_compliment(self):
+        """Reverse compliment of i5_sequence, even before it is saved"""
+        if self.i5_sequence is None:
+            return None
         return reverse_compliment(self.i5_sequence)
 
+    def update_reverse_compliments(self):
+        """Recompute the stored reverse compliments from the sequences"""
+        self.i7_rc = None if self.i7_sequence is None else reverse_compliment(self.i7_sequence)
+        self.i5_rc = None if self.i5_sequence is None else reverse_compliment(self.i5_sequence)
+
     def __str__(self):
         name = [self.name, self.code]
         if self.i7_sequence is None and self.i5_sequence is None:
@@ -238,6 +324,16 @@ class LibraryBarcode(models.Model):
         return " ".join(name)
 
 
+@receiver(pre_save, sender=LibraryBarcode)
+def update_library_barcode_rc(sender, instance, **kwargs):
+    """Keep reverse compliments in sync, including for fixture loads
+
+    bulk_create and update() skip this, so call
+    update_reverse_compliments() on those records yourself.
+    """
+    instance.update_reverse_compliments()
+
+
 class StrainType(models.TextChoices):
     FOUNDER = ("FO", "CC Founder")
     F1 = ("F1", "CC F1")
@@ -556,6 +652,22 @@ def require_3_underscores(value):
 
 
 # this is closest to being a tissue specific biosample object
+class TissueQuerySet(models.QuerySet):
+    def with_weights(self):
+        """Annotate weight_g and weight_mg computed by the database"""
+        weight_g = F("total_weight_g") - F("tube_weight_g")
+        return self.annotate(
+            weight_g=weight_g,
+            weight_mg=Round(weight_g * 1000, 3),
+        )
+
+    def with_nuclei_yield(self):
+        """Annotate nuclei_yield, the total nuclei of the sample extractions"""
+        return self.annotate(
+            nuclei_yield=Sum(total_nuclei_expression("sampleextraction__")),
+        )
+
+
 class Tissue(models.Model):
     """Track a tissue or tissues dissected from a mouse as one unit
 
@@ -572,6 +684,8 @@ class Tissue(models.Model):
     class Meta:
         ordering = ["name"]
 
+    objects = TissueQuerySet.as_manager()
+
     name = models.CharField(
         max_length=50,
         primary_key=True,
@@ -626,7 +740,7 @@ class Tissue(models.Model):
         Accession, help_text="Accession IDs assigned to this sample"
     )
 
-    @property
+    @annotated_property
     def weight_g(self):
         """Calculate weight of tissue from final and initial tube weights"""
         if not (self.tube_weight_g is None or self.total_weight_g is None):
@@ -634,7 +748,7 @@ class Tissue(models.Model):
         else:
             return None
 
-    @property
+    @annotated_property
     def weight_mg(self):
         """Convert weight calculated in grams to miligrams rounded to 3 decimals"""
         precision = 3
@@ -710,7 +824,11 @@ def nuclei_per_ul(self):
 
 def nuclei_per_ml(self):
     """Return million nuceli per mililiter
+
+    will return None if with_counts() annotated a NULL nuclei_per_ul
     """
+    if self.nuclei_per_ul is None:
+        return None
 
     return self.nuclei_per_ul * 1000
 
@@ -722,6 +840,61 @@ def total_nuclei(self):
     return self.nuclei_per_ul * self.volume_ul
 
 
+# SQL versions of the tube support functions. NULL takes the place of
+# nan, and propagates through the arithmetic the same way.
+def average_defined_expression(field1, field2, value1=None, value2=None):
+    """Average of two values, skipping a value whose field is NULL
+
+    :param value1: expression to use for field1, defaults to the field
+    :param value2: expression to use for field2, defaults to the field
+    """
+    value1 = F(field1) if value1 is None else value1
+    value2 = F(field2) if value2 is None else value2
+    return Case(
+        When(Q(**{field2 + "__isnull": True}), then=value1),
+        When(Q(**{field1 + "__isnull": True}), then=value2),
+        default=(value1 + value2) / 2.0,
+    )
+
+
+def average_count_expression(prefix=""):
+    """Average of the defined counts, prefix is the lookup path to the tube"""
+    return average_defined_expression(prefix + "count1", prefix + "count2")
+
+
+def df_scaled_count_expression(prefix=""):
+    # the second count reuses the first dilution factor if it has none
+    return average_defined_expression(
+        prefix + "count1",
+        prefix + "count2",
+        F(prefix + "count1") * F(prefix + "df1"),
+        F(prefix + "count2") * Coalesce(F(prefix + "df2"), F(prefix + "df1")),
+    )
+
+
+def nuclei_per_ul_expression(prefix=""):
+    return Coalesce(
+        F(prefix + "input_nuclei_per_ul"),
+        df_scaled_count_expression(prefix) * .00001,
+    )
+
+
+def total_nuclei_expression(prefix=""):
+    return nuclei_per_ul_expression(prefix) * F(prefix + "volume_ul")
+
+
+class TubeQuerySet(models.QuerySet):
+    """Queries for the models sharing the tube support functions"""
+    def with_counts(self):
+        """Annotate average_count, df_scaled_count, nuclei_per_ul and total_nuclei"""
+        return self.annotate(
+            average_count=average_count_expression(),
+            df_scaled_count=df_scaled_count_expression(),
+            nuclei_per_ul=nuclei_per_ul_expression(),
+            total_nuclei=total_nuclei_expression(),
+        )
+
+
 # This is the peach colored "before fixation" step of the spreadsheet tab
 class SampleExtraction(models.Model):
     """Isolate cells or nuclei from the source tissue
@@ -754,11 +927,13 @@ class SampleExtraction(models.Model):
     )
     protocols = models.ManyToManyField("ProtocolLink")
 
-    average_count = property(average_count)
-    df_scaled_count = property(df_scaled_count)
-    nuclei_per_ul = property(nuclei_per_ul)
+    objects = TubeQuerySet.as_manager()
+
+    average_count = annotated_property(average_count)
+    df_scaled_count = annotated_property(df_scaled_count)
+    nuclei_per_ul = annotated_property(nuclei_per_ul)
     nuclei_per_ml = property(nuclei_per_ml)
-    total_nuclei = property(total_nuclei)
+    total_nuclei = annotated_property(total_nuclei)
 
     @property
     def parse_input_ml(self):
@@ -769,10 +944,14 @@ class SampleExtraction(models.Model):
 
     @property
     def nuclei_into_parse(self):
+        if self.nuclei_per_ul is None or self.parse_input_ul is None:
+            return None
         return self.nuclei_per_ul * self.parse_input_ul
 
     @property
     def nuclei_into_share(self):
+        if self.nuclei_per_ul is None or self.share_input_ul is None:
+            return None
         return self.nuclei_per_ul * self.share_input_ul
 
 
@@ -799,19 +978,37 @@ class ParseFixedSample(models.Model):
     aliquot_volume_ul = models.FloatField(null=True)
     comments = models.TextField(null=True)
 
-    average_count = property(average_count)
-    df_scaled_count = property(df_scaled_count)
-    nuclei_per_ul = property(nuclei_per_ul)
-    total_nuclei = property(total_nuclei)
+    objects = TubeQuerySet.as_manager()
+
+    average_count = annotated_property(average_count)
+    df_scaled_count = annotated_property(df_scaled_count)
+    nuclei_per_ul = annotated_property(nuclei_per_ul)
+    total_nuclei = annotated_property(total_nuclei)
 
     @property
     def fraction_recovered(self):
-        return self.total_nuclei / self.extraction.nuclei_into_parse
+        nuclei_into_parse = self.extraction.nuclei_into_parse
+        if self.total_nuclei is None or nuclei_into_parse is None:
+            return None
+        return self.total_nuclei / nuclei_into_parse
 
     def __str__(self):
         return self.name
 
 
+class NucleicAcidExtractionQuerySet(models.QuerySet):
+    def with_concentration(self):
+        """Annotate average_concentration and total computed by the database"""
+        average_concentration = Coalesce(
+            F("input_ng_per_ul"),
+            average_defined_expression("concentration1", "concentration2"),
+        )
+        return self.annotate(
+            average_concentration=average_concentration,
+            total=average_concentration * F("volume_ul"),
+        )
+
+
 class NucleicAcidExtraction(models.Model):
     name = models.CharField(max_length=50, primary_key=True)
     date = models.DateField(null=True)
@@ -827,7 +1024,9 @@ class NucleicAcidExtraction(models.Model):
     comments = models.TextField(null=True)
     protocols = models.ManyToManyField("ProtocolLink")
 
-    @property
+    objects = NucleicAcidExtractionQuerySet.as_manager()
+
+    @annotated_property
     def average_concentration(self):
         if self.input_ng_per_ul is not None:
             return self.input_ng_per_ul
@@ -842,7 +1041,7 @@ class NucleicAcidExtraction(models.Model):
         else:
             return sum(values)/len(values)
 
-    @property
+    @annotated_property
     def total(self):
         return self.average_concentration * self.volume_ul
 
@@ -888,6 +1087,12 @@ class PlateSizeEnum(models.TextChoices):
 # represent the mixture and the end of of a plate construction step,
 # but before it gets illumina barcodes for final sequeinging.
 
+class SplitSeqPlateQuerySet(models.QuerySet):
+    def with_total_nuclei(self):
+        """Annotate total_nuclei computed by the database"""
+        return self.annotate(total_nuclei=F("barcoded_cell_counter") * F("volume_of_nuclei"))
+
+
 class SplitSeqPlate(models.Model):
     """a plate of wells used to start labeling nuclei.
 
@@ -926,10 +1131,12 @@ class SplitSeqPlate(models.Model):
     barcoded_cell_counter = models.IntegerField(null=True)
     volume_of_nuclei = models.IntegerField(null=True)
 
+    objects = SplitSeqPlateQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
-    @property
+    @annotated_property
     def total_nuclei(self):
         """Compute the number of nuclei from the cell count and volume"""
         if self.barcoded_cell_counter is None or self.volume_of_nuclei is None:
@@ -969,6 +1176,7 @@ class SplitSeqWell(models.Model):
     """
     class Meta:
         ordering = ("plate", "row", "column")
+        unique_together = [("plate", "row", "column")]
 
     plate = models.ForeignKey("SplitSeqPlate", on_delete=models.PROTECT)
     row = models.CharField(max_length=2, choices=well_rows)
@@ -994,6 +1202,40 @@ class SplitSeqWell(models.Model):
         return "{}{}".format(self.row, self.column)
 
 
+class SplitSeqWellReadCount(models.Model):
+    """Reads assigned to a well by their round 1 barcode
+
+    This is a quick QC check of a :model:`igvf_mice.SplitSeqPlate`
+    layout computed from the read 2 fastqs of a
+    :model:`igvf_mice.SequencingFile` without running the full
+    pipeline.
+
+    Reads whose barcode didn't match any well of the plate are stored
+    with an empty :model:`igvf_mice.SplitSeqWell`.
+    """
+    class Meta:
+        ordering = ("plate", "well")
+
+    plate = models.ForeignKey("SplitSeqPlate", on_delete=models.CASCADE)
+    well = models.ForeignKey(
+        "SplitSeqWell",
+        on_delete=models.CASCADE,
+        null=True,
+        help_text="well the reads were assigned to, empty for unmatched reads",
+    )
+    sequencing_file = models.ForeignKey(
+        "SequencingFile",
+        on_delete=models.CASCADE,
+        null=True,
+        help_text="fastq that was scanned",
+    )
+    reads = models.BigIntegerField(help_text="number of reads assigned to the well")
+
+    def __str__(self):
+        well = "unassigned" if self.well is None else self.well.well
+        return "{} {} {}".format(self.plate.name, well, self.reads)
+
+
 class Subpool(models.Model):
     """aloquots of cells that have had an illumina multiplexing barcode added.
 
@@ -1007,6 +1249,15 @@ class Subpool(models.Model):
     :model:`igvf_mice.SequencingFile` items to their source subpools
     and runs.
     """
+    class Meta:
+        # index is often missing, so this can't be a unique constraint
+        indexes = [
+            models.Index(
+                fields=["plate", "index", "selection_type"],
+                name="subpool_plate_index",
+            ),
+        ]
+
     name = models.CharField(max_length=50, primary_key=True)
     plate = models.ForeignKey("SplitSeqPlate", on_delete=models.PROTECT)
     nuclei = models.IntegerField()
@@ -1205,9 +1456,19 @@ class SequencingFile(models.Model):
     :model:`igvf_mice.Accession` IDs.
 
     """
+    class Meta:
+        # filenames like Undetermined_S0_L001_R1_001.fastq.gz repeat
+        # between runs so neither index is unique
+        indexes = [
+            models.Index(
+                fields=["sequencing_run", "library_in_run"],
+                name="sequencingfile_run_library",
+            ),
+        ]
+
     sequencing_run = models.ForeignKey(SequencingRun, on_delete=models.PROTECT)
     library_in_run = models.ForeignKey(LibraryInRun, on_delete=models.PROTECT)
-    filename = models.CharField(max_length=255, null=False, blank=False)
+    filename = models.CharField(max_length=255, null=False, blank=False, db_index=True)
     file_type = models.CharField(
         max_length=4, choices=FileType.choices, null=True, blank=False)
     md5sum = models.CharField(
@@ -1246,3 +1507,25 @@ class MeasurementSet(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class SearchEntry(models.Model):
+    """One searchable identifier of a sample, library, file or accession
+
+    The rows are maintained by igvf_mice.search from the saved
+    objects, kind is the API name of the object's endpoint and
+    object_id its primary key.
+    """
+    class Meta:
+        verbose_name_plural = "search entries"
+        indexes = [
+            models.Index(fields=["kind", "object_id"], name="searchentry_object"),
+        ]
+
+    kind = models.CharField(max_length=30)
+    object_id = models.CharField(max_length=255)
+    field = models.CharField(max_length=30)
+    text = models.CharField(max_length=255)
+
+    def __str__(self):
+        return "{} {} {}: {}".format(self.kind, self.object_id, self.field, self.text)
@@ -0,0 +1,257 @@
+"""Process wide cache of the small reference tables
+
+Platforms, mouse strains, sources, ontology terms, protocols, library
+construction reagents and their barcodes change rarely but get looked
+up constantly while loading sheets and serializing samples. Each
+ReferenceTable loads all of its rows once and answers lookups from
+memory until one of its rows, or a row of a table it depends on, is
+saved or deleted.
+
+Setting IGVF_MICE_REFERENCE_CACHE to the alias of a Django cache
+shares the rows between processes. A generation counter kept in that
+cache is bumped on every change, so a process that didn't see the
+save reloads the rows on its next lookup.
+
+A rollback undoes changes without sending any signals, so a table
+changed inside a transaction is cleared again if the transaction ends
+without committing. A savepoint rolled back inside a transaction that
+does commit is only noticed once the outer transaction ends.
+
+Lookups can run in several threads at once. A lookup that raced a
+clear answers from the rows it had already loaded.
+
+The cached instances are shared, treat them as read only.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from . import models
+
+REFERENCE_CACHE_TIMEOUT = 60 * 60
+
+
+def get_shared_cache():
+    """Return the Django cache shared between processes, or None"""
+    alias = getattr(settings, "IGVF_MICE_REFERENCE_CACHE", None)
+    if alias is None:
+        return None
+    return caches[alias]
+
+
+class ReferenceTable:
+    """All the rows of a rarely changing model indexed by a few keys
+
+    :param keys: field names, or tuples of field names, to look rows
+        up by in addition to the primary key
+    :param related: foreign keys to load with select_related
+    :param depends_on: ReferenceTables whose changes also clear this
+        one, usually the tables in related
+    """
+    def __init__(self, model, keys=(), related=(), depends_on=()):
+        self.model = model
+        self.keys = [(x,) if isinstance(x, str) else tuple(x) for x in keys]
+        self.related = related
+        self.dependents = []
+        for table in depends_on:
+            table.dependents.append(self)
+
+        # (generation, rows by pk, indexes) swapped in and out as one
+        # value, so a thread never sees the rows of one load with the
+        # indexes of another, or half of a clear
+        self._snapshot = None
+        # connection with a change to this table that isn't committed yet
+        self._uncommitted = None
+
+        post_save.connect(self.clear, sender=model, weak=False)
+        post_delete.connect(self.clear, sender=model, weak=False)
+
+    @property
+    def generation_key(self):
+        return "igvf_mice:reference:{}:generation".format(self.model._meta.label_lower)
+
+    def rows_key(self, generation):
+        return "igvf_mice:reference:{}:{}".format(self.model._meta.label_lower, generation)
+
+    def _query(self):
+        return list(self.model.objects.select_related(*self.related).order_by("pk"))
+
+    def _build(self, generation, rows):
+        indexes = {}
+        for key in self.keys:
+            index = indexes[key] = {}
+            for row in rows:
+                value = tuple(getattr(row, x) for x in key)
+                index.setdefault(value, []).append(row)
+        return generation, {x.pk: x for x in rows}, indexes
+
+    def _load(self):
+        """Return the current (generation, rows, indexes) snapshot"""
+        uncommitted = self._uncommitted
+        if uncommitted is not None and not uncommitted.in_atomic_block:
+            # the transaction ended without running _committed, so the
+            # change was rolled back
+            self.clear()
+
+        snapshot = self._snapshot
+        shared = get_shared_cache()
+        if shared is None:
+            if snapshot is None:
+                snapshot = self._snapshot = self._build(None, self._query())
+            return snapshot
+
+        generation = shared.get(self.generation_key, 0)
+        if snapshot is None or generation != snapshot[0]:
+            rows = shared.get(self.rows_key(generation))
+            if rows is None:
+                rows = self._query()
+                shared.set(self.rows_key(generation), rows, REFERENCE_CACHE_TIMEOUT)
+            snapshot = self._snapshot = self._build(generation, rows)
+        return snapshot
+
+    def clear(self, sender=None, using=None, **kwargs):
+        """Forget the rows of this table and the tables depending on it
+
+        :param using: database alias the change was made on, if it is
+            inside a transaction the table is cleared again unless the
+            transaction commits
+        """
+        self._snapshot = None
+        self._uncommitted = None
+        if using is not None:
+            connection = transaction.get_connection(using)
+            if connection.in_atomic_block:
+                self._uncommitted = connection
+                transaction.on_commit(self._committed, using=using)
+        shared = get_shared_cache()
+        if shared is not None:
+            shared.add(self.generation_key, 0, timeout=None)
+            shared.incr(self.generation_key)
+        for table in self.dependents:
+            table.clear(using=using)
+
+    def _committed(self):
+        self._uncommitted = None
+
+    def all(self):
+        """Return every row ordered by primary key"""
+        _, rows, _ = self._load()
+        return list(rows.values())
+
+    def get(self, pk):
+        """Return the row with primary key pk
+
+        Raises the model's DoesNotExist like objects.get.
+        """
+        _, rows, _ = self._load()
+        try:
+            return rows[pk]
+        except KeyError:
+            raise self.model.DoesNotExist(
+                "{} {} does not exist".format(self.model._meta.object_name, pk)) from None
+
+    def filter_by(self, **lookup):
+        """Return the list of rows whose fields equal lookup
+
+        The fields have to be one of the keys of the table.
+        """
+        _, _, indexes = self._load()
+        key = tuple(sorted(lookup))
+        for index_key, index in indexes.items():
+            if tuple(sorted(index_key)) == key:
+                return list(index.get(tuple(lookup[x] for x in index_key), []))
+        raise KeyError("{} is not indexed by {}".format(self.model._meta.object_name, key))
+
+    def get_by(self, **lookup):
+        """Return the single row whose fields equal lookup"""
+        rows = self.filter_by(**lookup)
+        if len(rows) == 0:
+            raise self.model.DoesNotExist(
+                "{} matching {} does not exist".format(self.model._meta.object_name, lookup))
+        elif len(rows) > 1:
+            raise self.model.MultipleObjectsReturned(
+                "{} {} matched {}".format(self.model._meta.object_name, lookup, len(rows)))
+        return rows[0]
+
+
+sources = ReferenceTable(models.Source)
+platforms = ReferenceTable(models.Platform)
+ontology_terms = ReferenceTable(models.OntologyTerm)
+protocols = ReferenceTable(models.ProtocolLink, keys=["see_also"])
+mouse_strains = ReferenceTable(
+    models.MouseStrain, keys=["display_name"], related=["source"], depends_on=[sources])
+reagents = ReferenceTable(
+    models.LibraryConstructionReagent, related=["source"], depends_on=[sources])
+barcodes = ReferenceTable(
+    models.LibraryBarcode,
+    keys=[("reagent_id", "code"), ("reagent_id", "code", "barcode_type")],
+    related=["reagent"],
+    depends_on=[reagents],
+)
+
+REFERENCE_TABLES = {
+    table.model: table
+    for table in [sources, platforms, ontology_terms, protocols, mouse_strains, reagents, barcodes]
+}
+
+
+def clear_reference_cache(sender=None, **kwargs):
+    """Forget every cached row
+
+    Also connected to post_migrate, which flush sends, since flushing
+    the database doesn't send post_delete.
+    """
+    for table in REFERENCE_TABLES.values():
+        table.clear()
+
+
+def get_reference_table(model):
+    """Return the ReferenceTable caching model, or None"""
+    return REFERENCE_TABLES.get(model)
+
+
+def get_source(name):
+    return sources.get(name)
+
+
+def get_platform(name):
+    return platforms.get(name)
+
+
+def get_ontology_term(curie):
+    return ontology_terms.get(curie)
+
+
+def get_protocol(name):
+    return protocols.get(name)
+
+
+def get_protocol_by_url(see_also):
+    return protocols.get_by(see_also=see_also)
+
+
+def get_mouse_strain(name):
+    return mouse_strains.get(name)
+
+
+def get_reagent(name):
+    return reagents.get(name)
+
+
+def get_barcode(pk):
+    return barcodes.get(pk)
+
+
+def get_barcodes(reagent, code, barcode_type=None):
+    """Return the barcodes with a well code from a reagent
+
+    :param reagent: LibraryConstructionReagent or its name
+    :param barcode_type: limit to one barcode type, by default all
+        the types for the code are returned
+    """
+    if isinstance(reagent, models.LibraryConstructionReagent):
+        reagent = reagent.pk
+    if barcode_type is None:
+        return barcodes.filter_by(reagent_id=reagent, code=code)
+    return barcodes.filter_by(reagent_id=reagent, code=code, barcode_type=barcode_type)
@@ -0,0 +1,239 @@
+"""Substring search over the sample, library and file identifiers
+
+Identifiers like 046_NZOJ or igvf003_13A are usually typed partially,
+which a plain LIKE '%x%' can only answer by scanning every table.
+Instead the searchable fields of each SearchSource are copied into
+SearchEntry rows, kept up to date by post_save and post_delete, and
+indexed for substring matches: SQLite gets an FTS5 table with the
+trigram tokenizer, PostgreSQL a pg_trgm GIN index. Queries shorter
+than a trigram fall back to scanning the entries, as do all queries
+on SQLite builds without FTS5 or its trigram tokenizer (before 3.34).
+
+Inside deferred_indexing the saves and deletes are collected and
+indexed together when the block ends, which is much faster for bulk
+loads. bulk_create, update() and raw SQL skip the signals, run
+rebuild_search_index after loading data that way.
+"""
+from contextlib import contextmanager
+import threading
+
+from django.db import connections, DEFAULT_DB_ALIAS, OperationalError, transaction
+from django.db.models import Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Length, Lower, StrIndex
+from django.db.models.signals import post_delete, post_save
+
+from . import models
+
+DEFAULT_SEARCH_LIMIT = 50
+# trigram indexes can't match anything shorter
+MIN_INDEXED_LENGTH = 3
+BATCH_SIZE = 500
+FTS_TABLE = "{}_fts".format(models.SearchEntry._meta.db_table)
+FTS_TOKENIZER = "trigram"
+
+_deferred = threading.local()
+
+
+class SearchSource:
+    """The fields of a model to search
+
+    :param kind: name of the object type in search results, the
+        same as its API endpoint
+    :param fields: text fields to search
+    """
+    def __init__(self, kind, model, fields):
+        self.kind = kind
+        self.model = model
+        self.fields = fields
+
+        post_save.connect(self.index_instance, sender=model, weak=False)
+        post_delete.connect(self.delete_instance, sender=model, weak=False)
+
+    @property
+    def basename(self):
+        """The router basename of the model's viewset"""
+        return self.model._meta.model_name
+
+    def make_entries(self, pk, values):
+        return [
+            models.SearchEntry(kind=self.kind, object_id=str(pk), field=field, text=value)
+            for field, value in zip(self.fields, values)
+            if value
+        ]
+
+    def index_instance(self, sender=None, instance=None, using=DEFAULT_DB_ALIAS, **kwargs):
+        """post_save receiver replacing the entries of an instance"""
+        self.update(using, {instance.pk: instance})
+
+    def delete_instance(self, sender=None, instance=None, using=DEFAULT_DB_ALIAS, **kwargs):
+        """post_delete receiver removing the entries of an instance"""
+        self.update(using, {instance.pk: None})
+
+    def update(self, using, instances):
+        """Replace the entries of {pk: instance}, a None instance was deleted"""
+        pending = getattr(_deferred, "pending", None)
+        if pending is not None:
+            pending.setdefault((self, using), {}).update(instances)
+            return
+
+        entries = []
+        for pk, instance in instances.items():
+            if instance is not None:
+                entries.extend(self.make_entries(
+                    pk, [getattr(instance, field) for field in self.fields]))
+        object_ids = [str(pk) for pk in instances]
+        with transaction.atomic(using=using):
+            for start in range(0, len(object_ids), BATCH_SIZE):
+                models.SearchEntry.objects.using(using).filter(
+                    kind=self.kind, object_id__in=object_ids[start:start + BATCH_SIZE]).delete()
+            models.SearchEntry.objects.using(using).bulk_create(entries, batch_size=BATCH_SIZE)
+
+    def all_entries(self, using=DEFAULT_DB_ALIAS):
+        rows = self.model.objects.using(using).values_list("pk", *self.fields)
+        for row in rows.iterator():
+            yield from self.make_entries(row[0], row[1:])
+
+
+SEARCH_SOURCES = [
+    SearchSource("mouse", models.Mouse, ["name"]),
+    SearchSource("tissue", models.Tissue, ["name", "tube_label", "description"]),
+    SearchSource("parse-fixed-sample", models.ParseFixedSample, ["name"]),
+    SearchSource("subpool", models.Subpool, ["name"]),
+    SearchSource("sequencing-file", models.SequencingFile, ["filename"]),
+    SearchSource("accession", models.Accession, ["name"]),
+]
+SEARCH_KINDS = {source.kind: source for source in SEARCH_SOURCES}
+MAX_FIELDS = max(len(source.fields) for source in SEARCH_SOURCES)
+
+
+@contextmanager
+def deferred_indexing():
+    """Index the objects saved or deleted in the block when it ends
+
+    Nested blocks are indexed when the outermost one ends.
+    """
+    if getattr(_deferred, "pending", None) is not None:
+        yield
+        return
+
+    _deferred.pending = {}
+    try:
+        yield
+        pending = _deferred.pending
+    finally:
+        _deferred.pending = None
+    for (source, using), instances in pending.items():
+        source.update(using, instances)
+
+
+def create_search_index(sender=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    """post_migrate receiver creating the substring index on SearchEntry
+
+    On SQLite the FTS5 table is an external content table of
+    SearchEntry kept in sync by triggers, and is filled from the
+    existing entries when it is first created. It is skipped when
+    SQLite can't create it, and search scans the entries instead.
+    """
+    connection = connections[using]
+    table = models.SearchEntry._meta.db_table
+    if connection.vendor == "sqlite":
+        exists = has_fts_table(using)
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            try:
+                with transaction.atomic(using=using):
+                    cursor.execute(
+                        "CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                        "text, content='{table}', content_rowid='id', tokenize='{tokenizer}')"
+                        .format(fts=FTS_TABLE, table=table, tokenizer=FTS_TOKENIZER))
+            except OperationalError:
+                # no such module: fts5, or no such tokenizer
+                return
+            cursor.execute(
+                "CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN "
+                "INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); END".format(
+                    fts=FTS_TABLE, table=table))
+            cursor.execute(
+                "CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN "
+                "INSERT INTO {fts}({fts}, rowid, text) VALUES ('delete', old.id, old.text); "
+                "END".format(fts=FTS_TABLE, table=table))
+            cursor.execute(
+                "CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE ON {table} BEGIN "
+                "INSERT INTO {fts}({fts}, rowid, text) VALUES ('delete', old.id, old.text); "
+                "INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); END".format(
+                    fts=FTS_TABLE, table=table))
+            if not exists:
+                cursor.execute("INSERT INTO {fts}({fts}) VALUES ('rebuild')".format(fts=FTS_TABLE))
+        elif connection.vendor == "postgresql":
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            # matches the UPPER(text::text) LIKE UPPER(%s) of icontains
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS searchentry_text_trgm ON {table} "
+                "USING gin ((UPPER(text::text)) gin_trgm_ops)".format(table=table))
+
+
+def rebuild_search_index(using=DEFAULT_DB_ALIAS, batch_size=BATCH_SIZE):
+    """Replace every SearchEntry with ones built from the current rows
+
+    Returns the number of entries created.
+    """
+    count = 0
+    with transaction.atomic(using=using):
+        models.SearchEntry.objects.using(using).all().delete()
+        for source in SEARCH_SOURCES:
+            entries = list(source.all_entries(using))
+            models.SearchEntry.objects.using(using).bulk_create(entries, batch_size=batch_size)
+            count += len(entries)
+    return count
+
+
+def has_fts_table(using=DEFAULT_DB_ALIAS):
+    """Check if the SQLite FTS5 table was created"""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [FTS_TABLE])
+        return cursor.fetchone()[0] > 0
+
+
+def fts_phrase(query):
+    """Quote query as an FTS5 phrase, which the trigram tokenizer matches as a substring"""
+    return '"{}"'.format(query.replace('"', '""'))
+
+
+def search(query, kinds=None, limit=DEFAULT_SEARCH_LIMIT, using=DEFAULT_DB_ALIAS):
+    """Return the SearchEntry rows containing query, one per object
+
+    Matches are case insensitive. Exact matches come first, then the
+    entries where query appears earliest, then the shortest ones.
+
+    :param kinds: limit the results to these SearchSource kinds
+    """
+    query = query.strip()
+    if not query:
+        return []
+
+    entries = models.SearchEntry.objects.using(using)
+    if kinds:
+        entries = entries.filter(kind__in=kinds)
+
+    vendor = connections[using].vendor
+    if vendor == "sqlite" and len(query) >= MIN_INDEXED_LENGTH and has_fts_table(using):
+        entries = entries.filter(id__in=RawSQL(
+            "SELECT rowid FROM {fts} WHERE {fts} MATCH %s".format(fts=FTS_TABLE),
+            [fts_phrase(query)],
+        ))
+    else:
+        entries = entries.filter(text__icontains=query)
+
+    entries = entries.annotate(
+        position=StrIndex(Lower("text"), Value(query.lower())),
+        length=Length("text"),
+    ).order_by("position", "length", "kind", "object_id")
+
+    # an object matches through at most MAX_FIELDS entries
+    hits = {}
+    for entry in entries[:limit * MAX_FIELDS]:
+        hits.setdefault((entry.kind, entry.object_id), entry)
+    return list(hits.values())[:limit]
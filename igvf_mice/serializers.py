@@ -4,6 +4,7 @@ from urllib.parse import urlsplit
 
 from django.conf import settings
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from igvf_mice.models import (
     Accession,
     Source,
@@ -33,7 +34,10 @@ from igvf_mice.models import (
     LibraryInRun,
     SequencingFile,
     MeasurementSet,
+    SearchEntry,
 )
+from igvf_mice import reference
+from igvf_mice import search
 
 
 def expand_field(value, field_model, field_serializer, request, pkname="name"):
@@ -46,7 +50,11 @@ def expand_field(value, field_model, field_serializer, request, pkname="name"):
         urlpath = urlsplit(value).path
         parts = [x for x in urlpath.split("/") if len(x) > 0]
         object_name = parts[-1]
-        obj = field_model.objects.get(**{pkname: object_name})
+        table = reference.get_reference_table(field_model)
+        if table is not None and pkname in ("pk", field_model._meta.pk.name):
+            obj = table.get(field_model._meta.pk.to_python(object_name))
+        else:
+            obj = field_model.objects.get(**{pkname: object_name})
         # ceral is a pun for serialized
         context = {"request": request}
         cereal = field_serializer(obj, context=context)
@@ -115,6 +123,25 @@ class LibraryBarcodeSerializer(serializers.HyperlinkedModelSerializer):
         ]
 
 
+class ReferenceFieldsMixin:
+    """Fill foreign keys to reference tables from the reference cache
+
+    The foreign keys named in reference_fields are set from
+    :mod:`igvf_mice.reference` before serializing, so nested
+    serializers and dotted sources don't query for every row.
+    """
+    reference_fields = []
+
+    def to_representation(self, instance):
+        for name in self.reference_fields:
+            field = instance._meta.get_field(name)
+            value = getattr(instance, field.attname)
+            if value is not None and not field.is_cached(instance):
+                table = reference.get_reference_table(field.related_model)
+                field.set_cached_value(instance, table.get(value))
+        return super().to_representation(instance)
+
+
 class PlatformSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         model = Platform
@@ -127,7 +154,7 @@ class PlatformSerializer(serializers.HyperlinkedModelSerializer):
         ]
 
 
-class SequencingRunChildSerializer(serializers.HyperlinkedModelSerializer):
+class SequencingRunChildSerializer(ReferenceFieldsMixin, serializers.HyperlinkedModelSerializer):
     """Simple SequencingRun serialiizer.
 
     This version does not link to the SplitSeqPlate objects.
@@ -147,6 +174,7 @@ class SequencingRunChildSerializer(serializers.HyperlinkedModelSerializer):
             "libraryinrun_set",
         ]
 
+    reference_fields = ["platform"]
     platform = PlatformSerializer()
     stranded = serializers.ChoiceField(choices=StrandedEnum.choices)
 
@@ -403,9 +431,14 @@ class NucleicAcidExtractionSerializer(serializers.HyperlinkedModelSerializer):
     total = serializers.SerializerMethodField()
 
     def get_average_concentration(self, obj):
+        # annotated querysets return None instead of nan
+        if obj.average_concentration is None:
+            return None
         return numpy.round(obj.average_concentration, 2)
 
     def get_total(self, obj):
+        if obj.total is None:
+            return None
         return numpy.round(obj.total, 2)
 
     def to_representation(self, value):
@@ -580,7 +613,8 @@ class SequencingFileSerializer(serializers.HyperlinkedModelSerializer):
         request = self.context.get("request")
 
         if "accession" in data:
-            data["accession"] = expand_field(data["accession"], Accession, AccessionSerializer, request)
+            data["accession"] = AccessionSerializer(
+                value.accession.all(), many=True, context={"request": request}).data
         return data
 
 
@@ -616,7 +650,8 @@ class IgvfLabInfoMixin:
         return "/labs/{}".format(settings.LAB_ALIAS)
 
 
-class IgvfRodentDonorSerializer(serializers.HyperlinkedModelSerializer, IgvfLabInfoMixin):
+class IgvfRodentDonorSerializer(
+        ReferenceFieldsMixin, serializers.HyperlinkedModelSerializer, IgvfLabInfoMixin):
     class Meta:
         model = Mouse
         fields = [
@@ -635,6 +670,7 @@ class IgvfRodentDonorSerializer(serializers.HyperlinkedModelSerializer, IgvfLabI
             "rodent_identifier",
         ]
 
+    reference_fields = ["strain"]
     accession = AccessionSerializer(many=True, required=False)
     aliases = serializers.SerializerMethodField()
     award = serializers.SerializerMethodField()
@@ -679,7 +715,7 @@ class IgvfSequencingFileSerializer(serializers.HyperlinkedModelSerializer, IgvfL
     file_format = serializers.SerializerMethodField()
     # file_set
     # content_type
-    flowcell_id = serializers.CharField()
+    flowcell_id = serializers.CharField(source="sequencing_run.flowcell_id", allow_null=True)
     lane = serializers.IntegerField()
     # sequencing_run
     submitted_file_name = serializers.CharField(source="filename")
@@ -758,16 +794,19 @@ class IgvfSequenceFileSerializer(serializers.HyperlinkedModelSerializer, IgvfLab
     md5sum = serializers.CharField()
     #file_format = serializers.CharField()
     #file_set = serializers.CharField()
-    flowcell_id = serializers.CharField()
+    flowcell_id = serializers.CharField(source="sequencing_run.flowcell_id", allow_null=True)
     lane = serializers.IntegerField()
     #sequencing_run = serializers.IntegerField()
     submitted_file_name = serializers.CharField(source="filename")
     illumina_read_type = serializers.CharField(source="read", allow_null=True)
-    # this is slow.
-    sequencing_platform = serializers.CharField(source="sequencing_run.platform.igvf_id")
+    sequencing_platform = serializers.SerializerMethodField()
     #seqspec = serializers.CharField()
 
 
+    def get_sequencing_platform(self, obj):
+        return reference.get_platform(obj.sequencing_run.platform_id).igvf_id
+
+
 class IgvfSeqSpecSequenceRegionSerializer(serializers.Serializer):
     class Meta:
         fields = []
@@ -876,7 +915,7 @@ class PipelineBiosampleSerializer(serializers.HyperlinkedModelSerializer):
     genotype = serializers.CharField(source="mouse.strain.name", read_only=True)
 
 
-class PipelineMouseSerializer(serializers.HyperlinkedModelSerializer):
+class PipelineMouseSerializer(ReferenceFieldsMixin, serializers.HyperlinkedModelSerializer):
     class Meta:
         model = Mouse
         fields = [
@@ -895,6 +934,7 @@ class PipelineMouseSerializer(serializers.HyperlinkedModelSerializer):
             "genotype",
         ]
 
+    reference_fields = ["strain"]
     estrus_cycle = serializers.CharField(source="get_estrus_cycle_display")
     sex = serializers.CharField(source="get_sex_display")
     body_weight_g = serializers.DecimalField(source="weight_g", max_digits=8, decimal_places=3, min_value=0)
@@ -910,7 +950,7 @@ class PipelineTissueSerializer(serializers.HyperlinkedModelSerializer):
             "mouse",
             "description",
             "ontology_term",
-            "parsefixedsample_set",
+            "sampleextraction_set",
             "dissection_start_time",
             "dissection_end_time",
             "tube_label",
@@ -934,7 +974,7 @@ class PipelineParseFixedSampleSerializer(serializers.HyperlinkedModelSerializer)
             "tissue"
         ]
 
-    tissue = PipelineTissueSerializer(many=True)
+    tissue = PipelineTissueSerializer(source="extraction.tissue", many=True)
 
 
 class PipelineSampleMetadataSerializer(serializers.HyperlinkedModelSerializer):
@@ -953,3 +993,26 @@ class PipelineSampleMetadataSerializer(serializers.HyperlinkedModelSerializer):
     well = serializers.CharField(read_only=True)
     barcode = LibraryBarcodeSerializer(many=True)
     biosample = PipelineParseFixedSampleSerializer(many=True)
+
+
+class SearchEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SearchEntry
+        fields = [
+            "type",
+            "id",
+            "url",
+            "field",
+            "text",
+        ]
+
+    type = serializers.CharField(source="kind", read_only=True)
+    id = serializers.CharField(source="object_id", read_only=True)
+    url = serializers.SerializerMethodField()
+
+    def get_url(self, obj):
+        return reverse(
+            "{}-detail".format(search.SEARCH_KINDS[obj.kind].basename),
+            args=[obj.object_id],
+            request=self.context.get("request"),
+        )
@@ -0,0 +1,418 @@
+"""Build the IGVF DACC submission tables for a split-seq plate
+
+The rodent_donor, tissue, multiplexed_sample, measurement_set and
+sequence_file tables used to be assembled in the prototype-queries
+notebooks by walking wells, samples and tissues and querying the
+accessions of every object. load_plate instead fetches everything a
+plate's tables need with a fixed number of prefetching queries,
+whatever the size of the plate, and the table functions only read
+what was loaded.
+
+Measurement sets group the passing libraries of each subpool by
+platform family, like the one sublibrary per measurement set
+notebook. The preferred_assay_title and onlist columns depend on the
+seqspec generator and aren't filled in here.
+"""
+from django.conf import settings
+from django.db.models import Prefetch
+import pandas
+
+from . import models
+
+SPECIES = "Mus musculus"
+
+# the DACC spells the NZO background differently than JAX
+STRAIN_BACKGROUND_FIXES = {
+    "NZO/HlLtJ (NZO)": "NZO/H1LtJ (NZO)",
+}
+
+SEQUENCING_LIBRARY_TYPES = {
+    models.LibrarySelectionTypeEnum.no_selection: "mRNA enriched",
+    models.LibrarySelectionTypeEnum.exome_capture: "exome capture",
+}
+
+# single-cell and single-nucleus RNA sequencing assays
+ASSAY_TERMS = {
+    models.CellularComponentEnum.cellular: "/assay-terms/OBI_0002631/",
+    models.CellularComponentEnum.nuclei: "/assay-terms/OBI_0003109/",
+}
+ASSAY_TERM_NAMES = {
+    "/assay-terms/OBI_0002631/": "scRNA-seq",
+    "/assay-terms/OBI_0003109/": "snRNA-seq",
+}
+
+SEQUENCING_KITS = {
+    "/platform-terms/EFO_0008637/": "NovaSeq 6000 S4 Reagent Kit v1.5",
+    "/platform-terms/EFO_0010963/": "NextSeq 2000 P4 XLEAP-SBS Reagent Kit",
+    "/platform-terms/EFO_0008633/": "ONT GridION X5",
+    "/platform-terms/EFO_0022840/": "NovaSeq X Series 25B Reagent Kit",
+}
+
+SEXES = {
+    models.SexEnum.MALE: "male",
+    models.SexEnum.FEMALE: "female",
+}
+
+READ_NAMES = {
+    "R1": "Read 1",
+    "R2": "Read 2",
+}
+
+
+def get_award():
+    return "/awards/{}/".format(settings.AWARD)
+
+
+def get_lab():
+    return "/labs/{}/".format(settings.LAB_ALIAS)
+
+
+def make_alias(name):
+    return "{}:{}".format(settings.LAB_ALIAS, name)
+
+
+def str_or_none(value):
+    """Return value, or None for missing and empty strings"""
+    if value is None or len(value) == 0:
+        return None
+    return value
+
+
+def get_accession(record, unique=True):
+    """Return the prefetched (accession name, uuid) of a record
+
+    load_plate only prefetches the accessions from one namespace,
+    of which there should be at most one. With unique False the first
+    of several is used instead of raising ValueError.
+    """
+    accessions = list(record.accession.all())
+    if len(accessions) == 0:
+        return None, None
+    elif len(accessions) > 1 and unique:
+        raise ValueError("There should only be one accession per namespace for {}: {}".format(
+            record, ", ".join(x.name for x in accessions)))
+    return accessions[0].name, accessions[0].uuid
+
+
+def get_tissue_alias(tissue, term):
+    return make_alias("{}_{}".format(tissue.name, term.curie.replace(":", "_")))
+
+
+class PlateRecords:
+    """The rows of a plate the submission tables are built from
+
+    :param wells: SplitSeqWells with their samples, tissues and mice
+    :param subpools: Subpools of the plate
+    :param libraries: the passing LibraryInRuns of the subpools with
+        their runs, platforms and sequencing files
+    """
+    def __init__(self, plate, wells, subpools, libraries):
+        self.plate = plate
+        self.wells = wells
+        self.subpools = subpools
+        self.libraries = libraries
+
+    def iter_tissues(self):
+        """Yield (well, tissue) for every tissue in the plate's wells"""
+        for well in self.wells:
+            for biosample in well.biosample.all():
+                for tissue in biosample.extraction.tissue.all():
+                    yield well, tissue
+
+    @property
+    def tissues(self):
+        """The plate's tissues in well order"""
+        return list({tissue.name: tissue for _, tissue in self.iter_tissues()}.values())
+
+    @property
+    def mice(self):
+        """The plate's mice sorted by name"""
+        mice = {tissue.mouse.name: tissue.mouse for _, tissue in self.iter_tissues()}
+        return [mice[name] for name in sorted(mice)]
+
+    @property
+    def cellular_component(self):
+        """Cellular component of the first sample on the plate"""
+        for well in self.wells:
+            for biosample in well.biosample.all():
+                return biosample.extraction.cellular_component
+        return None
+
+    def get_measurement_sets(self):
+        """Return {alias: [LibraryInRun]} grouping the libraries by subpool and platform family"""
+        measurement_sets = {}
+        for library in self.libraries:
+            name = "{}_{}".format(library.subpool.name, library.sequencing_run.platform.family)
+            measurement_sets.setdefault(make_alias(name), []).append(library)
+        return measurement_sets
+
+
+def accession_prefetch(lookup, accession_prefix):
+    return Prefetch(
+        lookup,
+        queryset=models.Accession.objects.filter(
+            accession_prefix=accession_prefix).order_by("name"),
+    )
+
+
+def load_plate(plate_name, accession_prefix=models.AccessionNamespacesEnum.IGVF):
+    """Load the records of a plate needed for its submission tables
+
+    :param accession_prefix: namespace of the accessions to report,
+        igvf for production or igvftst for the sandbox
+    """
+    plate = models.SplitSeqPlate.objects.get(name=plate_name)
+
+    wells = list(
+        models.SplitSeqWell.objects.filter(plate=plate)
+        .order_by("row", "column")
+        .prefetch_related(
+            Prefetch(
+                "biosample",
+                queryset=models.ParseFixedSample.objects.select_related(
+                    "extraction").order_by("name"),
+            ),
+            Prefetch(
+                "biosample__extraction__tissue",
+                queryset=models.Tissue.objects.select_related("mouse__strain__source"),
+            ),
+            Prefetch(
+                "biosample__extraction__tissue__ontology_term",
+                queryset=models.OntologyTerm.objects.order_by("curie"),
+            ),
+            accession_prefetch("biosample__extraction__tissue__accession", accession_prefix),
+            accession_prefetch("biosample__extraction__tissue__mouse__accession", accession_prefix),
+        )
+    )
+
+    subpools = list(
+        models.Subpool.objects.filter(plate=plate)
+        .order_by("name")
+        .prefetch_related(accession_prefetch("accession", accession_prefix))
+    )
+
+    libraries = list(
+        models.LibraryInRun.objects.filter(
+            subpool__plate=plate, status=models.RunStatusEnum.PASS)
+        .select_related("subpool", "sequencing_run__platform", "measurement_set")
+        .order_by("pk")
+        .prefetch_related(
+            Prefetch("subpool__protocols", queryset=models.ProtocolLink.objects.order_by("name")),
+            accession_prefetch("measurement_set__accession", accession_prefix),
+            Prefetch(
+                "sequencingfile_set",
+                queryset=models.SequencingFile.objects.order_by("lane", "read", "pk"),
+            ),
+            accession_prefetch("sequencingfile_set__accession", accession_prefix),
+        )
+    )
+    return PlateRecords(plate, wells, subpools, libraries)
+
+
+def rodent_donor_table(records):
+    rows = []
+    for mouse in records.mice:
+        accession, uuid = get_accession(mouse)
+        strain = mouse.strain
+        rows.append({
+            "accession": accession,
+            "uuid": uuid,
+            "aliases:array": make_alias(mouse.name),
+            "rodent_identifier": mouse.name,
+            "taxa": SPECIES,
+            "sex": SEXES.get(mouse.sex),
+            "strain_background": STRAIN_BACKGROUND_FIXES.get(
+                strain.igvf_strain_background, strain.igvf_strain_background),
+            "strain": str_or_none(strain.igvf_strain),
+            "genotype": str_or_none(strain.igvf_genotype),
+            "url": strain.see_also,
+            "sources:array": strain.source.igvf_id,
+            "lot_id": None,
+            "product_id": str_or_none(strain.jax_catalog_number),
+            "parents": None,
+            "individual_rodent:boolean": True,
+            "award": get_award(),
+            "lab": get_lab(),
+        })
+    return pandas.DataFrame(rows)
+
+
+def tissue_table(records):
+    rows = []
+    for tissue in records.tissues:
+        terms = list(tissue.ontology_term.all())
+        accessions = list(tissue.accession.all())
+        if len(accessions) == 0:
+            accessions = [None] * len(terms)
+        elif len(accessions) != len(terms):
+            raise ValueError("Tissue {} has {} accessions for {} ontology terms".format(
+                tissue.name, len(accessions), len(terms)))
+
+        age_days = tissue.mouse.age_days
+        for term, accession in zip(terms, accessions):
+            rows.append({
+                "accession": None if accession is None else accession.name,
+                "uuid": None if accession is None else accession.uuid,
+                "aliases:array": get_tissue_alias(tissue, term),
+                "sources:array": tissue.mouse.strain.source.igvf_id,
+                "donors:array": make_alias(tissue.mouse.name),
+                "sample_terms:array": "/sample-terms/{}/".format(term.curie.replace(":", "_")),
+                "term_names:skip": term.name,
+                "upper_bound_age:integer": age_days,
+                "lower_bound_age:integer": age_days,
+                "age_units": None if age_days is None else "day",
+                "award": get_award(),
+                "lab": get_lab(),
+            })
+    return pandas.DataFrame(rows)
+
+
+def multiplexed_sample_table(records):
+    samples = {}
+    strains_per_well = {}
+    for well, tissue in records.iter_tissues():
+        strains_per_well.setdefault(well.pk, set()).add(tissue.mouse.strain_id)
+        for term in tissue.ontology_term.all():
+            samples[get_tissue_alias(tissue, term)] = None
+    # wells with several genotypes also need genetic demultiplexing
+    if max((len(x) for x in strains_per_well.values()), default=0) > 1:
+        multiplexing_methods = "barcode based,genetic"
+    else:
+        multiplexing_methods = "barcode based"
+
+    passing = {library.subpool_id for library in records.libraries}
+    rows = []
+    for subpool in records.subpools:
+        if subpool.pk not in passing:
+            continue
+        accession, uuid = get_accession(subpool)
+        rows.append({
+            "accession": accession,
+            "uuid": uuid,
+            "aliases:array": make_alias("subpool_{}".format(subpool.name)),
+            "cellular_sub_pool": subpool.name,
+            "multiplexing_methods:array": multiplexing_methods,
+            "award": get_award(),
+            "lab": get_lab(),
+            "multiplexed_samples:array": ",".join(samples),
+        })
+    return pandas.DataFrame(rows)
+
+
+def measurement_set_table(records):
+    assay_term = ASSAY_TERMS.get(records.cellular_component)
+    rows = []
+    for alias, libraries in records.get_measurement_sets().items():
+        library = libraries[0]
+        subpool = library.subpool
+        if library.measurement_set is None:
+            accession, uuid = None, None
+        else:
+            accession, uuid = get_accession(library.measurement_set)
+        rows.append({
+            "accession": accession,
+            "uuid": uuid,
+            "aliases:array": alias,
+            "award": get_award(),
+            "lab": get_lab(),
+            "assay_term": assay_term,
+            "assay_term_name:skip": ASSAY_TERM_NAMES.get(assay_term),
+            "sequencing_library_types:array": SEQUENCING_LIBRARY_TYPES[subpool.selection_type],
+            "documents": None,
+            "file_set_type": "experimental data",
+            "alternate_accessions": None,
+            "description": None,
+            "samples:array": make_alias("subpool_{}".format(subpool.name)),
+            "protocols:array": ",".join(x.see_also for x in subpool.protocols.all()),
+        })
+    return pandas.DataFrame(rows)
+
+
+def sequence_file_table(records, skip_index_reads=True):
+    """One row per fastq of the plate's measurement sets
+
+    sequencing_run counts the distinct (run, library, lane) groups
+    within each measurement set.
+    """
+    rows = []
+    measurement_sets = records.get_measurement_sets()
+    for alias in sorted(measurement_sets):
+        run_break = None
+        run_id = 1
+        for library in measurement_sets[alias]:
+            run = library.sequencing_run
+            for sequencing_file in library.sequencingfile_set.all():
+                read = sequencing_file.read
+                if skip_index_reads and read is not None and read.startswith("I"):
+                    continue
+                if read is not None and read not in READ_NAMES:
+                    raise ValueError("Unrecognized read name {} for {}".format(
+                        read, sequencing_file.filename))
+
+                current_break = (run.pk, library.pk, sequencing_file.lane)
+                if run_break is None:
+                    run_break = current_break
+                elif run_break != current_break:
+                    run_id += 1
+                    run_break = current_break
+
+                accession, uuid = get_accession(sequencing_file, unique=False)
+                file_format = "fastq"
+                if sequencing_file.file_type is not None:
+                    file_format = models.FileType(sequencing_file.file_type).label
+                rows.append({
+                    "accession": accession,
+                    "uuid": uuid,
+                    "md5sum": sequencing_file.md5sum,
+                    "file_format": file_format,
+                    "file_set": alias,
+                    "content_type": "reads",
+                    "controlled_access:boolean": False,
+                    "sequencing_platform": run.platform.igvf_id,
+                    "sequencing_kit": SEQUENCING_KITS.get(run.platform.igvf_id),
+                    "run_name:skip": run.name,
+                    "sequencing_run:integer": run_id,
+                    "submitted_file_name": sequencing_file.filename,
+                    "flowcell_id": run.flowcell_id,
+                    "lane:integer": sequencing_file.lane,
+                    "illumina_read_type": read,
+                    "read_names:array": READ_NAMES.get(read),
+                    "award": get_award(),
+                    "lab": get_lab(),
+                })
+    return pandas.DataFrame(rows)
+
+
+SUBMISSION_TABLES = {
+    "rodent_donor": rodent_donor_table,
+    "tissue": tissue_table,
+    "multiplexed_sample": multiplexed_sample_table,
+    "measurement_set": measurement_set_table,
+    "sequence_file": sequence_file_table,
+}
+
+
+def build_submission(plate_name, accession_prefix=models.AccessionNamespacesEnum.IGVF, tables=None):
+    """Return {table name: DataFrame} of the submission tables for a plate
+
+    :param tables: names of the tables to build, by default all of
+        SUBMISSION_TABLES in submission order
+    """
+    if tables is None:
+        tables = list(SUBMISSION_TABLES)
+    unknown = [x for x in tables if x not in SUBMISSION_TABLES]
+    if unknown:
+        raise ValueError("Unknown submission tables {}".format(", ".join(unknown)))
+
+    records = load_plate(plate_name, accession_prefix)
+    return {name: SUBMISSION_TABLES[name](records) for name in tables}
+
+
+def write_submission(tables, path):
+    """Write submission tables to a spreadsheet with one sheet per table
+
+    The format follows the extension, like .xlsx or .ods.
+    """
+    with pandas.ExcelWriter(path) as book:
+        for name, table in tables.items():
+            table.to_excel(book, sheet_name=name, index=False)
@@ -0,0 +1,190 @@
+"""Shared test data for the igvf_mice test suite
+
+The yaml fixtures are large, and loaddata saves every object and
+many to many link with its own queries. load_fixtures bulk inserts
+them instead, and keeps a JSON copy of each parsed yaml file in
+FIXTURE_CACHE, under the user's cache directory, so they are only
+parsed again when they change.
+
+FixtureTestCase loads its bulk_fixtures once per class in
+setUpTestData; subclasses that add their own setUpTestData need to
+call super() first.
+"""
+from collections import defaultdict
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.serializers.python import Deserializer
+from django.db import connection
+from django.db.models.signals import post_save, pre_save
+from django.test import TestCase
+import yaml
+
+from ..io.database import reset_sequences
+from .. import models
+from .. import reference
+from .. import search
+
+APP_FIXTURE_DIR = Path(__file__).parent.parent / "fixtures"
+FIXTURE_CACHE = Path(
+    os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "igvf_mice" / "fixtures"
+FIXTURE_EXTENSIONS = [".yaml", ".yml", ".json"]
+
+# fixtures most of the sample tests need
+SAMPLE_FIXTURES = [
+    "source",
+    "library_construction_reagent",
+    "librarybarcode",
+    "mousestrain",
+    "ontologyterm",
+    "igvf_mice/tests/test_mice.yaml",
+    "igvf_mice/tests/test_tissue.yaml",
+    "igvf_mice/tests/test_fixedsample.yaml"
+]
+
+_parsed_fixtures = {}
+
+
+def find_fixture(label):
+    """Find a fixture the way loaddata does, by path or by name in the fixture dirs"""
+    path = Path(label)
+    if path.suffix in FIXTURE_EXTENSIONS and path.exists():
+        return path
+
+    for fixture_dir in [APP_FIXTURE_DIR] + [Path(x) for x in settings.FIXTURE_DIRS]:
+        for extension in FIXTURE_EXTENSIONS:
+            candidate = fixture_dir / (label + extension)
+            if candidate.exists():
+                return candidate
+    raise FileNotFoundError("No fixture named {}".format(label))
+
+
+def read_fixture(path):
+    """Return the list of records in a fixture file
+
+    yaml files are compiled to JSON in FIXTURE_CACHE, keyed by their
+    size and modification time.
+    """
+    path = Path(path)
+    stat = path.stat()
+    key = "{}:{}:{}".format(path.resolve(), stat.st_size, stat.st_mtime_ns)
+    if key in _parsed_fixtures:
+        return _parsed_fixtures[key]
+
+    if path.suffix == ".json":
+        with open(path, "rt") as instream:
+            records = json.load(instream)
+    else:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        cached = FIXTURE_CACHE / "{}-{}.json".format(path.stem, digest)
+        try:
+            with open(cached, "rt") as instream:
+                records = json.load(instream)
+        except FileNotFoundError:
+            with open(path, "rt") as instream:
+                records = yaml.load(instream, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+            FIXTURE_CACHE.mkdir(parents=True, exist_ok=True)
+            with open(cached, "wt") as outstream:
+                json.dump(records, outstream, cls=DjangoJSONEncoder)
+
+    _parsed_fixtures[key] = records
+    return records
+
+
+def load_fixtures(labels):
+    """Bulk insert the objects of a list of fixtures
+
+    Like loaddata, pre_save and post_save are sent with raw=True so
+    receivers such as the LibraryBarcode reverse compliments still run,
+    and the search index is updated in bulk.
+    A record repeating an earlier primary key replaces it, as it would
+    with loaddata. Returns the number of objects loaded.
+    """
+    records = defaultdict(dict)
+    for label in labels:
+        for deserialized in Deserializer(read_fixture(find_fixture(label))):
+            instance = deserialized.object
+            records[type(instance)][instance.pk] = deserialized
+
+    objects = defaultdict(list)
+    links = defaultdict(list)
+    for model, deserialized_records in records.items():
+        for deserialized in deserialized_records.values():
+            instance = deserialized.object
+            objects[model].append(instance)
+            for name, values in (deserialized.m2m_data or {}).items():
+                field = model._meta.get_field(name)
+                through = field.remote_field.through
+                source = "{}_id".format(field.m2m_field_name())
+                target = "{}_id".format(field.m2m_reverse_field_name())
+                links[through].extend(
+                    through(**{source: instance.pk, target: value}) for value in values
+                )
+
+    loaded = 0
+    with connection.constraint_checks_disabled(), search.deferred_indexing():
+        for model, instances in objects.items():
+            for instance in instances:
+                pre_save.send(sender=model, instance=instance, raw=True, using="default")
+            model.objects.bulk_create(instances)
+            for instance in instances:
+                post_save.send(
+                    sender=model, instance=instance, created=True, raw=True, using="default")
+            loaded += len(instances)
+
+        for through, rows in links.items():
+            through.objects.bulk_create(rows)
+
+    tables = [model._meta.db_table for model in list(objects) + list(links)]
+    connection.check_constraints(table_names=tables)
+    reset_sequences(*objects, *links)
+    return loaded
+
+
+class FixtureTestCase(TestCase):
+    """TestCase that bulk loads bulk_fixtures once for the whole class
+
+    The reference cache is cleared around each class and each test,
+    since rolling back their transactions doesn't send any signals.
+    Clearing it after loading also lets the tests cache the fixtures
+    even though the class transaction never commits. Subclasses that
+    override setUp need to call super().
+    """
+    bulk_fixtures = []
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        load_fixtures(cls.bulk_fixtures)
+        reference.clear_reference_cache()
+
+    def setUp(self):
+        super().setUp()
+        reference.clear_reference_cache()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        reference.clear_reference_cache()
+
+
+def create_plate(name, layout, reagent="wt-v2"):
+    """Create a SplitSeqPlate with wells holding samples
+
+    :param layout: {well position: [ParseFixedSample names]}
+    :param reagent: reagent to find the oligo-dT and random hexamer
+        barcodes for each well in, or None to leave them off
+    """
+    plate = models.SplitSeqPlate.objects.create(name=name)
+    for position, samples in layout.items():
+        well = models.SplitSeqWell.objects.create(
+            plate=plate, row=position[0], column=int(position[1:]))
+        well.biosample.set(models.ParseFixedSample.objects.filter(name__in=samples))
+        if reagent is not None:
+            well.barcode.set(models.LibraryBarcode.objects.filter(
+                reagent=reagent, code=position, barcode_type__in=["T", "R"]))
+    return plate
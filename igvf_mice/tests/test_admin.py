@@ -0,0 +1,137 @@
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.admin.utils import quote
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .factories import FixtureTestCase, SAMPLE_FIXTURES
+from .. import admin
+from ..io.lookup_benchmark import populate
+from .. import models
+
+
+class TestAdminChangelists(FixtureTestCase):
+    bulk_fixtures = [
+        "source",
+        "mousestrain",
+        "ontologyterm",
+        "igvf_mice/tests/test_mice.yaml",
+        "igvf_mice/tests/test_tissue.yaml",
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        populate(3)
+        cls.user = User.objects.create_superuser("admin", "admin@example.org", "password")
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_changelist_queries(self):
+        for name in [
+            "librarybarcode",
+            "mouse",
+            "tissue",
+            "splitseqplate",
+            "splitseqwell",
+            "subpool",
+            "sequencingrun",
+            "libraryinrun",
+            "sequencingfile",
+        ]:
+            url = "/admin/igvf_mice/{}/".format(name)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertLess(len(queries), 10, url)
+
+    def test_sequencing_file_search(self):
+        filename = models.SequencingFile.objects.first().filename
+        response = self.client.get(
+            "/admin/igvf_mice/sequencingfile/", {"q": filename})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["cl"].result_count, 1)
+
+    @skipUnless(connection.vendor == "sqlite", "edits the SQLite statistics table")
+    def test_estimated_count(self):
+        # populate analyzes the tables
+        files = models.SequencingFile.objects.count()
+        self.assertEqual(admin.estimate_row_count(models.SequencingFile), files)
+
+        # pretend the stats are out of date
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE sqlite_stat1 SET stat = '100000 1' WHERE tbl = %s",
+                [models.SequencingFile._meta.db_table])
+
+        queryset = models.SequencingFile.objects.order_by("pk")
+        self.assertEqual(admin.EstimatedCountPaginator(queryset, 100).count, 100000)
+        filtered = queryset.filter(lane=1)
+        self.assertEqual(
+            admin.EstimatedCountPaginator(filtered, 100).count, filtered.count())
+        with patch.object(admin, "ESTIMATED_COUNT_THRESHOLD", 1_000_000):
+            self.assertEqual(admin.EstimatedCountPaginator(queryset, 100).count, files)
+
+
+class TestPlateGridAdmin(FixtureTestCase):
+    bulk_fixtures = SAMPLE_FIXTURES
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.plate = models.SplitSeqPlate.objects.create(name="IGVF_TEST")
+        cls.url = reverse("admin:igvf_mice_splitseqplate_grid", args=[quote("IGVF_TEST")])
+        cls.user = User.objects.create_superuser("admin", "admin@example.org", "password")
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_change_form_links_grid(self):
+        response = self.client.get(
+            reverse("admin:igvf_mice_splitseqplate_change", args=[quote("IGVF_TEST")]))
+        self.assertContains(response, self.url)
+
+    def test_plate_grid_view(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        # session, user, plate, reagent, 3 for the grid and the reagent list
+        self.assertLessEqual(len(queries), 8)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["grid"]), 8)
+        self.assertEqual(len(response.context["grid"][0][1]), 12)
+        self.assertContains(response, 'name="biosample-H12"')
+
+        response = self.client.post(self.url, {
+            "reagent": "wt-v2",
+            "biosample-B3": "016_B6J_10F_03, 017_B6J_10M_03",
+            "barcode-B3": "B3",
+        })
+        self.assertRedirects(response, self.url)
+        well = models.SplitSeqWell.objects.get(plate=self.plate, row="B", column=3)
+        self.assertEqual(well.biosample.count(), 2)
+        self.assertEqual(well.barcode.count(), 2)
+
+        response = self.client.get(self.url)
+        self.assertContains(response, "016_B6J_10F_03, 017_B6J_10M_03")
+
+    def test_plate_grid_view_384(self):
+        models.SplitSeqPlate.objects.filter(pk="IGVF_TEST").update(
+            size=models.PlateSizeEnum.size_384)
+        response = self.client.get(self.url, follow=True)
+        self.assertRedirects(
+            response, reverse("admin:igvf_mice_splitseqplate_change", args=[quote("IGVF_TEST")]))
+        self.assertContains(response, "384 well plates can&#x27;t be edited as a grid")
+
+    def test_plate_grid_view_errors(self):
+        response = self.client.post(self.url, {
+            "reagent": "wt-v2",
+            "biosample-B3": "not_a_sample",
+        }, follow=True)
+        self.assertContains(response, "B3: unknown sample not_a_sample")
+        self.assertFalse(models.SplitSeqWell.objects.filter(plate=self.plate).exists())
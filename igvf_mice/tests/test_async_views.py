@@ -0,0 +1,91 @@
+from .factories import create_plate, FixtureTestCase, SAMPLE_FIXTURES
+from ..io.lookup_benchmark import populate
+from .. import models
+
+
+class TestAsyncViews(FixtureTestCase):
+    bulk_fixtures = SAMPLE_FIXTURES
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        create_plate("IGVF_TEST", {
+            "A1": ["016_B6J_10F_03"],
+            "B1": ["016_B6J_10F_03", "017_B6J_10M_03"],
+        })
+        populate(2)
+        sequencing_file = models.SequencingFile.objects.order_by("pk").first()
+        sequencing_file.accession.create(
+            name="IGVFFI0000AAAA", see_also="https://api.data.igvf.org/IGVFFI0000AAAA/")
+
+    def assertSameResponse(self, url, normalize=None):
+        """The async endpoint should return what the viewset returns"""
+        expected = self.client.get(url)
+        response = self.client.get("/async" + url)
+        self.assertEqual(response.status_code, expected.status_code)
+        data = response.json()
+        expected = expected.json()
+        if normalize is not None:
+            normalize(data)
+            normalize(expected)
+        for key in ["next", "previous"]:
+            if expected.get(key) is not None:
+                self.assertEqual(data[key], expected[key].replace("/testserver/", "/testserver/async/"))
+        self.assertEqual(
+            {k: v for k, v in data.items() if k not in ("next", "previous")},
+            {k: v for k, v in expected.items() if k not in ("next", "previous")},
+        )
+        return data
+
+    def test_pipeline_sample_metadata(self):
+        def sort_biosamples(data):
+            # the order of many to many rows isn't defined
+            for well in data["results"]:
+                well["biosample"].sort(key=lambda x: x["tissue"][0]["name"])
+
+        data = self.assertSameResponse(
+            "/pipeline/sample-metadata/?plate__name=IGVF_TEST", sort_biosamples)
+        self.assertEqual(data["count"], 2)
+        well = data["results"][1]
+        self.assertEqual(well["well"], "B1")
+        self.assertEqual(len(well["biosample"]), 2)
+        self.assertEqual(well["biosample"][0]["tissue"][0]["mouse"]["genotype"], "B6J")
+
+    def test_sequencing_file_pages(self):
+        files = models.SequencingFile.objects.count()
+        data = self.assertSameResponse("/sequencing-file/")
+        self.assertEqual(data["count"], files)
+        self.assertEqual(len(data["results"]), 100)
+        self.assertIsNone(data["previous"])
+        self.assertTrue(data["next"].endswith("/async/sequencing-file/?page=2"))
+        self.assertEqual(data["results"][0]["accession"][0]["name"], "IGVFFI0000AAAA")
+
+        data = self.assertSameResponse("/sequencing-file/?page=2")
+        self.assertTrue(data["previous"].endswith("/async/sequencing-file/"))
+        self.assertEqual(len(data["results"]), files - 100)
+        self.assertIsNone(data["next"])
+        self.assertSameResponse("/igvf/sequence-file/?page=2")
+
+        response = self.client.get("/async/sequencing-file/?page=3")
+        self.assertEqual(response.status_code, 404)
+
+    def test_sequencing_file_filter(self):
+        filename = models.SequencingFile.objects.order_by("pk").first().filename
+        data = self.assertSameResponse("/sequencing-file/?filename={}".format(filename))
+        self.assertEqual(data["count"], 1)
+
+    def test_detail(self):
+        pk = models.SequencingFile.objects.order_by("pk").first().pk
+        self.assertSameResponse("/sequencing-file/{}/".format(pk))
+        self.assertSameResponse("/igvf/sequence-file/{}/".format(pk))
+
+        response = self.client.get("/async/sequencing-file/0/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_detail_malformed_pk(self):
+        data = self.assertSameResponse("/sequencing-file/abc/")
+        self.assertEqual(data, {"detail": "Not found."})
+
+    def test_read_only(self):
+        response = self.client.post("/async/sequencing-file/", {})
+        self.assertEqual(response.status_code, 405)
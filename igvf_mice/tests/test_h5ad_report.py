@@ -0,0 +1,179 @@
+from contextlib import redirect_stdout
+from io import StringIO
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import anndata
+import numpy
+import pandas
+
+from generate_uci_h5ad_report import (
+    generate_reports,
+    get_report_name,
+    read_h5ad_metadata,
+    read_h5ad_profiles,
+)
+
+
+def write_test_h5ad(filename, cells=6, genes=4, extra_obs=()):
+    obs = pandas.DataFrame({
+        "Tissue": pandas.Categorical(["Kidney", "Liver", "Kidney"] * (cells // 3)),
+        "total_counts": numpy.arange(cells, dtype=numpy.float64),
+        "n_genes_by_counts": numpy.arange(cells, dtype=numpy.int64),
+    }, index=["cell{}".format(i) for i in range(cells)])
+    for name in extra_obs:
+        obs[name] = numpy.zeros(cells)
+    var = pandas.DataFrame({
+        "gene_name": ["gene{}".format(i) for i in range(genes)],
+        "means": numpy.linspace(0, 1, genes),
+    }, index=["ENSMUSG{:011d}".format(i) for i in range(genes)])
+    adata = anndata.AnnData(
+        X=numpy.ones((cells, genes), dtype=numpy.float32), obs=obs, var=var)
+    adata.obsm["X_pca"] = numpy.zeros((cells, 2))
+    adata.layers["raw_counts"] = numpy.ones((cells, genes), dtype=numpy.int32)
+    adata.uns["log1p"] = {"base": 2}
+    adata.write_h5ad(filename)
+    return filename
+
+
+class TestReadH5adMetadata(TestCase):
+    def test_read_h5ad_metadata(self):
+        with TemporaryDirectory() as tmpdir:
+            filename = write_test_h5ad(Path(tmpdir) / "test.h5ad")
+            metadata = read_h5ad_metadata(filename)
+            expected = anndata.read_h5ad(filename)
+
+        self.assertEqual(list(metadata["obs"]), list(expected.obs.columns))
+        for name, column in expected.obs.items():
+            described = metadata["obs"][name]
+            self.assertEqual(described["shape"], (expected.n_obs,))
+            if isinstance(column.dtype, pandas.CategoricalDtype):
+                self.assertEqual(described["encoding"], "categorical")
+                self.assertEqual(
+                    described["dtype"],
+                    "category[{}]".format(column.cat.categories.to_numpy().dtype))
+            else:
+                self.assertEqual(described["encoding"], "array")
+                self.assertEqual(described["dtype"], str(column.dtype))
+
+        self.assertEqual(list(metadata["var"]), list(expected.var.columns))
+        self.assertEqual(metadata["obsm"]["X_pca"]["shape"], (expected.n_obs, 2))
+        self.assertEqual(
+            metadata["layers"]["raw_counts"]["shape"], (expected.n_obs, expected.n_vars))
+        self.assertEqual(metadata["uns"]["log1p"]["encoding"], "dict")
+        self.assertEqual(metadata["obsp"], {})
+
+
+class TestGenerateReports(TestCase):
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.root = Path(self.tmpdir.name).resolve()
+        self.output_dir = self.root / "reports"
+        self.filenames = []
+        for name in ["a/b_c.h5ad", "a_b/c.h5ad"]:
+            filename = self.root / "data" / name
+            filename.parent.mkdir(parents=True)
+            self.filenames.append(write_test_h5ad(filename))
+
+    def run_reports(self, **kwargs):
+        output = StringIO()
+        with redirect_stdout(output):
+            generate_reports(self.filenames, self.output_dir, jobs=1, **kwargs)
+        return output.getvalue()
+
+    def test_get_report_name(self):
+        common_root = self.root / "data"
+        names = [get_report_name(x, common_root) for x in self.filenames]
+        self.assertTrue(names[0].startswith("a_b_c-"))
+        self.assertTrue(names[1].startswith("a_b_c-"))
+        self.assertNotEqual(names[0], names[1])
+        self.assertEqual(names[0], get_report_name(self.filenames[0], common_root))
+
+    def test_generate_reports(self):
+        self.assertIn("Scanned 2 of 2 files", self.run_reports())
+        reports = sorted(self.output_dir.glob("*.html"))
+        self.assertEqual(len(reports), 3)
+        index = (self.output_dir / "index.html").read_text()
+        for report in reports:
+            if report.name != "index.html":
+                self.assertIn(report.name, index)
+                self.assertIn("Tissue", report.read_text())
+
+        cache_filename = self.output_dir / ".report-cache.json"
+        with open(cache_filename, "rt") as instream:
+            cache = json.load(instream)
+        self.assertEqual(set(cache), {str(x) for x in self.filenames})
+
+        self.assertIn("Scanned 0 of 2 files", self.run_reports())
+        write_test_h5ad(self.filenames[0], cells=9)
+        self.assertIn("Scanned 1 of 2 files", self.run_reports())
+
+    def test_undefined_terms(self):
+        for filename in self.filenames:
+            write_test_h5ad(filename, extra_obs=["not_a_term"])
+
+        # every file reports its own undefined terms, even when one
+        # worker process scans them all
+        output = self.run_reports()
+        for filename in self.filenames:
+            self.assertIn("Undefined terms in {}".format(filename), output)
+        self.assertEqual(output.count("obs\tnot_a_term\t"), 2)
+        for report in self.output_dir.glob("a*.html"):
+            self.assertIn("ERROR: Undefined", report.read_text())
+
+    def test_no_cache(self):
+        cache_filename = self.output_dir / ".report-cache.json"
+        self.assertIn("Scanned 2 of 2 files", self.run_reports(use_cache=False))
+        self.assertFalse(cache_filename.exists())
+
+        self.run_reports()
+        before = cache_filename.read_text()
+        self.assertIn("Scanned 2 of 2 files", self.run_reports(use_cache=False, harmony=True))
+        self.assertEqual(cache_filename.read_text(), before)
+
+
+class TestReadH5adProfiles(TestCase):
+    def test_read_h5ad_profiles(self):
+        obs = pandas.DataFrame({
+            "Tissue": pandas.Categorical(["Kidney", "Liver", None, "Kidney", "Kidney"]),
+            "total_counts": [1.0, numpy.nan, 3.0, 4.0, 7.0],
+            "n_genes_by_counts": pandas.array([1, None, 3, 4, 5], dtype="Int64"),
+            "predicted_doublet": pandas.array([True, False, None, False, False], dtype="boolean"),
+        }, index=["cell{}".format(i) for i in range(5)])
+        adata = anndata.AnnData(obs=obs)
+        adata.var["means"] = []
+
+        with TemporaryDirectory() as tmpdir:
+            filename = Path(tmpdir) / "test.h5ad"
+            adata.write_h5ad(filename)
+            # a chunk size smaller than the table exercises the accumulation
+            profiles = read_h5ad_profiles(filename, chunk_size=2)
+            self.assertEqual(read_h5ad_profiles(filename), profiles)
+
+        tissue = profiles["obs"]["Tissue"]
+        self.assertEqual(tissue["kind"], "categorical")
+        self.assertEqual(tissue["rows"], 5)
+        self.assertEqual(tissue["null_fraction"], 0.2)
+        self.assertEqual(tissue["categories"], 2)
+        self.assertEqual(tissue["counts"], [("Kidney", 3), ("Liver", 1)])
+
+        counts = profiles["obs"]["total_counts"]
+        self.assertEqual(counts["kind"], "numeric")
+        self.assertEqual(counts["null_fraction"], 0.2)
+        self.assertEqual((counts["min"], counts["max"]), (1.0, 7.0))
+        self.assertAlmostEqual(counts["mean"], obs["total_counts"].mean())
+
+        genes = profiles["obs"]["n_genes_by_counts"]
+        self.assertEqual(genes["null_fraction"], 0.2)
+        self.assertEqual((genes["min"], genes["max"]), (1, 5))
+        self.assertAlmostEqual(genes["mean"], 3.25)
+
+        doublet = profiles["obs"]["predicted_doublet"]
+        self.assertEqual(doublet["null_fraction"], 0.2)
+        self.assertAlmostEqual(doublet["mean"], 0.25)
+
+        self.assertEqual(profiles["var"]["means"]["rows"], 0)
+        self.assertIsNone(profiles["var"]["means"]["mean"])
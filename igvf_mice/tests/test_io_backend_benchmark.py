@@ -0,0 +1,41 @@
+from django.db import connection
+from django.test import TransactionTestCase
+
+from ..io.backend_benchmark import (
+    create_reference_rows,
+    delete_benchmark_rows,
+    import_plate,
+    read_recent_files,
+    run_concurrent_benchmark,
+    summarize,
+)
+from .. import models
+
+
+class TestBackendBenchmark(TransactionTestCase):
+    def test_import_and_read(self):
+        create_reference_rows()
+        import_plate("CONCURRENT_TEST")
+        plate = models.SplitSeqPlate.objects.get(name="CONCURRENT_TEST")
+        self.assertEqual(models.SplitSeqWell.objects.filter(plate=plate).count(), 96)
+        self.assertEqual(
+            models.SplitSeqWell.barcode.through.objects.filter(splitseqwell__plate=plate).count(),
+            192)
+        self.assertEqual(read_recent_files(), (16, 96))
+
+        delete_benchmark_rows()
+        self.assertFalse(models.SplitSeqPlate.objects.exists())
+        self.assertFalse(models.LibraryBarcode.objects.exists())
+
+    def test_run_concurrent_benchmark(self):
+        result = run_concurrent_benchmark(writers=1, readers=1, imports=2)
+        self.assertEqual(result["vendor"], connection.vendor)
+        self.assertEqual(result["writes"]["count"] + result["write_errors"], 2)
+        self.assertFalse(models.SplitSeqPlate.objects.exists())
+
+    def test_summarize(self):
+        self.assertEqual(summarize([]), {"count": 0, "p50_ms": None, "p95_ms": None})
+        summary = summarize([0.001 * x for x in range(1, 101)])
+        self.assertEqual(summary["count"], 100)
+        self.assertAlmostEqual(summary["p50_ms"], 50.5)
+        self.assertAlmostEqual(summary["p95_ms"], 96)
@@ -0,0 +1,107 @@
+from django.test import TestCase
+import numpy
+
+from .factories import FixtureTestCase
+from ..io.barcode_index import (
+    NO_MATCH,
+    BarcodeIndex,
+    build_barcode_indexes,
+    pack_sequences,
+)
+from .. import models
+
+
+class TestPackSequences(TestCase):
+    def test_pack_sequences(self):
+        keys, valid = pack_sequences(["ACGT", "acgt", "ACGN", "", "ACG"])
+        self.assertEqual(list(valid), [True, True, False, False, True])
+        self.assertEqual(keys[0], keys[1])
+        # the sentinel bit keeps different lengths from colliding
+        self.assertNotEqual(keys[0], keys[4])
+        self.assertEqual(keys[0], 0b1_00_01_10_11)
+
+    def test_pack_empty(self):
+        keys, valid = pack_sequences([])
+        self.assertEqual(len(keys), 0)
+        self.assertEqual(len(valid), 0)
+
+    def test_pack_ascii_matrix(self):
+        matrix = numpy.frombuffer(b"ACGTTTTT", dtype=numpy.uint8).reshape(2, 4)
+        keys, valid = pack_sequences(matrix)
+        expected, _ = pack_sequences(["ACGT", "TTTT"])
+        self.assertTrue(valid.all())
+        self.assertEqual(list(keys), list(expected))
+
+
+class TestBarcodeIndex(TestCase):
+    def test_empty_index(self):
+        for max_mismatches in (0, 1):
+            index = BarcodeIndex([], [], max_mismatches=max_mismatches)
+            self.assertEqual(len(index), 0)
+            self.assertIsNone(index.lookup("AAAAAAAA"))
+            self.assertEqual(list(index.lookup_array(["AAAAAAAA", "ACGN"])), [NO_MATCH] * 2)
+            self.assertEqual(len(index.lookup_array([])), 0)
+
+        index = BarcodeIndex.from_queryset(models.LibraryBarcode.objects.none())
+        self.assertEqual(len(index), 0)
+
+    def test_exact_and_one_mismatch(self):
+        index = BarcodeIndex([10, 20], ["AAAAAAAA", "CCCCCCCC"])
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.lookup("AAAAAAAA"), 10)
+        self.assertEqual(index.lookup("AAAGAAAA"), 10)
+        self.assertEqual(index.lookup("CCCCCCCA"), 20)
+        self.assertIsNone(index.lookup("AAGGAAAA"))
+        self.assertIsNone(index.lookup("AAANAAAA"))
+        self.assertIsNone(index.lookup("AAAAAAA"))
+
+        ids, distance = index.lookup_array(
+            numpy.array(["AAAAAAAA", "AAAAAAAT", "GGGGGGGG"]), return_distance=True)
+        self.assertEqual(list(ids), [10, 10, NO_MATCH])
+        self.assertEqual(list(distance), [0, 1, -1])
+
+    def test_exact_only(self):
+        index = BarcodeIndex([10], ["AAAAAAAA"], max_mismatches=0)
+        self.assertIsNone(index.lookup("AAAGAAAA"))
+
+    def test_ambiguous_neighbors_are_dropped(self):
+        index = BarcodeIndex([1, 2], ["AAAA", "AAAC"])
+        # one mismatch from both barcodes
+        self.assertIsNone(index.lookup("AAAG"))
+        self.assertEqual(index.lookup("TAAA"), 1)
+
+    def test_invalid_barcodes(self):
+        self.assertRaises(ValueError, BarcodeIndex, [1], ["ANNA"])
+        self.assertRaises(ValueError, BarcodeIndex, [1, 2], ["ACGT", "ACGT"])
+
+
+class TestBuildBarcodeIndexes(FixtureTestCase):
+    bulk_fixtures = [
+        "source",
+        "library_construction_reagent",
+        "librarybarcode",
+    ]
+
+    def test_build_barcode_indexes(self):
+        indexes = build_barcode_indexes()
+        self.assertIn(("wt-mega-v2", "T"), indexes)
+        self.assertIn(("wt-v2", "R"), indexes)
+        self.assertIn(("wt-mega-v2", None), indexes)
+        self.assertEqual(len(indexes[("wt-mega-v2", "T")]), 96)
+
+        barcode = models.LibraryBarcode.objects.get(
+            reagent="wt-mega-v2", code="A1", barcode_type="T")
+        index = indexes[("wt-mega-v2", "T")]
+        self.assertEqual(index.lookup(barcode.i7_sequence), barcode.id)
+        # fixture loads also fill in the stored reverse compliments
+        self.assertEqual(barcode.i7_rc, models.reverse_compliment(barcode.i7_sequence))
+
+        mutated = "N" + barcode.i7_sequence[1:]
+        self.assertIsNone(index.lookup(mutated))
+        base = "A" if barcode.i7_sequence[0] != "A" else "C"
+        self.assertEqual(index.lookup(base + barcode.i7_sequence[1:]), barcode.id)
+
+    def test_build_barcode_indexes_for_reagent(self):
+        indexes = build_barcode_indexes(reagent="wt-v2")
+        self.assertEqual({x[0] for x in indexes}, {"wt-v2"})
+        self.assertEqual(len(indexes[("wt-v2", "T")]), 48)
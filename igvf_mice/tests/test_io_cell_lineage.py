@@ -0,0 +1,99 @@
+from django.test import TestCase
+import pandas
+
+from .factories import create_plate, FixtureTestCase, SAMPLE_FIXTURES
+from ..io.cell_lineage import (
+    annotate_cell_lineage,
+    bc1_to_well_position,
+    get_cell_lineage,
+    get_plate_lineage,
+    parse_cell_ids,
+)
+from .. import models
+
+
+class TestParseCellIds(TestCase):
+    def test_parse_cell_ids(self):
+        parsed = parse_cell_ids(["1_2_3_13A_igvf_003", "96_5_6_2_igvf_b01", "bad"])
+        self.assertEqual(list(parsed.columns), ["bc1", "bc2", "bc3", "subpool", "plate"])
+        self.assertEqual(list(parsed.loc[0]), ["1", "2", "3", "13A", "igvf_003"])
+        self.assertEqual(parsed.loc[1, "plate"], "igvf_b01")
+        self.assertEqual(parsed.loc[2, "bc1"], "bad")
+        self.assertTrue(pandas.isnull(parsed.loc[2, "plate"]))
+
+    def test_bc1_to_well_position(self):
+        self.assertEqual(bc1_to_well_position("1"), "A1")
+        self.assertEqual(bc1_to_well_position("12"), "A12")
+        self.assertEqual(bc1_to_well_position("13"), "B1")
+        self.assertEqual(bc1_to_well_position("96"), "H12")
+        self.assertEqual(bc1_to_well_position("97"), None)
+        self.assertEqual(bc1_to_well_position("b01"), "B1")
+        self.assertEqual(bc1_to_well_position("cattccta"), "CATTCCTA")
+        self.assertEqual(bc1_to_well_position(None), None)
+
+
+class TestCellLineage(FixtureTestCase):
+    bulk_fixtures = SAMPLE_FIXTURES
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.plate = create_plate("IGVF_TEST", {
+            "A1": ["016_B6J_10F_03"],
+            "B1": ["016_B6J_10F_03", "017_B6J_10M_03"],
+        })
+
+        tissue = models.Tissue.objects.get(name="016_B6J_10F_03")
+        tissue.accession.create(
+            name="IGVFSM0000AAAA", see_also="https://api.data.igvf.org/IGVFSM0000AAAA/")
+        tissue.accession.create(
+            name="TSTSM0000AAAA", accession_prefix="igvftst",
+            see_also="https://api.sandbox.igvf.org/TSTSM0000AAAA/")
+        tissue.mouse.accession.create(
+            name="IGVFDO0000AAAA", see_also="https://api.data.igvf.org/IGVFDO0000AAAA/")
+
+    def test_get_plate_lineage(self):
+        table = get_plate_lineage(self.plate)
+        a1_sequence = models.LibraryBarcode.objects.get(
+            reagent="wt-v2", code="A1", barcode_type="T").i7_sequence
+
+        self.assertEqual(table.loc["A1", "lab_sample_id"], "016_B6J_10F_03")
+        self.assertEqual(table.loc["A1", "sample_accession"], "IGVFSM0000AAAA")
+        self.assertEqual(table.loc["A1", "donor_accession"], "IGVFDO0000AAAA")
+        self.assertEqual(table.loc[a1_sequence, "bc1_well"], "A1")
+        self.assertEqual(table.loc["B1", "lab_sample_id"], "016_B6J_10F_03,017_B6J_10M_03")
+        self.assertEqual(table.loc["B1", "mouse_id"], "016_B6J_10F,017_B6J_10M")
+
+    def test_get_cell_lineage(self):
+        a1_sequence = models.LibraryBarcode.objects.get(
+            reagent="wt-v2", code="A1", barcode_type="R").i7_sequence
+        cell_ids = [
+            "1_10_20_1_igvf_test",
+            "13_10_21_1_igvf_test",
+            "{}_10_22_2_igvf_test".format(a1_sequence),
+            "2_10_20_1_igvf_test",
+            "1_10_20_1_igvf_999",
+            "1_11_20_1_igvf_test",
+        ]
+        lineage = get_cell_lineage(cell_ids)
+
+        self.assertEqual(list(lineage.index), cell_ids)
+        self.assertIsInstance(lineage["lab_sample_id"].dtype, pandas.CategoricalDtype)
+        self.assertEqual(
+            list(lineage["bc1_well"].astype(object).where(lineage["bc1_well"].notnull(), None)),
+            ["A1", "B1", "A1", None, None, "A1"])
+        self.assertEqual(lineage["sample_accession"].iloc[0], "IGVFSM0000AAAA")
+        self.assertEqual(lineage["sample_accession"].iloc[2], "IGVFSM0000AAAA")
+        self.assertEqual(lineage["lab_sample_id"].iloc[1], "016_B6J_10F_03,017_B6J_10M_03")
+        self.assertEqual(lineage["subpool"].iloc[2], "2")
+
+    def test_annotate_cell_lineage(self):
+        obs = pandas.DataFrame(
+            {"leiden": ["0", "1"]},
+            index=["1_10_20_1_igvf_test", "13_10_20_1_igvf_test"])
+
+        with self.assertNumQueries(3):
+            annotate_cell_lineage(obs)
+
+        self.assertEqual(list(obs["mouse_id"]), ["016_B6J_10F", "016_B6J_10F,017_B6J_10M"])
+        self.assertEqual(list(obs["leiden"]), ["0", "1"])
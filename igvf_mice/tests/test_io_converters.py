@@ -1,21 +1,31 @@
 from datetime import datetime, date, time
 from unittest import TestCase
 import numpy
+import pandas
+import zoneinfo
 from .. import models
 from ..io.converters import (
     convert_plate_id_to_name,
     date_or_none,
     datetime_or_none,
+    date_or_none_series,
     float_or_nan,
+    float_or_nan_series,
     float_or_none,
+    float_or_none_series,
     int_or_none,
+    int_or_none_series,
     int_or_0,
+    positive_int_or_none,
+    positive_int_or_none_series,
     str_or_empty,
     str_or_none,
+    str_or_none_series,
     mouse_tissue_tuple,
     normalize_barcode_index,
     normalize_plate_name,
     normalize_mice_date,
+    normalize_mice_date_series,
     normalize_strain,
     normalize_subpool_submission_status,
     parse_mouse_age_sex,
@@ -23,9 +33,13 @@ from ..io.converters import (
     parse_mouse_name,
     join_mouse_name,
     parse_mouse_tissue,
+    parse_mouse_name_series,
+    parse_mouse_tissue_series,
     join_mouse_tissue,
     get_genotype_from_mouse_tissue,
     instrument_name_to_platform_id,
+    uci_tz_or_none,
+    uci_tz_or_none_series,
 )
 
 
@@ -125,6 +139,42 @@ class TestConverters(TestCase):
 
         self.assertEqual(list(normalize_mice_date(dates, times)), expected)
 
+    def test_normalize_mice_date_series(self):
+        dates = [None, date(1970, 1, 1), "-", "asdf", time(12, 30), date(1970, 1, 1),
+                 datetime(2022, 3, 4, 5, 6)]
+        times = [None, None, time(1, 2), time(1, 2), time(1, 2), "asdf", time(12, 30, 15)]
+        result, invalid = normalize_mice_date_series(dates, times)
+
+        self.assertEqual(list(invalid), [False, False, False, True, True, True, False])
+        self.assertTrue(result[:6].isna().all())
+        self.assertEqual(result[6], datetime(2022, 3, 4, 12, 30, 15))
+
+        result, invalid = normalize_mice_date_series([date(1970, 1, 1)], [time(12, 30)])
+        self.assertEqual(list(result), list(normalize_mice_date([date(1970, 1, 1)], [time(12, 30)])))
+        self.assertFalse(invalid.any())
+
+    def test_uci_tz_or_none_series(self):
+        values = [
+            pandas.Timestamp(2022, 11, 2, 10, 30),
+            datetime(2022, 7, 1, 8, 0, tzinfo=zoneinfo.ZoneInfo("UTC")),
+            None,
+            "bad",
+            # skipped by the start of daylight savings
+            datetime(2023, 3, 12, 2, 30),
+        ]
+        result, invalid = uci_tz_or_none_series(values)
+
+        self.assertEqual(str(result.dt.tz), "UTC")
+        self.assertEqual(list(invalid), [False, False, False, True, True])
+        self.assertEqual(result[0], uci_tz_or_none(values[0]))
+        self.assertEqual(result[1], uci_tz_or_none(values[1]))
+        self.assertTrue(result[2:].isna().all())
+
+        column = pandas.Series(pandas.to_datetime(["2022-11-02 10:30", None]))
+        result, invalid = uci_tz_or_none_series(column)
+        self.assertEqual(result[0], uci_tz_or_none(column[0]))
+        self.assertFalse(invalid.any())
+
     def test_normalize_strain(self):
         # normalize strain now only works on the strain name and
         # doesn't support replacing arbitrary strings.
@@ -216,6 +266,46 @@ class TestConverters(TestCase):
         ]:
             self.assertEqual(join_mouse_tissue(split), name)
 
+    def test_parse_mouse_tissue_invalid(self):
+        for bad in ["096_WSBJ_10X_15", "096_WSBJ_5moF_15", "096_WSBJ_10F", "096_WSBJ_10F_15_1",
+                    "096_WSBJ_X_10F_15", "", None, numpy.nan]:
+            self.assertRaises(ValueError, parse_mouse_tissue, bad)
+
+        self.assertRaises(ValueError, parse_mouse_name, "096_WSBJ_10F_15")
+        self.assertRaises(ValueError, parse_mouse_name, "096_WSBJ")
+
+    def test_parse_mouse_tissue_series(self):
+        names = [
+            "096_WSBJ_10F_15",
+            "778_B6J_L_12F_03",
+            None,
+            "096_WSBJ_10F_15",
+            "001_C57BL/6J_6moM_01",
+        ]
+        parsed = parse_mouse_tissue_series(pandas.Series(names, index=list("abcde")))
+
+        self.assertEqual(
+            list(parsed.columns),
+            ["mouse_id", "strain", "light_status", "age", "sex", "tissue_id"])
+        self.assertEqual(list(parsed.index), list("abcde"))
+        for name, (_, row) in zip(names, parsed.iterrows()):
+            if name is None:
+                self.assertTrue(row.isna().all())
+            else:
+                expected = parse_mouse_tissue(name)
+                row = tuple(None if pandas.isna(x) else x for x in row)
+                self.assertEqual(row, tuple(expected))
+
+        self.assertRaises(ValueError, parse_mouse_tissue_series, ["096_WSBJ_10F_15", "bad"])
+        coerced = parse_mouse_tissue_series(["096_WSBJ_10F_15", "bad"], errors="coerce")
+        self.assertEqual(list(coerced["mouse_id"].fillna("")), ["096", ""])
+
+    def test_parse_mouse_name_series(self):
+        parsed = parse_mouse_name_series(["477_CC030_10M", "797_CASTJ_D_12M"])
+        self.assertEqual(list(parsed["strain"]), ["CC030", "CASTJ"])
+        self.assertEqual(list(parsed["light_status"].fillna("")), ["", "D"])
+        self.assertNotIn("tissue_id", parsed.columns)
+
     def test_get_genotype_from_mouse_tissue(self):
         for name, genotype in [
             ("016_B6J_10F_20", "C57BL/6J"),
@@ -232,3 +322,81 @@ class TestConverters(TestCase):
             ("MinION", "minion"),
         ]:
             self.assertEqual(instrument_name_to_platform_id(friendly), expected)
+
+
+class TestSeriesConverters(TestCase):
+    def assertSameAsScalar(self, scalar, vector, values):
+        result = vector(pandas.Series(values, dtype=object))
+        self.assertEqual(len(result), len(values))
+        for value, converted in zip(values, result):
+            expected = scalar(value)
+            if expected is None or (isinstance(expected, float) and numpy.isnan(expected)):
+                self.assertTrue(pandas.isna(converted), msg=f"{value!r} gave {converted!r}")
+            else:
+                self.assertEqual(converted, expected, msg=f"{value!r}")
+
+    def test_same_as_scalar(self):
+        # strings pandas.to_numeric rejects but float() and int() accept
+        values = [
+            "nan", "1_000", "\u0663", "\u0664\u0662", " 4 ", "1e3", "-inf", "", " ", "bad",
+            "3.5", None, "N/A", 7, 2.5,
+        ]
+        for scalar, vector in [
+            (float_or_none, float_or_none_series),
+            (float_or_nan, float_or_nan_series),
+            (int_or_none, int_or_none_series),
+            (positive_int_or_none, positive_int_or_none_series),
+        ]:
+            accepted = []
+            for value in values:
+                try:
+                    scalar(value)
+                except (ValueError, OverflowError):
+                    with self.assertRaises((ValueError, OverflowError), msg=f"{value!r}"):
+                        vector([value])
+                else:
+                    accepted.append(value)
+            self.assertSameAsScalar(scalar, vector, accepted)
+
+    def test_float_or_none_series(self):
+        values = [numpy.nan, None, "4.0", 3, 2.5, "N/A", "#DIV/0!", "#VALUE!", "-"]
+        self.assertSameAsScalar(float_or_none, float_or_none_series, values)
+        self.assertEqual(float_or_none_series(values).dtype, "Float64")
+        self.assertRaises(ValueError, float_or_none_series, ["4.0", "bad"])
+        # float("") raises, so the column version does too
+        self.assertRaises(ValueError, float_or_none, "")
+        self.assertRaises(ValueError, float_or_none_series, ["4.0", ""])
+        self.assertRaises(ValueError, float_or_none_series, ["4.0", " "])
+
+    def test_float_or_nan_series(self):
+        values = [numpy.nan, None, "4.0", 1, "N/A", " #VALUE! ", "missing", "", "-"]
+        self.assertSameAsScalar(float_or_nan, float_or_nan_series, values)
+        self.assertEqual(float_or_nan_series(values).dtype, numpy.float64)
+
+    def test_int_or_none_series(self):
+        values = ["N/A", "#DIV/0!", "-", numpy.nan, None, "", " ", "3", " 4 ", 5, 6.7, -2]
+        self.assertSameAsScalar(int_or_none, int_or_none_series, values)
+        self.assertEqual(int_or_none_series(values).dtype, "Int64")
+        self.assertRaises(ValueError, int_or_none_series, ["3", "3.5"])
+
+    def test_positive_int_or_none_series(self):
+        values = ["N/A", None, "3", -1, "-4", 0, 2.0]
+        self.assertSameAsScalar(positive_int_or_none, positive_int_or_none_series, values)
+
+    def test_date_or_none_series(self):
+        x = datetime(2022, 1, 2, 3, 4, 5)
+        values = [numpy.nan, None, "-", 0, x, "foo"]
+        self.assertSameAsScalar(date_or_none, date_or_none_series, values)
+
+        dates = date_or_none_series(pandas.Series([x, pandas.NaT]))
+        self.assertEqual(list(dates), [x.date(), None])
+
+    def test_str_or_none_series(self):
+        values = [numpy.nan, None, "hello", pandas.NA]
+        self.assertEqual(list(str_or_none_series(values)), [None, None, "hello", None])
+
+    def test_numeric_columns(self):
+        values = pandas.Series([1.5, numpy.nan, -2.5])
+        self.assertEqual(list(int_or_none_series(values).fillna(0)), [1, 0, -2])
+        self.assertEqual(list(positive_int_or_none_series(values).fillna(0)), [1, 0, 0])
+        self.assertEqual(list(float_or_nan_series(values).fillna(0)), [1.5, 0, -2.5])
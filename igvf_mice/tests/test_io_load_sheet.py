@@ -1,8 +1,8 @@
 import datetime
 from io import StringIO
 import pandas
-from django.test import TestCase
 
+from .factories import FixtureTestCase
 from .. import models
 from ..io.load_sheet import (
     load_accessions,
@@ -212,8 +212,8 @@ def get_test_splitseq_ont_sequencing_sheet():
     })
 
 
-class TestReadSheet(TestCase):
-    fixtures = ["source", "mousestrain", "ontologyterm", "platform"]
+class TestReadSheet(FixtureTestCase):
+    bulk_fixtures = ["source", "mousestrain", "ontologyterm", "platform"]
 
     def test_load_protocol(self):
         self.assertEqual(models.ProtocolLink.objects.count(), 0)
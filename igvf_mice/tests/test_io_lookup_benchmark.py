@@ -0,0 +1,35 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..io.lookup_benchmark import run_benchmark
+from .. import models
+
+
+class TestLookupBenchmark(TestCase):
+    def test_run_benchmark(self):
+        results = run_benchmark(2, repeat=1)
+
+        self.assertEqual(
+            [x["name"] for x in results],
+            ["well", "barcode", "subpool", "file by name", "file by library", "accession prefix"])
+        by_name = {x["name"]: x for x in results}
+        self.assertEqual(by_name["well"]["rows"], 1)
+        self.assertEqual(by_name["barcode"]["rows"], 2)
+        self.assertEqual(by_name["file by library"]["rows"], 4)
+        self.assertIn("plate_id_row_column", by_name["well"]["plan"])
+        self.assertIn("subpool_plate_index", by_name["subpool"]["plan"])
+        self.assertNotIn("filename", by_name["file by name"]["unindexed_plan"])
+
+        # the synthetic data is rolled back
+        self.assertEqual(models.SplitSeqPlate.objects.count(), 0)
+        self.assertEqual(models.SequencingFile.objects.count(), 0)
+
+    def test_benchmark_lookups_command(self):
+        output = StringIO()
+        call_command(
+            "benchmark_lookups", "--scale", "1", "--repeat", "1", "--no-compare", stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], "Benchmarking with 1 synthetic plates")
+        self.assertNotIn("without index", output.getvalue())
@@ -0,0 +1,88 @@
+from io import StringIO
+from tempfile import TemporaryDirectory
+
+from django.core.management import call_command
+import pandas
+import pyarrow
+
+from .factories import create_plate, FixtureTestCase, SAMPLE_FIXTURES
+from ..io.parquet import (
+    export_database,
+    get_arrow_type,
+    get_export_tables,
+    read_table,
+)
+from .. import models
+
+
+class TestParquetExport(FixtureTestCase):
+    bulk_fixtures = SAMPLE_FIXTURES
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.plate = create_plate("IGVF_TEST", {"A1": ["016_B6J_10F_03", "017_B6J_10M_03"]}, reagent=None)
+
+    def test_get_arrow_type(self):
+        self.assertEqual(
+            get_arrow_type(models.Mouse._meta.get_field("weight_g")), pyarrow.float64())
+        self.assertEqual(
+            get_arrow_type(models.Mouse._meta.get_field("date_of_birth")), pyarrow.date32())
+        self.assertEqual(
+            get_arrow_type(models.Mouse._meta.get_field("strain")), pyarrow.string())
+        self.assertEqual(
+            get_arrow_type(models.SplitSeqWell._meta.get_field("plate")), pyarrow.string())
+        self.assertEqual(
+            get_arrow_type(models.LibraryBarcode._meta.get_field("id")), pyarrow.int64())
+
+    def test_export_tables(self):
+        names = {name for name, _, _ in get_export_tables()}
+        self.assertIn("mouse", names)
+        self.assertIn("tissue_accession", names)
+        self.assertIn("splitseqwell_biosample", names)
+        self.assertIn("lineage", names)
+
+    def test_export_database(self):
+        with TemporaryDirectory() as tmpdir:
+            written = export_database(tmpdir, batch_size=100)
+            self.assertEqual(written["librarybarcode"], models.LibraryBarcode.objects.count())
+            self.assertEqual(written["tissue"], models.Tissue.objects.count())
+
+            barcodes = read_table(tmpdir, "librarybarcode")
+            self.assertEqual(len(barcodes), models.LibraryBarcode.objects.count())
+            self.assertEqual(
+                barcodes.set_index("id").loc[1, "i7_sequence"],
+                models.LibraryBarcode.objects.get(pk=1).i7_sequence)
+
+            mice = pandas.read_parquet("{}/mouse".format(tmpdir))
+            self.assertEqual(set(mice["name"]), set(models.Mouse.objects.values_list("name", flat=True)))
+            self.assertIsInstance(mice["dissection_start_time"].dtype, pandas.DatetimeTZDtype)
+
+            lineage = read_table(tmpdir, "lineage")
+            self.assertEqual(list(lineage["mouse"].sort_values()), ["016_B6J_10F", "017_B6J_10M"])
+            self.assertEqual(set(lineage["plate"]), {"IGVF_TEST"})
+
+    def test_incremental_export(self):
+        with TemporaryDirectory() as tmpdir:
+            export_database(tmpdir, tables=["splitseqwell", "splitseqplate"])
+
+            well = models.SplitSeqWell.objects.create(plate=self.plate, row="A", column=2)
+            written = export_database(
+                tmpdir, incremental=True, tables=["splitseqwell", "splitseqplate"])
+            self.assertEqual(written["splitseqwell"], 1)
+            self.assertEqual(written["splitseqplate"], 1)
+
+            wells = read_table(tmpdir, "splitseqwell")
+            self.assertEqual(len(wells), 2)
+            self.assertIn(well.id, list(wells["id"]))
+
+            written = export_database(tmpdir, incremental=True, tables=["splitseqwell"])
+            self.assertEqual(written["splitseqwell"], 0)
+            self.assertEqual(len(read_table(tmpdir, "splitseqwell")), 2)
+
+    def test_export_parquet_command(self):
+        with TemporaryDirectory() as tmpdir:
+            output = StringIO()
+            call_command("export_parquet", tmpdir, "--table", "mouse", stdout=output)
+            self.assertEqual(
+                output.getvalue().strip(), "mouse\t{}".format(models.Mouse.objects.count()))
@@ -0,0 +1,97 @@
+from django.core.exceptions import ValidationError
+
+from .factories import create_plate, FixtureTestCase, SAMPLE_FIXTURES
+from ..io.plate_grid import (
+    get_plate_dimensions,
+    get_plate_reagent,
+    load_plate_grid,
+    save_plate_grid,
+)
+from .. import models
+
+
+class TestPlateGrid(FixtureTestCase):
+    bulk_fixtures = SAMPLE_FIXTURES
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.plate = create_plate("IGVF_TEST", {"A1": ["016_B6J_10F_03", "017_B6J_10M_03"]})
+
+    def test_get_plate_dimensions(self):
+        rows, columns = get_plate_dimensions(self.plate)
+        self.assertEqual(rows, list("ABCDEFGH"))
+        self.assertEqual(columns, list(range(1, 13)))
+
+        # SplitSeqWell has no rows past H
+        self.plate.size = models.PlateSizeEnum.size_384
+        self.assertRaises(ValueError, get_plate_dimensions, self.plate)
+
+    def test_load_plate_grid(self):
+        with self.assertNumQueries(3):
+            cells = load_plate_grid(self.plate)
+
+        self.assertEqual(list(cells), ["A1"])
+        self.assertEqual(cells["A1"]["biosamples"], ["016_B6J_10F_03", "017_B6J_10M_03"])
+        self.assertEqual(cells["A1"]["barcodes"], ["A1"])
+        self.assertEqual(get_plate_reagent(self.plate), "wt-v2")
+
+    def test_save_plate_grid(self):
+        cells = {
+            "A1": (["016_B6J_10F_03", "017_B6J_10M_03"], ["A1"]),
+            "A2": (["018_B6J_10F_03"], ["A2"]),
+            "A3": ([], []),
+        }
+        self.assertEqual(save_plate_grid(self.plate, cells, "wt-v2"), 1)
+
+        cells = load_plate_grid(self.plate)
+        self.assertEqual(sorted(cells), ["A1", "A2"])
+        self.assertEqual(cells["A2"]["biosamples"], ["018_B6J_10F_03"])
+        well = models.SplitSeqWell.objects.get(plate=self.plate, row="A", column=2)
+        self.assertEqual(
+            sorted(well.barcode.values_list("barcode_type", flat=True)), ["R", "T"])
+
+        # clearing a well removes it
+        self.assertEqual(save_plate_grid(self.plate, {"A1": ([], [])}, "wt-v2"), 1)
+        self.assertEqual(list(load_plate_grid(self.plate)), ["A2"])
+
+    def test_clear_well_with_read_counts(self):
+        well = models.SplitSeqWell.objects.get(plate=self.plate, row="A", column=1)
+        models.SplitSeqWellReadCount.objects.create(plate=self.plate, well=well, reads=10)
+
+        self.assertEqual(save_plate_grid(self.plate, {"A1": ([], [])}, "wt-v2"), 1)
+        cells = load_plate_grid(self.plate)
+        self.assertEqual(cells["A1"], {"id": well.id, "biosamples": [], "barcodes": []})
+        self.assertEqual(
+            models.SplitSeqWellReadCount.objects.get(plate=self.plate).well_id, well.id)
+
+        # the kept well can be filled again
+        self.assertEqual(save_plate_grid(self.plate, {"A1": ([], [])}, "wt-v2"), 0)
+        self.assertEqual(
+            save_plate_grid(self.plate, {"A1": (["016_B6J_10F_03"], ["A1"])}, "wt-v2"), 1)
+        self.assertEqual(load_plate_grid(self.plate)["A1"]["id"], well.id)
+
+    def test_save_plate_grid_outside_plate(self):
+        with self.assertRaises(ValidationError) as cm:
+            save_plate_grid(self.plate, {"I1": (["016_B6J_10F_03"], []), "A13": ([], [])}, "wt-v2")
+        self.assertEqual(cm.exception.messages, [
+            "A13: not a well of a 96 well plate",
+            "I1: not a well of a 96 well plate",
+        ])
+        self.assertEqual(list(load_plate_grid(self.plate)), ["A1"])
+
+    def test_save_plate_grid_errors(self):
+        cells = {
+            "A1": (["016_B6J_10F_03"], ["A1"]),
+            "B1": (["not_a_sample"], ["Z99"]),
+        }
+        with self.assertRaises(ValidationError) as cm:
+            save_plate_grid(self.plate, cells, "wt-v2")
+        self.assertEqual(
+            cm.exception.messages,
+            ["B1: unknown sample not_a_sample", "B1: unknown barcode Z99 for wt-v2"])
+
+        # nothing was saved
+        cells = load_plate_grid(self.plate)
+        self.assertEqual(cells["A1"]["biosamples"], ["016_B6J_10F_03", "017_B6J_10M_03"])
+        self.assertNotIn("B1", cells)
@@ -2,8 +2,8 @@ import functools
 from io import StringIO
 import pandas
 
-from django.test import TestCase
 
+from .factories import FixtureTestCase, SAMPLE_FIXTURES
 from ..io.platelayout import (
     is_plate_name,
     WellContent,
@@ -192,17 +192,8 @@ def validate_plate_row_ids(plate_row_labels):
         assert row_label in expected_row_labels, f"{row_label} not in expected labels"
 
 
-class TestPlateLayoutParser(TestCase):
-    fixtures = [
-        "source",
-        "library_construction_reagent",
-        "librarybarcode",
-        "mousestrain",
-        "ontologyterm",
-        "igvf_mice/tests/test_mice.yaml",
-        "igvf_mice/tests/test_tissue.yaml",
-        "igvf_mice/tests/test_fixedsample.yaml"
-    ]
+class TestPlateLayoutParser(FixtureTestCase):
+    bulk_fixtures = SAMPLE_FIXTURES
 
     def test_is_plate_name(self):
         self.assertEqual(is_plate_name(None), False)
@@ -1,5 +1,5 @@
-from django.test import TestCase
 import pandas
+from .factories import FixtureTestCase
 from ..io.read_fastq_metadata import (
     is_subpool_exome,
     fastq_metadata_row_to_subpool_name,
@@ -9,8 +9,8 @@ from ..io.read_fastq_metadata import (
 from ..models import Subpool
 
 
-class TestReadFastqMetadata(TestCase):
-    fixtures = [
+class TestReadFastqMetadata(FixtureTestCase):
+    bulk_fixtures = [
         "source",
         "mousestrain",
         "ontologyterm",
@@ -1,14 +1,15 @@
-from django.test import TestCase
+from .factories import FixtureTestCase
 from ..io.read_sheet import (
     normalize_mice_name,
     normalize_mice_strain_name,
     strain_code_to_name,
     strain_name_to_code,
 )
+from .. import models
 
 
-class TestNormalizeMiceName(TestCase):
-    fixtures = ["source", "mousestrain"]
+class TestNormalizeMiceName(FixtureTestCase):
+    bulk_fixtures = ["source", "mousestrain"]
 
     def test_normalize_mice_name_none(self):
         self.assertIs(normalize_mice_name(None), None)
@@ -53,3 +54,36 @@ class TestNormalizeMiceName(TestCase):
         for n in names:
             self.assertEqual(normalize_mice_name(n), n)
 
+
+
+class TestStrainMappings(FixtureTestCase):
+    bulk_fixtures = ["source", "mousestrain"]
+
+    def test_strain_mappings(self):
+        self.assertEqual(strain_code_to_name["B6J"], "C57BL/6J")
+        self.assertEqual(strain_code_to_name["B6129SF1J"], "B6129S1F1/J")
+        self.assertEqual(strain_name_to_code["C57BL/6J"], "B6J")
+        self.assertNotIn("unknown", strain_code_to_name)
+        self.assertRaises(KeyError, strain_name_to_code.__getitem__, "unknown")
+        self.assertEqual(len(strain_code_to_name), models.MouseStrain.objects.count())
+        self.assertEqual(set(strain_name_to_code), set(
+            models.MouseStrain.objects.values_list("display_name", flat=True)))
+
+    def test_normalize_without_queries(self):
+        strain_code_to_name["B6J"]
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                normalize_mice_name("018_B6J_10F")
+                normalize_mice_strain_name("C57BL/6J")
+                normalize_mice_strain_name("B6J")
+
+    def test_cache_invalidation(self):
+        self.assertNotIn("NEWJ", strain_code_to_name)
+        strain = models.MouseStrain.objects.create(
+            name="NEWJ", display_name="NEW/J", source_id="jackson-labs")
+        self.assertEqual(strain_code_to_name["NEWJ"], "NEW/J")
+        self.assertEqual(strain_name_to_code["NEW/J"], "NEWJ")
+
+        strain.delete()
+        self.assertNotIn("NEWJ", strain_code_to_name)
+        self.assertNotIn("NEW/J", strain_name_to_code)
@@ -1,7 +1,9 @@
 from unittest import TestCase
+import pandas
 
 from ..io.validators import (
     validate_alias,
+    validate_aliases,
     validate_mouse_age_sex,
     validate_splitseq_cap_label,
 )
@@ -11,6 +13,39 @@ class TestIoValidators(TestCase):
         self.assertTrue(validate_alias("ali-mortazavi:abcdef"))
         self.assertRaises(ValueError, validate_alias, "ali-mortazavi:194_B6CASTF1/J_10F_20")
 
+    def test_validate_alias_prefix(self):
+        self.assertTrue(validate_alias("igvf-dacc:a b"))
+        for bad in ["unknown-lab:abcdef", "ali-mortazavi:", "ali-mortazavi", "ali-mortazavi:a:b", None]:
+            self.assertRaises(ValueError, validate_alias, bad)
+
+    def test_validate_aliases(self):
+        aliases = pandas.Series(
+            ["ali-mortazavi:abcdef", "ali-mortazavi:194_B6CASTF1/J_10F_20", None, "igvf:x"],
+            index=list("abcd"))
+        mask, invalid = validate_aliases(aliases)
+        self.assertEqual(list(mask.index), list("abcd"))
+        self.assertEqual(list(mask), [True, False, False, True])
+        self.assertEqual(invalid, ["ali-mortazavi:194_B6CASTF1/J_10F_20", None])
+
+        mask, invalid = validate_aliases(["ali-mortazavi:abcdef"])
+        self.assertTrue(mask.all())
+        self.assertEqual(invalid, [])
+
+    def test_validate_aliases_without_strings(self):
+        mask, invalid = validate_aliases([])
+        self.assertEqual(len(mask), 0)
+        self.assertEqual(invalid, [])
+
+        for aliases in [[None], [1, 2]]:
+            mask, invalid = validate_aliases(aliases)
+            self.assertEqual(mask.dtype, bool)
+            self.assertFalse(mask.any())
+            self.assertEqual(invalid, aliases)
+
+        mask, invalid = validate_aliases([1, "igvf:x", "x"])
+        self.assertEqual(list(mask), [False, True, False])
+        self.assertEqual(invalid, [1, "x"])
+
     def test_validate_mouse_age_sex(self):
         self.assertTrue(validate_mouse_age_sex("10F"))
         self.assertTrue(validate_mouse_age_sex("6moM"))
@@ -0,0 +1,94 @@
+import gzip
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+
+from .factories import FixtureTestCase
+from ..io.barcode_index import NO_MATCH
+from ..io.well_read_counts import (
+    BC1_START,
+    extract_barcode_window,
+    build_plate_well_index,
+    count_fastq_barcodes,
+    count_plate_well_reads,
+)
+from .. import models
+
+
+def make_read2(bc1):
+    return b"N" * BC1_START + bc1 + b"GGGG"
+
+
+def write_fastq(filename, sequences):
+    with gzip.open(filename, "wb") as outstream:
+        for i, sequence in enumerate(sequences):
+            outstream.write(b"@read%d\n%s\n+\n%s\n" % (i, sequence, b"F" * len(sequence)))
+
+
+class TestWellReadCounts(FixtureTestCase):
+    bulk_fixtures = [
+        "source",
+        "library_construction_reagent",
+        "librarybarcode",
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.plate = models.SplitSeqPlate.objects.create(name="IGVF_TEST")
+        cls.wells = {}
+        for code in ["A1", "A2"]:
+            well = models.SplitSeqWell.objects.create(
+                plate=cls.plate, row=code[0], column=code[1:])
+            well.barcode.set(models.LibraryBarcode.objects.filter(
+                reagent="wt-mega-v2", code=code))
+            cls.wells[code] = well
+
+        cls.barcodes = {
+            (x.code, x.barcode_type): x.i7_sequence.encode("ascii")
+            for x in models.LibraryBarcode.objects.filter(
+                reagent="wt-mega-v2", code__in=["A1", "A2"])
+        }
+
+    def test_extract_barcode_window(self):
+        window = extract_barcode_window([make_read2(b"ACGTACGT"), b"ACGT"])
+        self.assertEqual(window.shape, (2, 8))
+        self.assertEqual(window[0].tobytes(), b"ACGTACGT")
+        self.assertEqual(window[1].tobytes(), b"\x00" * 8)
+
+    def test_build_plate_well_index(self):
+        index = build_plate_well_index(self.plate)
+        self.assertEqual(len(index), 4)
+        for (code, barcode_type), sequence in self.barcodes.items():
+            self.assertEqual(index.lookup(sequence.decode("ascii")), self.wells[code].id)
+
+    def test_count_plate_well_reads(self):
+        reads = [
+            make_read2(self.barcodes[("A1", "T")]),
+            make_read2(self.barcodes[("A1", "R")]),
+            make_read2(self.barcodes[("A2", "T")]),
+            make_read2(b"NNNNNNNN"),
+            b"ACGT",
+        ]
+        with TemporaryDirectory() as tmpdir:
+            filename = Path(tmpdir) / "test_R2.fastq.gz"
+            write_fastq(filename, reads)
+
+            index = build_plate_well_index(self.plate)
+            serial = count_fastq_barcodes(filename, index, chunk_size=2, workers=0)
+            counts = count_plate_well_reads(self.plate, [filename], chunk_size=2, workers=2)
+
+        self.assertEqual(serial, counts)
+        self.assertEqual(counts[self.wells["A1"].id], 2)
+        self.assertEqual(counts[self.wells["A2"].id], 1)
+        self.assertEqual(counts[NO_MATCH], 2)
+
+        stored = {
+            (x.well_id, x.reads)
+            for x in models.SplitSeqWellReadCount.objects.filter(plate=self.plate)
+        }
+        self.assertEqual(stored, {
+            (self.wells["A1"].id, 2),
+            (self.wells["A2"].id, 1),
+            (None, 2),
+        })
@@ -1,7 +1,10 @@
 from datetime import date
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from django.test import TestCase
+import numpy
 
+from .factories import FixtureTestCase
 from ..models import (
     NucleicAcidEnum,
     Accession,
@@ -41,6 +44,7 @@ from ..models import (
     SequencingFile,
     MeasurementSet,
     reverse_compliment,
+    reverse_compliment_array,
 )
 
 
@@ -51,51 +55,61 @@ class TestReverseCompliment(TestCase):
         self.assertEqual(reverse_compliment(query), expected)
         self.assertEqual(reverse_compliment(query.lower()), expected.lower())
 
+    def test_reverse_compliment_array(self):
+        queries = ["ATGCRYSWKMBVDN", "GATC", "", "ttgact"]
+        result = reverse_compliment_array(queries)
+        self.assertEqual(list(result), [reverse_compliment(x) for x in queries])
 
-class TestModels(TestCase):
-    def setUp(self):
-        self.source_fake = Source.objects.create(
+        result = reverse_compliment_array(["AAC", None, float("nan")])
+        self.assertEqual(list(result), ["GTT", None, None])
+
+
+class TestModels(FixtureTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.source_fake = Source.objects.create(
             name="fake source",
             homepage="https://example.edu",
             igvf_id="/sources/example",
         )
-        self.source_fake.save()
-        self.library_construction_reagent_fake = LibraryConstructionReagent.objects.create(
-            name="a kit", version="3.14", source=self.source_fake
+        cls.source_fake.save()
+        cls.library_construction_reagent_fake = LibraryConstructionReagent.objects.create(
+            name="a kit", version="3.14", source=cls.source_fake
         )
-        self.library_construction_reagent_fake.save()
-        self.library_barcode_fake_t = LibraryBarcode(
-            reagent=self.library_construction_reagent_fake,
+        cls.library_construction_reagent_fake.save()
+        cls.library_barcode_fake_t = LibraryBarcode(
+            reagent=cls.library_construction_reagent_fake,
             name="pb123",
             code="1",
             i7_sequence="GTCTAGGT",
             barcode_type="T",
         )
-        self.library_barcode_fake_t.save()
-        self.library_barcode_fake_r = LibraryBarcode(
-            reagent=self.library_construction_reagent_fake,
+        cls.library_barcode_fake_t.save()
+        cls.library_barcode_fake_r = LibraryBarcode(
+            reagent=cls.library_construction_reagent_fake,
             name="pb222",
             code="2",
             i7_sequence="AGCTTAAC",
             barcode_type="R",
         )
-        self.library_barcode_fake_r.save()
-        self.library_barcode_fake_illumina = LibraryBarcode(
-            reagent=self.library_construction_reagent_fake,
+        cls.library_barcode_fake_r.save()
+        cls.library_barcode_fake_illumina = LibraryBarcode(
+            reagent=cls.library_construction_reagent_fake,
             name="I7",
             code="I7",
             i7_sequence="TTCATGT",
         )
-        self.library_barcode_fake_illumina.save()
-        self.library_barcode_fake_dual_illumina = LibraryBarcode(
-            reagent=self.library_construction_reagent_fake,
+        cls.library_barcode_fake_illumina.save()
+        cls.library_barcode_fake_dual_illumina = LibraryBarcode(
+            reagent=cls.library_construction_reagent_fake,
             name="UDI03",
             code="UDI03",
             i7_sequence="GATCAGTC",
             i5_sequence="TTGACTCT",
         )
-        self.library_barcode_fake_dual_illumina.save()
-        self.mouse_strain_fake = MouseStrain.objects.create(
+        cls.library_barcode_fake_dual_illumina.save()
+        cls.mouse_strain_fake = MouseStrain.objects.create(
             name="CASTHUMAN",
             display_name="CASTJ/human glial cells",
             igvf_strain_background="CASTJ/human glial cells (CASTHUMAN)",
@@ -103,13 +117,13 @@ class TestModels(TestCase):
             jax_catalog_number="[redacted]",
             see_also="https://www.wikidata.org/wiki/Q1500726",
             notes="tries to escape",
-            source=self.source_fake,
+            source=cls.source_fake,
         )
-        self.mouse_strain_fake.save()
-        self.mouse_male_fake = Mouse.objects.create(
+        cls.mouse_strain_fake.save()
+        cls.mouse_male_fake = Mouse.objects.create(
             name="Brain",
             dissection=15,
-            strain=self.mouse_strain_fake,
+            strain=cls.mouse_strain_fake,
             sex=SexEnum.MALE,
             weight_g=21.3,
             date_of_birth="1995-9-9",
@@ -124,11 +138,11 @@ class TestModels(TestCase):
             notes="very fake mouse",
             housing_number="35689",
         )
-        self.mouse_male_fake.save()
-        self.mouse_female_fake = Mouse.objects.create(
+        cls.mouse_male_fake.save()
+        cls.mouse_female_fake = Mouse.objects.create(
             name="Dot",
             dissection=16,
-            strain=self.mouse_strain_fake,
+            strain=cls.mouse_strain_fake,
             sex=SexEnum.FEMALE,
             weight_g=20.1,
             date_of_birth="1995-9-9",
@@ -143,21 +157,21 @@ class TestModels(TestCase):
             notes="very fake mouse",
             housing_number="982735",
         )
-        self.mouse_female_fake.save()
-        self.ontology_term_tail = OntologyTerm.objects.create(
+        cls.mouse_female_fake.save()
+        cls.ontology_term_tail = OntologyTerm.objects.create(
             curie="UBERON:0002415",
             name="tail",
             description="An external caudal extension of the body.",
         )
-        self.ontology_term_tail.save()
-        self.ontology_term_pbmc = OntologyTerm.objects.create(
+        cls.ontology_term_tail.save()
+        cls.ontology_term_pbmc = OntologyTerm.objects.create(
             curie="CL:2000001",
             name="peripheral blood mononuclear cell",
             description="A leukocyte with a single non-segmented nucleus",
         )
-        self.ontology_term_pbmc.save()
-        self.tissue_tail = Tissue.objects.create(
-            mouse=self.mouse_male_fake,
+        cls.ontology_term_pbmc.save()
+        cls.tissue_tail = Tissue.objects.create(
+            mouse=cls.mouse_male_fake,
             name="016_B6J_10M_30",
             description="tail",
             dissection_start_time="2023-08-11T17:07-08:00",
@@ -168,10 +182,10 @@ class TestModels(TestCase):
             dissector="WB",
             dissection_notes="levitated for 5 minutes",
         )
-        self.tissue_tail.ontology_term.set([self.ontology_term_tail])
-        self.tissue_tail.save()
+        cls.tissue_tail.ontology_term.set([cls.ontology_term_tail])
+        cls.tissue_tail.save()
 
-        self.sample_extraction_tail = SampleExtraction(
+        cls.sample_extraction_tail = SampleExtraction(
             name="108_CASTJ_10M_21",
             tube_label="108_21",
             #box_name="stuff",
@@ -183,13 +197,13 @@ class TestModels(TestCase):
             parse_input_ul=660,
             share_input_ul=165,
         )
-        self.sample_extraction_tail.save()
-        self.sample_extraction_tail.tissue.set([self.tissue_tail])
-        self.sample_extraction_tail.save()
+        cls.sample_extraction_tail.save()
+        cls.sample_extraction_tail.tissue.set([cls.tissue_tail])
+        cls.sample_extraction_tail.save()
 
-        self.fixed_sample_tail = ParseFixedSample(
+        cls.fixed_sample_tail = ParseFixedSample(
             name="108_CASTJ_10M_21",
-            extraction=self.sample_extraction_tail,
+            extraction=cls.sample_extraction_tail,
             #tube_label="108_21",
             #box_name="stuff",
             volume_ul=3000,
@@ -198,27 +212,27 @@ class TestModels(TestCase):
             aliquots_made=2,
             aliquot_volume_ul=150,
         )
-        self.fixed_sample_tail.save()
-        #self.fixed_sample_tail.tissue.set([self.tissue_tail])
-        #self.fixed_sample_tail.save()
-        self.plate_fake = SplitSeqPlate(
+        cls.fixed_sample_tail.save()
+        #cls.fixed_sample_tail.tissue.set([cls.tissue_tail])
+        #cls.fixed_sample_tail.save()
+        cls.plate_fake = SplitSeqPlate(
             name="TEST_002",
             size=PlateSizeEnum.size_96,
         )
-        self.plate_fake.save()
-        self.well_single = SplitSeqWell(
-            plate=self.plate_fake,
+        cls.plate_fake.save()
+        cls.well_single = SplitSeqWell(
+            plate=cls.plate_fake,
             row="A",
             column="1",
         )
-        self.well_single.save()
-        self.well_single.biosample.set([self.fixed_sample_tail])
-        self.well_single.barcode.set(
-            [self.library_barcode_fake_r, self.library_barcode_fake_t]
+        cls.well_single.save()
+        cls.well_single.biosample.set([cls.fixed_sample_tail])
+        cls.well_single.barcode.set(
+            [cls.library_barcode_fake_r, cls.library_barcode_fake_t]
         )
-        self.subpool_fake = Subpool.objects.create(
+        cls.subpool_fake = Subpool.objects.create(
             name="002_13B",
-            plate=self.plate_fake,
+            plate=cls.plate_fake,
             nuclei=67000,
             selection_type="NO",
             cdna_pcr_rounds="5 + 7",
@@ -230,37 +244,37 @@ class TestModels(TestCase):
             library_ng_per_ul=30.0,
             library_average_bp_length=410,
         )
-        self.subpool_fake.save()
-        self.subpool_fake.barcode.set([self.library_barcode_fake_illumina])
-        self.subpool_fake.save()
-        self.platform_novaseq = Platform.objects.create(
+        cls.subpool_fake.save()
+        cls.subpool_fake.barcode.set([cls.library_barcode_fake_illumina])
+        cls.subpool_fake.save()
+        cls.platform_novaseq = Platform.objects.create(
             name="novaseq2000",
             igvf_id="/platform-terms/EFO_0010963/",
             display_name="Novaseq 2000",
             family="illumina",
         )
-        self.platform_gridion = Platform.objects.create(
+        cls.platform_gridion = Platform.objects.create(
             name="gridion",
             igvf_id="/platform-terms/EFO_0008633/",
             display_name="ONT GridION",
             family="nanopore",
         )
-        self.sequencing_run_fake = SequencingRun.objects.create(
+        cls.sequencing_run_fake = SequencingRun.objects.create(
             name="next02",
             run_date="1991-08-25",
-            platform=self.platform_novaseq,
-            plate=self.plate_fake,
+            platform=cls.platform_novaseq,
+            plate=cls.plate_fake,
             stranded=StrandedEnum.REVERSE,
         )
-        self.subpool_run = LibraryInRun.objects.create(
-            subpool=self.subpool_fake,
-            sequencing_run=self.sequencing_run_fake,
+        cls.subpool_run = LibraryInRun.objects.create(
+            subpool=cls.subpool_fake,
+            sequencing_run=cls.sequencing_run_fake,
             status=RunStatusEnum.PASS,
             # measurement_set=
         )
 
         # ont sequenced subpools
-        self.ont_subpool_extraction = NucleicAcidExtraction.objects.create(
+        cls.ont_subpool_extraction = NucleicAcidExtraction.objects.create(
             name="ONT003",
             date="2022-08-12",
             # in ONT sequencing this is 150 / input_ng_per_ul.
@@ -269,11 +283,11 @@ class TestModels(TestCase):
             input_ng_per_ul=130,
             passed_qc=True,
         )
-        self.ont_subpool_extraction.save()
-        self.ont_subpool_extraction.tissue.set([self.tissue_tail])
-        self.ont_subpool_extraction.save()
+        cls.ont_subpool_extraction.save()
+        cls.ont_subpool_extraction.tissue.set([cls.tissue_tail])
+        cls.ont_subpool_extraction.save()
 
-        self.ont_subpool_library = NanoporeLibrary.objects.create(
+        cls.ont_subpool_library = NanoporeLibrary.objects.create(
             name="ONT003",
             nucleic_acid=NucleicAcidEnum.rna,
             technician="Jay",
@@ -284,9 +298,9 @@ class TestModels(TestCase):
             volume_ul=2.0942408377,
         )
 
-        self.ont_subpool_library.save()
-        self.ont_subpool_library.nucleic_acid_extraction.set([self.ont_subpool_extraction])
-        self.ont_subpool_library.save()
+        cls.ont_subpool_library.save()
+        cls.ont_subpool_library.nucleic_acid_extraction.set([cls.ont_subpool_extraction])
+        cls.ont_subpool_library.save()
 
     # Test cases some of which depend on the above preseeded object tree
     def test_accession_with_uuid(self):
@@ -367,6 +381,24 @@ class TestModels(TestCase):
         self.assertEqual(barcode.i7_sequence, "GATCAGTC")
         self.assertEqual(barcode.i5_sequence, "TTGACTCT")
         self.assertEqual(barcode.i5_reverse_compliment, "AGAGTCAA")
+        self.assertEqual(barcode.i5_rc, "AGAGTCAA")
+        self.assertEqual(barcode.i7_rc, "GACTGATC")
+
+        found = LibraryBarcode.objects.get(i5_rc="AGAGTCAA")
+        self.assertEqual(found.id, barcode.id)
+
+        barcode.i5_sequence = "AAAACCCC"
+        # the stored value is only refreshed by save
+        self.assertEqual(barcode.i5_rc, "AGAGTCAA")
+        self.assertEqual(barcode.i5_reverse_compliment, "GGGGTTTT")
+        barcode.save()
+        self.assertEqual(LibraryBarcode.objects.get(id=barcode.id).i5_rc, "GGGGTTTT")
+
+    def test_library_barcode_fixture_reverse_compliment(self):
+        barcode = self.library_barcode_fake_t
+        self.assertEqual(barcode.i7_rc, reverse_compliment(barcode.i7_sequence))
+        self.assertIsNone(barcode.i5_rc)
+        self.assertIsNone(barcode.i5_reverse_compliment)
 
     def test_mouse_strain(self):
         strain = MouseStrain(
@@ -591,6 +623,10 @@ class TestModels(TestCase):
         self.assertEqual(str(well_single), f"{self.plate_fake.name} A2")
         self.assertEqual(well_single.well, f"{row}{column}")
 
+        with transaction.atomic():
+            with self.assertRaises(IntegrityError):
+                SplitSeqWell.objects.create(plate=self.plate_fake, row=row, column=column)
+
     def test_subpool(self):
         subpool = Subpool.objects.create(
             name="002_13A",
@@ -1046,6 +1082,124 @@ class TestModels(TestCase):
         )
 
 
+class TestAnnotations(FixtureTestCase):
+    bulk_fixtures = [
+        "source",
+        "mousestrain",
+        "ontologyterm",
+        "igvf_mice/tests/test_mice.yaml",
+        "igvf_mice/tests/test_tissue.yaml",
+        "igvf_mice/tests/test_fixedsample.yaml"
+    ]
+
+    def assertSameQuantity(self, annotated, computed):
+        if computed is None or numpy.isnan(computed):
+            self.assertIsNone(annotated)
+        else:
+            self.assertAlmostEqual(annotated, computed)
+
+    def test_tissue_weights(self):
+        tissues = {x.name: x for x in Tissue.objects.all()}
+        annotated = Tissue.objects.with_weights()
+        self.assertEqual(len(annotated), len(tissues))
+        for tissue in annotated:
+            self.assertSameQuantity(tissue.weight_g, tissues[tissue.name].weight_g)
+            self.assertSameQuantity(tissue.weight_mg, tissues[tissue.name].weight_mg)
+
+    def test_tube_counts(self):
+        extraction = SampleExtraction.objects.first()
+        counts = [
+            (None, None, None, None),
+            (100, 2, None, None),
+            (None, None, 100, 3),
+            (100, 2, 120, None),
+            (100, None, 120, 2),
+            (100, 2, 120, 4),
+        ]
+        for i, (count1, df1, count2, df2) in enumerate(counts):
+            ParseFixedSample.objects.create(
+                name="count_{}".format(i),
+                extraction=extraction,
+                volume_ul=None if i == 0 else 10.0,
+                count1=count1,
+                df1=df1,
+                count2=count2,
+                df2=df2,
+            )
+
+        for model in [SampleExtraction, ParseFixedSample]:
+            samples = {x.name: x for x in model.objects.all()}
+            for sample in model.objects.with_counts():
+                expected = samples[sample.name]
+                self.assertSameQuantity(sample.average_count, expected.average_count)
+                self.assertSameQuantity(sample.df_scaled_count, expected.df_scaled_count)
+                self.assertSameQuantity(sample.nuclei_per_ul, expected.nuclei_per_ul)
+                self.assertSameQuantity(sample.total_nuclei, expected.total_nuclei)
+
+    def test_extraction_without_counts(self):
+        SampleExtraction.objects.create(name="no_counts", volume_ul=100, parse_input_ul=10)
+        ParseFixedSample.objects.create(
+            name="no_counts_fixed", extraction_id="no_counts", volume_ul=10)
+
+        extraction = SampleExtraction.objects.with_counts().get(name="no_counts")
+        self.assertIsNone(extraction.nuclei_per_ul)
+        self.assertIsNone(extraction.nuclei_per_ml)
+        self.assertIsNone(extraction.nuclei_into_parse)
+        self.assertIsNone(extraction.nuclei_into_share)
+
+        fixed_sample = ParseFixedSample.objects.with_counts().select_related(
+            "extraction").get(name="no_counts_fixed")
+        self.assertIsNone(fixed_sample.total_nuclei)
+        self.assertIsNone(fixed_sample.fraction_recovered)
+
+    def test_nucleic_acid_concentration(self):
+        concentrations = [(None, None, None), (None, 10, 20), (None, 10, None), (5, 10, 20)]
+        for i, (input_ng_per_ul, concentration1, concentration2) in enumerate(concentrations):
+            NucleicAcidExtraction.objects.create(
+                name="DNA{}".format(i),
+                volume_ul=2,
+                input_ng_per_ul=input_ng_per_ul,
+                concentration1=concentration1,
+                concentration2=concentration2,
+                passed_qc=True,
+            )
+
+        extractions = {x.name: x for x in NucleicAcidExtraction.objects.all()}
+        for extraction in NucleicAcidExtraction.objects.with_concentration():
+            expected = extractions[extraction.name]
+            self.assertSameQuantity(
+                extraction.average_concentration, expected.average_concentration)
+            self.assertSameQuantity(extraction.total, expected.total)
+
+    def test_plate_total_nuclei(self):
+        SplitSeqPlate.objects.create(name="IGVF_001", barcoded_cell_counter=1000)
+        SplitSeqPlate.objects.create(
+            name="IGVF_002", barcoded_cell_counter=1000, volume_of_nuclei=1000)
+
+        plates = SplitSeqPlate.objects.with_total_nuclei().order_by("name")
+        self.assertEqual([x.total_nuclei for x in plates], [None, 1000000])
+        self.assertEqual(
+            list(plates.filter(total_nuclei__gt=0).values_list("name", flat=True)),
+            ["IGVF_002"])
+
+    def test_filter_and_sort_tissues(self):
+        with self.assertNumQueries(1):
+            tissues = list(
+                Tissue.objects.with_weights().with_nuclei_yield().filter(
+                    weight_mg__gt=50,
+                ).order_by("-nuclei_yield")
+            )
+
+        self.assertGreater(len(tissues), 0)
+        self.assertTrue(all(x.weight_mg > 50 for x in tissues))
+        yields = [x.nuclei_yield for x in tissues if x.nuclei_yield is not None]
+        self.assertEqual(yields, sorted(yields, reverse=True))
+        tissue = tissues[0]
+        expected = sum(
+            x.total_nuclei for x in SampleExtraction.objects.filter(tissue=tissue))
+        self.assertAlmostEqual(tissue.nuclei_yield, expected)
+
+
 class TestSexCode(TestCase):
     def test_none(self):
         self.assertIs(get_sex_code(""), None)
@@ -1088,8 +1242,8 @@ class TestTimepointConversions(TestCase):
         self.assertEqual(get_timepoint_units_from_timepoint("6 months"), "M")
 
 
-class TestProtocolLink(TestCase):
-    fixtures = ["test_protocols"]
+class TestProtocolLink(FixtureTestCase):
+    bulk_fixtures = ["test_protocols"]
 
     def test_get_protocol_from_url(self):
         url = "https://www.protocols.io/view/evercode-wt-v2-2-1-eq2lyj9relx9/v1"
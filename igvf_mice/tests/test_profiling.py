@@ -0,0 +1,76 @@
+import json
+
+from django.test import override_settings
+
+from mousedemo.profiling import format_server_timing, get_query_shape
+
+from .factories import create_plate, FixtureTestCase, SAMPLE_FIXTURES
+
+
+class TestProfilingMiddleware(FixtureTestCase):
+    bulk_fixtures = SAMPLE_FIXTURES
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        create_plate("IGVF_TEST", {
+            "A1": ["016_B6J_10F_03"],
+            "A2": ["017_B6J_10M_03"],
+            "A3": ["016_B6J_10F_03", "017_B6J_10M_03"],
+        })
+
+    def test_get_query_shape(self):
+        self.assertEqual(
+            get_query_shape('SELECT "a" FROM "t" WHERE "id" IN (%s, %s, %s) LIMIT 21'),
+            get_query_shape('SELECT "a" FROM "t" WHERE "id" IN (%s) LIMIT 21'),
+        )
+        self.assertEqual(
+            get_query_shape("SELECT 1 FROM t WHERE name = 'x'"),
+            "SELECT ? FROM t WHERE name = ?",
+        )
+
+    def test_format_server_timing(self):
+        self.assertEqual(
+            format_server_timing([
+                ("sql", 1.234, '3 "queries"'), ("serialize", None, None), ("total", 5, None)]),
+            "sql;dur=1.2;desc=\"3 'queries'\", total;dur=5.0",
+        )
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_DUPLICATE_THRESHOLD=2)
+    def test_profiled_request(self):
+        with self.assertLogs("mousedemo.profiling") as logs:
+            response = self.client.get("/split-seq-plate/")
+        self.assertEqual(response.status_code, 200)
+
+        timing = response["Server-Timing"]
+        self.assertIn("sql;dur=", timing)
+        self.assertIn('desc="SplitSeqPlateSerializer"', timing)
+        self.assertIn("total;dur=", timing)
+
+        self.assertEqual(len(logs.records), 1)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["path"], "/split-seq-plate/")
+        self.assertEqual(record["view"], "igvf_mice.views.SplitSeqPlateViewSet")
+        self.assertEqual(record["serializer"], "SplitSeqPlateSerializer")
+        self.assertEqual(record["response_bytes"], len(response.content))
+        self.assertGreater(record["sql_count"], 0)
+        self.assertGreaterEqual(record["serialize_ms"], 0)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_DUPLICATE_THRESHOLD=2)
+    def test_duplicate_queries(self):
+        # the tissue serializer looks up the mouse of each tissue
+        with self.assertLogs("mousedemo.profiling", level="WARNING") as logs:
+            response = self.client.get("/tissue/")
+        self.assertIn("repeated", response["Server-Timing"])
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["serializer"], "TissueSerializer")
+        self.assertGreater(len(record["duplicate_queries"]), 0)
+        for duplicate in record["duplicate_queries"]:
+            self.assertGreater(duplicate["count"], 2)
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        response = self.client.get("/split-seq-plate/")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Server-Timing", response)
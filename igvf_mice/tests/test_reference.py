@@ -0,0 +1,169 @@
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.db import transaction
+from django.test import RequestFactory, TransactionTestCase, override_settings
+
+from .factories import FixtureTestCase
+from .. import models
+from .. import reference
+from ..serializers import PipelineMouseSerializer
+
+
+class TestReferenceCache(FixtureTestCase):
+    bulk_fixtures = [
+        "source",
+        "platform",
+        "library_construction_reagent",
+        "librarybarcode",
+        "mousestrain",
+        "ontologyterm",
+        "igvf_mice/tests/test_mice.yaml",
+    ]
+
+    def test_lookups(self):
+        self.assertEqual(reference.get_platform("nextseq2000").display_name, "Nextseq 2000")
+        self.assertEqual(reference.get_mouse_strain("B6J").pk, "B6J")
+        self.assertEqual(reference.get_reagent("wt-v2").pk, "wt-v2")
+
+        barcodes = reference.get_barcodes("wt-v2", "A1")
+        self.assertEqual(
+            {x.pk for x in barcodes},
+            set(models.LibraryBarcode.objects.filter(
+                reagent="wt-v2", code="A1").values_list("pk", flat=True)))
+        self.assertEqual(len(reference.get_barcodes("wt-v2", "A1", "T")), 1)
+        self.assertEqual(reference.get_barcode(barcodes[0].pk), barcodes[0])
+
+        with self.assertRaises(models.Platform.DoesNotExist):
+            reference.get_platform("not-a-platform")
+        self.assertEqual(reference.get_barcodes("wt-v2", "Z99"), [])
+
+    def test_lookups_are_cached(self):
+        reference.get_mouse_strain("B6J")
+        reference.get_barcodes("wt-v2", "A1")
+        with self.assertNumQueries(0):
+            strain = reference.get_mouse_strain("B6J")
+            self.assertEqual(strain.source.pk, strain.source_id)
+            barcode = reference.get_barcodes("wt-v2", "A1")[0]
+            self.assertEqual(barcode.reagent.pk, "wt-v2")
+
+    def test_invalidation(self):
+        self.assertEqual(len(reference.platforms.all()), models.Platform.objects.count())
+        models.Platform.objects.create(
+            name="testseq", display_name="Test sequencer", family="illumina")
+        self.assertEqual(reference.get_platform("testseq").display_name, "Test sequencer")
+
+        models.Platform.objects.get(pk="testseq").delete()
+        with self.assertRaises(models.Platform.DoesNotExist):
+            reference.get_platform("testseq")
+
+        # strains hold their source, so changing a source clears them
+        strain = reference.get_mouse_strain("B6J")
+        source = models.Source.objects.get(pk=strain.source_id)
+        source.display_name = "renamed"
+        source.save()
+        self.assertEqual(reference.get_mouse_strain("B6J").source.display_name, "renamed")
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "reference": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "reference-test",
+            },
+        },
+        IGVF_MICE_REFERENCE_CACHE="reference",
+    )
+    def test_shared_cache(self):
+        shared = caches["reference"]
+        shared.clear()
+        reference.get_platform("nextseq2000")
+        self.assertIsNotNone(shared.get(reference.platforms.rows_key(0)))
+
+        # a change made without signals, like one from another process
+        models.Platform.objects.filter(pk="nextseq2000").update(display_name="changed")
+        self.assertEqual(reference.get_platform("nextseq2000").display_name, "Nextseq 2000")
+
+        # the other process bumps the generation when it saves
+        shared.add(reference.platforms.generation_key, 0, timeout=None)
+        shared.incr(reference.platforms.generation_key)
+        self.assertEqual(reference.get_platform("nextseq2000").display_name, "changed")
+        shared.clear()
+
+    def test_serializer_reference_fields(self):
+        request = RequestFactory().get("/")
+        mouse = models.Mouse.objects.get(name="016_B6J_10F")
+        reference.get_mouse_strain("B6J")
+        with self.assertNumQueries(0):
+            data = PipelineMouseSerializer(mouse, context={"request": request}).data
+        self.assertEqual(data["genotype"], models.MouseStrain.objects.get(pk="B6J").name)
+
+    def test_threads(self):
+        strains = list(models.MouseStrain.objects.select_related("source").order_by("pk"))
+        strain = strains[0]
+        errors = []
+        done = threading.Event()
+
+        def lookup():
+            try:
+                while not done.is_set():
+                    found = [
+                        reference.mouse_strains.get(strain.pk),
+                        reference.mouse_strains.get_by(display_name=strain.display_name),
+                    ]
+                    count = len(reference.mouse_strains.all())
+                    if found != [strain, strain] or count != len(strains):
+                        raise AssertionError("{} {}".format(found, count))
+            except Exception as e:
+                errors.append(e)
+                done.set()
+
+        def clear():
+            for _ in range(500):
+                if done.is_set():
+                    break
+                reference.mouse_strains.clear()
+                # let the lookups run between clears
+                time.sleep(0)
+            done.set()
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, switch_interval)
+        # the threads don't share the test transaction, so give them the rows
+        with patch.object(reference.mouse_strains, "_query", return_value=strains):
+            threads = [threading.Thread(target=lookup) for _ in range(4)]
+            threads.append(threading.Thread(target=clear))
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+
+
+class TestReferenceCacheRollback(TransactionTestCase):
+    def test_rollback(self):
+        class Rollback(Exception):
+            pass
+
+        with self.assertRaises(Rollback):
+            with transaction.atomic():
+                models.Platform.objects.create(
+                    name="testseq", display_name="Test sequencer", family="illumina")
+                self.assertEqual(reference.get_platform("testseq").display_name, "Test sequencer")
+                raise Rollback()
+
+        with self.assertRaises(models.Platform.DoesNotExist):
+            reference.get_platform("testseq")
+
+    def test_commit(self):
+        with transaction.atomic():
+            models.Platform.objects.create(
+                name="testseq", display_name="Test sequencer", family="illumina")
+            reference.get_platform("testseq")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(reference.get_platform("testseq").display_name, "Test sequencer")
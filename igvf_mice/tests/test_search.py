@@ -0,0 +1,121 @@
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+
+from .factories import FixtureTestCase, SAMPLE_FIXTURES
+from .. import models
+from .. import search
+
+
+class TestSearch(FixtureTestCase):
+    bulk_fixtures = SAMPLE_FIXTURES
+
+    def test_fixtures_indexed(self):
+        self.assertTrue(models.SearchEntry.objects.filter(
+            kind="mouse", object_id="016_B6J_10F").exists())
+        self.assertTrue(models.SearchEntry.objects.filter(
+            kind="tissue", object_id="016_B6J_10F_01", field="tube_label", text="016-01").exists())
+
+    def test_substring(self):
+        hits = search.search("b6j_10f_0")
+        self.assertGreater(len(hits), 0)
+        self.assertEqual({hit.kind for hit in hits}, {"tissue", "parse-fixed-sample"})
+        for hit in hits:
+            self.assertIn("b6j_10f_0", hit.text.lower())
+
+        # exact matches come first
+        self.assertEqual(
+            [(x.kind, x.object_id) for x in search.search("016_B6J_10F")[:1]],
+            [("mouse", "016_B6J_10F")],
+        )
+
+    def test_one_hit_per_object(self):
+        hits = search.search("016", kinds=["tissue"])
+        keys = [(hit.kind, hit.object_id) for hit in hits]
+        self.assertEqual(len(keys), len(set(keys)))
+        self.assertIn(("tissue", "016_B6J_10F_01"), keys)
+
+    def test_short_query(self):
+        hits = search.search("ll", kinds=["tissue"])
+        self.assertIn("Cerebellum", [hit.text for hit in hits])
+        self.assertEqual(search.search("  "), [])
+
+    def test_signals(self):
+        mouse = models.Mouse.objects.get(pk="016_B6J_10F")
+        tissue = models.Tissue.objects.create(
+            name="016_B6J_10F_99", mouse=mouse, description="Zygomatic gland")
+        self.assertEqual(
+            [(x.object_id, x.field) for x in search.search("zygomatic")],
+            [("016_B6J_10F_99", "description")],
+        )
+
+        tissue.description = "Parotid gland"
+        tissue.save()
+        self.assertEqual(search.search("zygomatic"), [])
+        self.assertEqual(len(search.search("parotid")), 1)
+
+        tissue.delete()
+        self.assertEqual(search.search("parotid"), [])
+
+    def test_deferred_indexing(self):
+        mouse = models.Mouse.objects.get(pk="016_B6J_10F")
+        with search.deferred_indexing():
+            for i in range(90, 93):
+                models.Tissue.objects.create(
+                    name="016_B6J_10F_{}".format(i), mouse=mouse, description="Zygomatic gland")
+            models.Tissue.objects.get(pk="016_B6J_10F_92").delete()
+            self.assertEqual(search.search("zygomatic"), [])
+
+        self.assertEqual(
+            sorted(x.object_id for x in search.search("zygomatic")),
+            ["016_B6J_10F_90", "016_B6J_10F_91"],
+        )
+
+    def test_rebuild(self):
+        models.SearchEntry.objects.all().delete()
+        self.assertEqual(search.search("016_B6J"), [])
+
+        count = search.rebuild_search_index()
+        self.assertEqual(count, models.SearchEntry.objects.count())
+        self.assertGreater(len(search.search("016_B6J")), 0)
+
+    def test_endpoint(self):
+        response = self.client.get("/search/", {"q": "016_b6j_10f_01", "type": "tissue"})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["count"], 1)
+        hit = data["results"][0]
+        self.assertEqual(hit["type"], "tissue")
+        self.assertEqual(hit["id"], "016_B6J_10F_01")
+        self.assertEqual(hit["url"], "http://testserver/tissue/016_B6J_10F_01/")
+        self.assertEqual(self.client.get(hit["url"]).status_code, 200)
+
+        response = self.client.get("/search/", {"q": "016", "type": "plate"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/search/", {"q": "016", "limit": "x"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/search/", {"q": "016", "limit": 2})
+        self.assertEqual(len(response.json()["results"]), 2)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "PAGE_SIZE": 2})
+    def test_endpoint_limit(self):
+        response = self.client.get("/search/", {"q": "016", "limit": 1000})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 2)
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite FTS5 table")
+    def test_without_fts(self):
+        expected = [(x.kind, x.object_id) for x in search.search("016_B6J")]
+        with connection.cursor() as cursor:
+            for suffix in ["insert", "delete", "update"]:
+                cursor.execute("DROP TRIGGER {}_{}".format(search.FTS_TABLE, suffix))
+            cursor.execute("DROP TABLE {}".format(search.FTS_TABLE))
+
+        # like a SQLite build without the trigram tokenizer
+        with patch.object(search, "FTS_TOKENIZER", "not-a-tokenizer"):
+            search.create_search_index()
+        self.assertFalse(search.has_fts_table())
+        self.assertEqual([(x.kind, x.object_id) for x in search.search("016_B6J")], expected)
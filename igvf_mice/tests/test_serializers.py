@@ -1,12 +1,13 @@
 from django.contrib.auth.models import User
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient
 from pathlib import Path
 from urllib.parse import urlparse, urljoin
 
 from igvf_mice import models
 from igvf_mice import serializers
+from igvf_mice.tests.factories import FixtureTestCase
 
 
 def get_pk_from_id(value):
@@ -15,9 +16,13 @@ def get_pk_from_id(value):
     return parts[-1]
 
 
-class TestSerializers(APITestCase):
-    def setUp(self):
-        self.user = User.objects.create(username="test_user")
+class TestSerializers(FixtureTestCase):
+    client_class = APIClient
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create(username="test_user")
 
     def create_object(self, url, payload, expected_status):
         # Does object already exist?
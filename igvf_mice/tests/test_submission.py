@@ -0,0 +1,177 @@
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.core.management import call_command
+import pandas
+
+from .factories import create_plate, FixtureTestCase, SAMPLE_FIXTURES
+from .. import models
+from ..submission import build_submission, load_plate, SUBMISSION_TABLES
+
+
+def add_library(subpool, run_name, platform, status, reads):
+    run, _ = models.SequencingRun.objects.get_or_create(
+        name=run_name,
+        defaults={"platform_id": platform, "plate": subpool.plate, "flowcell_id": run_name},
+    )
+    library = models.LibraryInRun.objects.create(
+        subpool=subpool, sequencing_run=run, status=status)
+    for lane, read in reads:
+        models.SequencingFile.objects.create(
+            sequencing_run=run,
+            library_in_run=library,
+            filename="{}_{}_L00{}_{}_001.fastq.gz".format(run_name, subpool.name, lane, read),
+            md5sum="{:032d}".format(models.SequencingFile.objects.count()),
+            lane=lane,
+            read=read,
+        )
+    return library
+
+
+class TestSubmission(FixtureTestCase):
+    bulk_fixtures = SAMPLE_FIXTURES + ["platform", "test_protocols"]
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        plate = create_plate("IGVF_TEST", {
+            "A1": ["016_B6J_10F_03"],
+            "A2": ["017_B6J_10M_03"],
+            "B1": ["016_B6J_10F_03", "017_B6J_10M_03"],
+        })
+        mouse = models.Mouse.objects.get(pk="016_B6J_10F")
+        mouse.accession.create(
+            name="IGVFDO0000MOUS", see_also="https://api.data.igvf.org/IGVFDO0000MOUS/")
+        mouse.accession.create(
+            accession_prefix=models.AccessionNamespacesEnum.IGVF_TEST,
+            name="TSTDO0000MOUS",
+            see_also="https://api.sandbox.igvf.org/TSTDO0000MOUS/",
+        )
+
+        first = models.Subpool.objects.create(
+            name="TEST_1A", plate=plate, nuclei=13000, selection_type="NO")
+        second = models.Subpool.objects.create(
+            name="TEST_1B", plate=plate, nuclei=13000, selection_type="EX")
+        models.Subpool.objects.create(name="TEST_1C", plate=plate, nuclei=13000)
+        first.protocols.set(models.ProtocolLink.objects.order_by("name")[:2])
+
+        reads = [(1, "R1"), (1, "R2"), (1, "I1"), (2, "R1"), (2, "R2")]
+        add_library(first, "RUN_1", "nextseq2000", "P", reads)
+        add_library(first, "RUN_2", "novaseqx", "P", reads[:2])
+        library = add_library(second, "RUN_1", "nextseq2000", "P", reads[:2])
+        library.measurement_set = models.MeasurementSet.objects.create(name="TEST_1B_illumina")
+        library.save()
+        library.measurement_set.accession.create(
+            name="IGVFDS0000MSET", see_also="https://api.data.igvf.org/IGVFDS0000MSET/")
+        add_library(second, "RUN_3", "promethion", "P", [(None, None)])
+        add_library(models.Subpool.objects.get(name="TEST_1C"), "RUN_1", "nextseq2000", "F", reads)
+
+    def test_query_count(self):
+        # plate, wells and their 5 relations, subpools and accessions,
+        # libraries and their 4 prefetched relations
+        with self.assertNumQueries(14):
+            records = load_plate("IGVF_TEST")
+        with self.assertNumQueries(0):
+            tables = {name: len(build(records)) for name, build in SUBMISSION_TABLES.items()}
+        self.assertEqual(tables["rodent_donor"], 2)
+        self.assertEqual(tables["sequence_file"], 9)
+
+    def test_rodent_donor(self):
+        donors = build_submission("IGVF_TEST", tables=["rodent_donor"])["rodent_donor"]
+        self.assertEqual(list(donors["rodent_identifier"]), ["016_B6J_10F", "017_B6J_10M"])
+        self.assertEqual(
+            list(donors["aliases:array"]),
+            ["ali-mortazavi:016_B6J_10F", "ali-mortazavi:017_B6J_10M"])
+        self.assertEqual(list(donors["sex"]), ["female", "male"])
+        self.assertEqual(donors["accession"][0], "IGVFDO0000MOUS")
+        self.assertIsNone(donors["accession"][1])
+        self.assertEqual(donors["sources:array"][0], "/sources/jackson-labs/")
+        self.assertEqual(donors["award"][0], "/awards/HG012077/")
+
+        sandbox = build_submission(
+            "IGVF_TEST", accession_prefix="igvftst", tables=["rodent_donor"])["rodent_donor"]
+        self.assertEqual(sandbox["accession"][0], "TSTDO0000MOUS")
+
+    def test_tissue(self):
+        tissues = build_submission("IGVF_TEST", tables=["tissue"])["tissue"]
+        expected = models.Tissue.ontology_term.through.objects.filter(
+            tissue__in=["016_B6J_10F_03", "017_B6J_10M_03"]).count()
+        self.assertEqual(len(tissues), expected)
+        self.assertTrue(tissues["aliases:array"][0].startswith("ali-mortazavi:016_B6J_10F_03_"))
+        self.assertEqual(tissues["donors:array"][0], "ali-mortazavi:016_B6J_10F")
+        self.assertEqual(tissues["age_units"][0], "day")
+
+    def test_multiplexed_sample(self):
+        samples = build_submission("IGVF_TEST", tables=["multiplexed_sample"])["multiplexed_sample"]
+        # TEST_1C has no passing library
+        self.assertEqual(list(samples["cellular_sub_pool"]), ["TEST_1A", "TEST_1B"])
+        self.assertEqual(samples["multiplexing_methods:array"][0], "barcode based")
+        tissues = build_submission("IGVF_TEST", tables=["tissue"])["tissue"]
+        self.assertEqual(
+            set(samples["multiplexed_samples:array"][0].split(",")),
+            set(tissues["aliases:array"]),
+        )
+
+    def test_measurement_set(self):
+        measurement_sets = build_submission(
+            "IGVF_TEST", tables=["measurement_set"])["measurement_set"]
+        self.assertEqual(list(measurement_sets["aliases:array"]), [
+            "ali-mortazavi:TEST_1A_illumina",
+            "ali-mortazavi:TEST_1B_illumina",
+            "ali-mortazavi:TEST_1B_nanopore",
+        ])
+        self.assertEqual(
+            list(measurement_sets["sequencing_library_types:array"]),
+            ["mRNA enriched", "exome capture", "exome capture"])
+        self.assertEqual(
+            list(measurement_sets["accession"].fillna("")), ["", "IGVFDS0000MSET", ""])
+        self.assertEqual(measurement_sets["assay_term_name:skip"][0], "snRNA-seq")
+        self.assertEqual(measurement_sets["samples:array"][0], "ali-mortazavi:subpool_TEST_1A")
+        self.assertEqual(len(measurement_sets["protocols:array"][0].split(",")), 2)
+
+    def test_sequence_file(self):
+        files = build_submission("IGVF_TEST", tables=["sequence_file"])["sequence_file"]
+        first = files[files["file_set"] == "ali-mortazavi:TEST_1A_illumina"]
+        # index reads are skipped, runs count the run and lane groups
+        self.assertEqual(len(first), 6)
+        self.assertEqual(list(first["sequencing_run:integer"]), [1, 1, 2, 2, 3, 3])
+        self.assertEqual(list(first["read_names:array"][:2]), ["Read 1", "Read 2"])
+        self.assertEqual(
+            list(first["sequencing_kit"][-2:]), ["NovaSeq X Series 25B Reagent Kit"] * 2)
+        nanopore = files[files["file_set"] == "ali-mortazavi:TEST_1B_nanopore"]
+        self.assertEqual(len(nanopore), 1)
+        self.assertTrue(pandas.isnull(nanopore["read_names:array"].iloc[0]))
+
+    def test_unknown_plate(self):
+        with self.assertRaises(models.SplitSeqPlate.DoesNotExist):
+            build_submission("IGVF_NONE")
+        with self.assertRaises(ValueError):
+            build_submission("IGVF_TEST", tables=["biosample"])
+
+    def test_command(self):
+        with TemporaryDirectory() as tempdir:
+            path = Path(tempdir) / "IGVF_TEST.xlsx"
+            stdout = StringIO()
+            call_command("build_submission", "IGVF_TEST", str(path), stdout=stdout)
+            self.assertIn("sequence_file\t9", stdout.getvalue())
+
+            book = pandas.read_excel(path, sheet_name=None)
+            self.assertEqual(list(book), [
+                "rodent_donor", "tissue", "multiplexed_sample", "measurement_set", "sequence_file"])
+            self.assertEqual(len(book["rodent_donor"]), 2)
+
+    def test_endpoint(self):
+        response = self.client.get(
+            "/igvf/submission/IGVF_TEST/", {"table": ["rodent_donor", "measurement_set"]})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(list(data), ["rodent_donor", "measurement_set"])
+        self.assertEqual(data["rodent_donor"][0]["accession"], "IGVFDO0000MOUS")
+        self.assertIsNone(data["rodent_donor"][1]["accession"])
+
+        self.assertEqual(self.client.get("/igvf/submission/IGVF_NONE/").status_code, 404)
+        response = self.client.get("/igvf/submission/IGVF_TEST/", {"table": "biosample"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/igvf/submission/IGVF_TEST/", {"accession_prefix": "x"})
+        self.assertEqual(response.status_code, 400)
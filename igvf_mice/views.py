@@ -1,9 +1,13 @@
 from django_filters import rest_framework as filters
 from rest_framework import viewsets
 from rest_framework import permissions
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
 from igvf_mice.models import (
     Accession,
+    AccessionNamespacesEnum,
     Source,
     ProtocolLink,
     LibraryConstructionReagent,
@@ -52,7 +56,25 @@ from igvf_mice.serializers import (
     IgvfSeqSpecListSerializer,
     IgvfSeqSpecDetailSerializer,
     PipelineSampleMetadataSerializer,
+    SearchEntrySerializer,
 )
+from igvf_mice import search
+from igvf_mice import submission
+
+
+class AnnotatedQuerySetMixin:
+    """Read computed quantities from the database instead of python
+
+    annotation names the queryset method that adds them. Writes use the
+    plain queryset as the annotated values would be stale in the response.
+    """
+    annotation = None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method in permissions.SAFE_METHODS:
+            queryset = getattr(queryset, self.annotation)()
+        return queryset
 
 
 class AccessionViewSet(viewsets.ModelViewSet):
@@ -105,8 +127,9 @@ class OntologyTermViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 
-class TissueViewSet(viewsets.ModelViewSet):
+class TissueViewSet(AnnotatedQuerySetMixin, viewsets.ModelViewSet):
     queryset = Tissue.objects.all()
+    annotation = "with_weights"
     serializer_class = TissueSerializer
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_fields = (
@@ -116,20 +139,23 @@ class TissueViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 
-class SampleExtractionViewSet(viewsets.ModelViewSet):
+class SampleExtractionViewSet(AnnotatedQuerySetMixin, viewsets.ModelViewSet):
     queryset = SampleExtraction.objects.all()
+    annotation = "with_counts"
     serializer_class = SampleExtractionSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 
-class ParseFixedSampleViewSet(viewsets.ModelViewSet):
+class ParseFixedSampleViewSet(AnnotatedQuerySetMixin, viewsets.ModelViewSet):
     queryset = ParseFixedSample.objects.all()
+    annotation = "with_counts"
     serializer_class = ParseFixedSampleSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 
-class NucleicAcidExtractionViewSet(viewsets.ModelViewSet):
+class NucleicAcidExtractionViewSet(AnnotatedQuerySetMixin, viewsets.ModelViewSet):
     queryset = NucleicAcidExtraction.objects.all()
+    annotation = "with_concentration"
     serializer_class = NucleicAcidExtractionSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
@@ -140,8 +166,9 @@ class NanoporeLibraryViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 
-class SplitSeqPlateViewSet(viewsets.ModelViewSet):
+class SplitSeqPlateViewSet(AnnotatedQuerySetMixin, viewsets.ModelViewSet):
     queryset = SplitSeqPlate.objects.all()
+    annotation = "with_total_nuclei"
     serializer_class = SplitSeqPlateSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
@@ -225,7 +252,7 @@ class IgvfSequenceFileViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
-        return SequencingFile.objects.all()
+        return SequencingFile.objects.select_related("sequencing_run")
 
 
 class PipelineSampleMetadataViewSet(viewsets.ModelViewSet):
@@ -234,3 +261,62 @@ class PipelineSampleMetadataViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_fields = ("plate__name",)
+
+
+class SearchViewSet(viewsets.ViewSet):
+    """Find mice, tissues, samples, subpools, files and accessions by part of their names
+
+    q is the text to find, type limits the results to some object
+    types and can be repeated, limit sets the number of results up to
+    the API page size.
+    """
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+    def list(self, request):
+        query = request.query_params.get("q", "")
+        kinds = request.query_params.getlist("type")
+        unknown = sorted(set(kinds) - set(search.SEARCH_KINDS))
+        if unknown:
+            raise ValidationError({"type": "Unknown types {}, use one of {}".format(
+                ", ".join(unknown), ", ".join(search.SEARCH_KINDS))})
+        try:
+            limit = int(request.query_params.get("limit", search.DEFAULT_SEARCH_LIMIT))
+        except ValueError:
+            raise ValidationError({"limit": "A whole number is required."}) from None
+        if limit < 1:
+            raise ValidationError({"limit": "Must be at least 1."})
+        limit = min(limit, api_settings.PAGE_SIZE or search.DEFAULT_SEARCH_LIMIT)
+
+        hits = search.search(query, kinds=kinds, limit=limit)
+        serializer = SearchEntrySerializer(hits, many=True, context={"request": request})
+        return Response({"query": query, "count": len(hits), "results": serializer.data})
+
+
+class IgvfSubmissionViewSet(viewsets.ViewSet):
+    """IGVF DACC submission tables for a split-seq plate
+
+    The detail view returns the rows of each table keyed by table
+    name. table limits it to some tables and can be repeated,
+    accession_prefix picks the accession namespace.
+    """
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    lookup_value_regex = "[^/]+"
+
+    def retrieve(self, request, pk=None):
+        tables = request.query_params.getlist("table") or None
+        accession_prefix = request.query_params.get(
+            "accession_prefix", AccessionNamespacesEnum.IGVF)
+        if accession_prefix not in AccessionNamespacesEnum.values:
+            raise ValidationError({"accession_prefix": "Use one of {}".format(
+                ", ".join(AccessionNamespacesEnum.values))})
+        try:
+            tables = submission.build_submission(pk, accession_prefix, tables)
+        except SplitSeqPlate.DoesNotExist:
+            raise NotFound() from None
+        except ValueError as e:
+            raise ValidationError({"detail": str(e)}) from None
+
+        return Response({
+            name: table.astype(object).where(table.notnull(), None).to_dict(orient="records")
+            for name, table in tables.items()
+        })
@@ -0,0 +1,205 @@
+"""Request timing and SQL profiling middleware
+
+ProfilingMiddleware records, for a sample of requests, which view and
+serializer handled the request, the number and time of SQL queries,
+the time spent rendering and the response size. It adds them to a
+Server-Timing header, so they show up in the browser developer tools,
+and logs them as one JSON line to the mousedemo.profiling logger.
+
+Queries that repeat the same SQL with different parameters more than
+PROFILING_DUPLICATE_THRESHOLD times are reported as likely N+1
+patterns.
+
+Settings:
+    PROFILING_SAMPLE_RATE: fraction of requests to profile, 0 to
+        disable, None to profile every request only while DEBUG is on
+    PROFILING_DUPLICATE_THRESHOLD: repeats of a query before it is flagged
+"""
+from collections import Counter
+from contextlib import ExitStack
+import json
+import logging
+import random
+import re
+import time
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("mousedemo.profiling")
+
+DEFAULT_DUPLICATE_THRESHOLD = 5
+_placeholder_list_re = re.compile(r"%s(\s*,\s*%s)*")
+_literal_re = re.compile(r"'[^']*'|\b\d+\b")
+
+
+def get_query_shape(sql):
+    """Return sql with the literals and placeholder lists collapsed
+
+    Queries with the same shape only differ by their parameters.
+    """
+    sql = _literal_re.sub("?", sql)
+    return _placeholder_list_re.sub("?", sql)
+
+
+class QueryRecorder:
+    """Database execute wrapper recording the time and shape of each query"""
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[get_query_shape(sql)] += 1
+
+    def duplicates(self, threshold):
+        """Return [(shape, count)] for the shapes run more than threshold times"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+
+class RequestProfile:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = QueryRecorder()
+        self.view = None
+        self.serializer = None
+        self.view_start = None
+        self.view_queries = 0.0
+        self.view_ms = None
+        self.render_start = None
+        self.render_ms = None
+
+    def start_view(self):
+        self.view_start = time.perf_counter()
+        self.view_queries = self.queries.duration
+
+    def start_render(self):
+        now = time.perf_counter()
+        if self.view_start is not None:
+            self.view_ms = (now - self.view_start) * 1000
+            self.view_queries = self.queries.duration - self.view_queries
+        self.render_start = now
+
+    def finish_render(self, response):
+        self.render_ms = (time.perf_counter() - self.render_start) * 1000
+
+    @property
+    def serialize_ms(self):
+        """Time spent outside the database between the view and the rendered response
+
+        For the rest framework views this is mostly the serializers.
+        """
+        if self.view_ms is None or self.render_ms is None:
+            return None
+        return self.view_ms - self.view_queries * 1000 + self.render_ms
+
+
+def get_view_name(view_func):
+    """Return the dotted name of a view function or rest framework view class"""
+    view = getattr(view_func, "cls", None) or getattr(view_func, "view_class", None) or view_func
+    return "{}.{}".format(view.__module__, getattr(view, "__qualname__", view.__class__.__name__))
+
+
+def get_serializer_name(response):
+    """Return the serializer class name used by a rest framework response, or None"""
+    view = getattr(response, "renderer_context", {}).get("view")
+    get_serializer_class = getattr(view, "get_serializer_class", None)
+    if get_serializer_class is None:
+        return None
+    try:
+        return get_serializer_class().__name__
+    except AssertionError:
+        # views without a serializer_class
+        return None
+
+
+def format_server_timing(metrics):
+    """Format [(name, milliseconds, description)] as a Server-Timing header"""
+    entries = []
+    for name, duration, description in metrics:
+        if duration is None:
+            continue
+        entry = "{};dur={:.1f}".format(name, duration)
+        if description:
+            entry += ';desc="{}"'.format(description.replace('"', "'"))
+        entries.append(entry)
+    return ", ".join(entries)
+
+
+def get_sample_rate():
+    sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", None)
+    if sample_rate is None:
+        return 1.0 if settings.DEBUG else 0.0
+    return sample_rate
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample_rate = get_sample_rate()
+        if sample_rate <= 0 or random.random() >= sample_rate:
+            return self.get_response(request)
+
+        profile = request.profile = RequestProfile()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile.queries))
+            response = self.get_response(request)
+
+        self.report(request, response, profile)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, "profile", None)
+        if profile is not None:
+            profile.view = get_view_name(view_func)
+            profile.start_view()
+
+    def process_template_response(self, request, response):
+        profile = getattr(request, "profile", None)
+        if profile is not None:
+            profile.serializer = get_serializer_name(response)
+            profile.start_render()
+            response.add_post_render_callback(profile.finish_render)
+        return response
+
+    def report(self, request, response, profile):
+        total_ms = (time.perf_counter() - profile.start) * 1000
+        sql_ms = profile.queries.duration * 1000
+        duplicates = profile.queries.duplicates(getattr(
+            settings, "PROFILING_DUPLICATE_THRESHOLD", DEFAULT_DUPLICATE_THRESHOLD))
+        size = None if response.streaming else len(response.content)
+
+        sql_description = "{} queries".format(profile.queries.count)
+        if duplicates:
+            sql_description += ", {} repeated".format(len(duplicates))
+        response["Server-Timing"] = format_server_timing([
+            ("sql", sql_ms, sql_description),
+            ("serialize", profile.serialize_ms, profile.serializer),
+            ("total", total_ms, profile.view),
+        ])
+
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "route": getattr(request.resolver_match, "route", None),
+            "status": response.status_code,
+            "view": profile.view,
+            "serializer": profile.serializer,
+            "total_ms": round(total_ms, 2),
+            "sql_count": profile.queries.count,
+            "sql_ms": round(sql_ms, 2),
+            "serialize_ms": None if profile.serialize_ms is None else round(profile.serialize_ms, 2),
+            "response_bytes": size,
+            "duplicate_queries": [{"sql": shape, "count": count} for shape, count in duplicates],
+        }
+        level = logging.WARNING if duplicates else logging.INFO
+        logger.log(level, json.dumps(record))
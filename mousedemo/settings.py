@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .database import get_databases
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -20,12 +23,15 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/3.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-&qyeqtq187%(4usb2p*qkm@718aq#2m%&shwwm*csg7^#3dvuc'
+SECRET_KEY = os.environ.get(
+    "DJANGO_SECRET_KEY",
+    'django-insecure-&qyeqtq187%(4usb2p*qkm@718aq#2m%&shwwm*csg7^#3dvuc',
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get("DJANGO_DEBUG", "true").lower() in ("1", "true", "yes", "on")
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [x for x in os.environ.get("DJANGO_ALLOWED_HOSTS", "").split(",") if x]
 
 
 # Application definition
@@ -49,6 +55,7 @@ if DEBUG:
     INSTALLED_APPS.append("django_extensions")
 
 MIDDLEWARE = [
+    'mousedemo.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,13 +88,14 @@ WSGI_APPLICATION = 'mousedemo.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
+#
+# Set DATABASE_URL to use PostgreSQL, see mousedemo/database.py
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+DATABASES = get_databases(os.environ, BASE_DIR / 'db.sqlite3')
+
+# PRAGMAs for new SQLite connections, None uses the WAL profile in
+# igvf_mice/io/database.py
+IGVF_MICE_SQLITE_PRAGMAS = None
 
 
 # Password validation
@@ -145,3 +153,32 @@ REST_FRAMEWORK = {
 
 LAB_ALIAS = "ali-mortazavi"
 AWARD = "HG012077"
+
+# Alias of a cache in CACHES to share the igvf_mice reference tables
+# between processes, None keeps a copy in each process.
+IGVF_MICE_REFERENCE_CACHE = None
+
+# Threads the async endpoints under /async/ run serializers in
+IGVF_MICE_SERIALIZER_THREADS = 4
+
+# Fraction of requests to time and log with mousedemo.profiling, use
+# something small like 0.01 in production. None profiles every request
+# while DEBUG is on.
+PROFILING_SAMPLE_RATE = None
+# Flag a query as a likely N+1 once it repeats this many times
+PROFILING_DUPLICATE_THRESHOLD = 5
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "mousedemo.profiling": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
@@ -16,7 +16,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework import routers
-from igvf_mice import views
+from igvf_mice import async_views, views
 
 router = routers.DefaultRouter()
 router.register(r"accession", views.AccessionViewSet)
@@ -40,6 +40,7 @@ router.register(r"sequencing-run", views.SequencingRunViewSet)
 router.register(r"library-in-run", views.LibraryInRunViewSet)
 router.register(r"sequencing-file", views.SequencingFileViewSet)
 router.register(r"measurement-set", views.MeasurementSetViewSet)
+router.register(r"search", views.SearchViewSet, basename="search")
 
 router.register(
     r"igvf/rodent-donor",
@@ -51,6 +52,11 @@ router.register(
     views.IgvfSequenceFileViewSet,
     basename="igvf-sequence-file",
 )
+router.register(
+    r"igvf/submission",
+    views.IgvfSubmissionViewSet,
+    basename="igvf-submission",
+)
 
 router.register(
     r"pipeline/sample-metadata",
@@ -64,5 +70,6 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("accounts/", include("django.contrib.auth.urls")),
     path("api-auth/", include("rest_framework.urls", namespace="rest_framework")),
+    path("async/", include(async_views.urlpatterns)),
     path("", include(router.urls)),
 ]